@@ -0,0 +1,216 @@
+import logging
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Type
+
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel, ValidationError
+from sqlalchemy.orm import Session
+
+from app.batch.schemas.batch_schema import (
+    BatchOperation,
+    BatchOperationResult,
+    BatchRequest,
+    BatchResponse,
+)
+from app.core.cache_invalidation import defer_invalidation
+from app.core.db_timeouts import raise_for_query_timeout
+from app.core.fast_json import RawJSONResponse
+from app.core.instrumented_route import InstrumentedRoute
+from app.db_connection import get_db_session
+from app.products.routers import category_routes
+from app.products.schemas.category_schema import (
+    CategoryCreate,
+    CategoryDelete,
+    CategoryReturn,
+    CategoryUpdate,
+)
+from app.users.routers import user_routes
+from app.users.schemas.user_schema import UserCreate, UserRead, UserUpdate
+from app.users.security import hash_passwords
+
+router = APIRouter(route_class=InstrumentedRoute)
+logger = logging.getLogger("app")
+
+# Status of a batch rolled back by a client error in one of its operations
+ROLLED_BACK_STATUS = 409
+
+
+class BatchHandler(NamedTuple):
+    # handler(db, id, data, hashed_password) calls the route function of the
+    # single request, hashed_password is only set for create_user
+    handler: Callable[[Session, Optional[int], Any, Optional[str]], Any]
+    data_model: Optional[Type[BaseModel]]
+    response_model: Type[BaseModel]
+    status_code: int
+    needs_id: bool
+
+
+HANDLERS = {
+    "create_category": BatchHandler(
+        lambda db, _, data, __: category_routes.create_category(data, db),
+        CategoryCreate,
+        CategoryReturn,
+        201,
+        False,
+    ),
+    "update_category": BatchHandler(
+        lambda db, id_, data, _: category_routes.update_category(id_, data, db),
+        CategoryUpdate,
+        CategoryReturn,
+        200,
+        True,
+    ),
+    "delete_category": BatchHandler(
+        lambda db, id_, _, __: category_routes.delete_category(id_, db),
+        None,
+        CategoryDelete,
+        200,
+        True,
+    ),
+    "create_user": BatchHandler(
+        lambda db, _, data, hashed_password: user_routes.add_user(
+            data, hashed_password, db
+        ),
+        UserCreate,
+        UserRead,
+        201,
+        False,
+    ),
+    "update_user": BatchHandler(
+        lambda db, id_, data, _: user_routes.update_user(id_, data, db),
+        UserUpdate,
+        UserRead,
+        200,
+        True,
+    ),
+    "delete_user": BatchHandler(
+        lambda db, id_, _, __: user_routes.delete_user(id_, db),
+        None,
+        UserRead,
+        200,
+        True,
+    ),
+}
+
+
+def hash_batch_passwords(operations: List[BatchOperation]) -> Dict[int, str]:
+    """Hashed password of every valid create_user operation, by index.
+
+    Hashed in parallel before the batch opens its transaction, rather than
+    one by one while the connection sits idle in it.
+    """
+    passwords = {}
+    for index, operation in enumerate(operations):
+        if operation.op != "create_user":
+            continue
+        try:
+            passwords[index] = UserCreate.model_validate(operation.data or {}).password
+        except ValidationError:
+            # Reported when the operation runs
+            continue
+    return dict(zip(passwords, hash_passwords(list(passwords.values()))))
+
+
+def rolled_back_status(failed: BatchOperationResult) -> int:
+    # A server error stays one, so clients retry and monitoring sees it
+    if failed.status_code >= 500:
+        return failed.status_code
+    return ROLLED_BACK_STATUS
+
+
+def run_operation(
+    db: Session,
+    index: int,
+    operation: BatchOperation,
+    hashed_password: Optional[str] = None,
+) -> BatchOperationResult:
+    batch_handler = HANDLERS[operation.op]
+    result = BatchOperationResult(index=index, op=operation.op, status_code=200)
+
+    if batch_handler.needs_id and operation.id is None:
+        result.status_code = 422
+        result.detail = "Operation requires an id"
+        return result
+
+    try:
+        data = None
+        if batch_handler.data_model is not None:
+            data = batch_handler.data_model.model_validate(operation.data or {})
+
+        returned = batch_handler.handler(db, operation.id, data, hashed_password)
+
+        result.status_code = batch_handler.status_code
+        result.body = batch_handler.response_model.model_validate(
+            returned, from_attributes=True
+        ).model_dump(mode="json")
+    except ValidationError as e:
+        result.status_code = 422
+        result.detail = e.errors(include_url=False, include_context=False)
+    except HTTPException as e:
+        result.status_code = e.status_code
+        result.detail = e.detail
+    return result
+
+
+@router.post(
+    "/",
+    response_model=BatchResponse,
+    responses={
+        ROLLED_BACK_STATUS: {"model": BatchResponse},
+        500: {"model": BatchResponse},
+    },
+)
+def run_batch(batch: BatchRequest, db: Session = Depends(get_db_session)):
+    """Run the operations in order in a single transaction.
+
+    Each operation goes through the same route function as its single
+    request. The first failing operation rolls back the whole batch, later
+    operations are not run and committed is false. The response is a 409
+    when the operation failed with a client error, and the operation's own
+    status for a server error. Each operation's status code is in its result.
+
+    The response is encoded here, in the worker thread, rather than by
+    FastAPI on the event loop.
+    """
+    results = []
+    hashed_passwords = hash_batch_passwords(batch.operations)
+    try:
+        # Route handlers commit, joined in rollback_only mode their commits
+        # only flush and leave the one real commit to this session
+        operation_session = Session(
+            bind=db.connection(),
+            join_transaction_mode="rollback_only",
+            expire_on_commit=False,
+        )
+        defer_invalidation(operation_session, db)
+
+        with operation_session:
+            for index, operation in enumerate(batch.operations):
+                result = run_operation(
+                    operation_session, index, operation, hashed_passwords.get(index)
+                )
+                results.append(result)
+                if result.status_code >= 400:
+                    break
+
+        if results[-1].status_code >= 400:
+            db.rollback()
+            logger.warning(
+                "Batch rolled back, operation %d (%s) failed with %d",
+                results[-1].index,
+                results[-1].op,
+                results[-1].status_code,
+            )
+            return RawJSONResponse(
+                BatchResponse(committed=False, results=results).model_dump_json(),
+                status_code=rolled_back_status(results[-1]),
+            )
+
+        db.commit()
+        return RawJSONResponse(
+            BatchResponse(committed=True, results=results).model_dump_json()
+        )
+    except Exception as e:
+        db.rollback()
+        raise_for_query_timeout(e)
+        logger.error("Unexpected exception while running batch: %s", e)
+        raise HTTPException(status_code=500, detail="Internal server error")
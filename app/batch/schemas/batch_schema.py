@@ -0,0 +1,33 @@
+from typing import Any, List, Literal, Optional
+
+from pydantic import BaseModel, Field
+
+
+class BatchOperation(BaseModel):
+    op: Literal[
+        "create_category",
+        "update_category",
+        "delete_category",
+        "create_user",
+        "update_user",
+        "delete_user",
+    ]
+    id: Optional[int] = None
+    data: Optional[dict] = None
+
+
+class BatchRequest(BaseModel):
+    operations: List[BatchOperation] = Field(min_length=1, max_length=100)
+
+
+class BatchOperationResult(BaseModel):
+    index: int
+    op: str
+    status_code: int
+    body: Optional[Any] = None
+    detail: Optional[Any] = None
+
+
+class BatchResponse(BaseModel):
+    committed: bool
+    results: List[BatchOperationResult]
@@ -0,0 +1,212 @@
+import json
+import time
+from typing import Dict, Optional, Sequence
+
+from app import settings
+from app.core.metrics import (
+    ADMISSION_IN_FLIGHT,
+    ADMISSION_LIMIT,
+    ADMISSION_REJECTED,
+    route_template,
+)
+
+CRITICAL = "critical"
+HIGH = "high"
+NORMAL = "normal"
+LOW = "low"
+
+# Responses that mean the work behind them is overloaded, not just slow
+OVERLOAD_STATUSES = {503, 504}
+REJECTED_BODY = json.dumps({"detail": "Server is overloaded, retry later"}).encode()
+
+
+class AdaptiveLimit:
+    """Concurrency limit adjusted by AIMD on latency relative to each route.
+
+    Every route keeps a baseline, a slow moving average of its own latency,
+    so a login spending 400 ms in bcrypt is as healthy as a 5 ms lookup.
+    Only samples within the tolerance feed the baseline, so a sustained
+    slowdown keeps reading as slow instead of becoming the new normal. A
+    request slower than its baseline times the tolerance, or one failing
+    with 503/504, cuts the limit by the backoff ratio, at most once per
+    decrease interval so a burst of slow responses counts as one signal.
+    Any other request raises it by 1/limit while the limit is actually
+    used, and below the initial limit also when it is not, so a cut made
+    during a spike recovers once traffic is light again.
+    """
+
+    def __init__(
+        self,
+        initial: int,
+        minimum: int,
+        maximum: int,
+        tolerance: float,
+        backoff: float,
+        decrease_interval: float = 0.25,
+        baseline_alpha: float = 0.05,
+    ):
+        self.initial = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self.decrease_interval = decrease_interval
+        self.baseline_alpha = baseline_alpha
+        self.limit = float(min(max(initial, minimum), maximum))
+        self.in_flight = 0
+        self.baselines: Dict[str, float] = {}
+        self._last_decrease = 0.0
+
+    def try_acquire(self, share: float = 1.0) -> bool:
+        if self.in_flight >= max(1.0, self.limit * share):
+            return False
+        self.in_flight += 1
+        return True
+
+    def _is_slow(self, route: str, latency: float) -> bool:
+        baseline = self.baselines.get(route, latency)
+        if latency > baseline * self.tolerance:
+            return True
+        self.baselines[route] = baseline + self.baseline_alpha * (latency - baseline)
+        return False
+
+    def release(
+        self, latency: Optional[float], overloaded: bool = False, route: str = ""
+    ):
+        """``latency`` None frees the slot without adjusting the limit."""
+        in_flight = self.in_flight
+        self.in_flight -= 1
+
+        if latency is None:
+            return
+        # A fast 503 says nothing about how long the route normally takes
+        if overloaded or self._is_slow(route, latency):
+            now = time.monotonic()
+            if now - self._last_decrease >= self.decrease_interval:
+                self._last_decrease = now
+                self.limit = max(self.minimum, self.limit * self.backoff)
+        elif in_flight * 2 >= self.limit or self.limit < self.initial:
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+
+
+def _matches(path: str, prefixes: Sequence[str]) -> bool:
+    return any(path.startswith(prefix) for prefix in prefixes)
+
+
+def request_priority(path: str) -> str:
+    if _matches(path, settings.ADMISSION_CRITICAL_PATHS):
+        return CRITICAL
+    if _matches(path, settings.ADMISSION_HIGH_PRIORITY_PATHS):
+        return HIGH
+    if _matches(path, settings.ADMISSION_LOW_PRIORITY_PATHS):
+        return LOW
+    return NORMAL
+
+
+class AdmissionControlMiddleware:
+    """Sheds requests beyond an adaptive concurrency limit with a fast 503.
+
+    Critical paths (health checks, internal endpoints) are never shed.
+    High priority requests may fill the whole limit, normal ones
+    ADMISSION_NORMAL_SHARE of it and low priority ones (bulk work)
+    ADMISSION_LOW_PRIORITY_SHARE, so they are the first to go and leave
+    room for the rest. Low priority latency does not feed the limit, those
+    requests are expected to be slow.
+    """
+
+    def __init__(self, app, limit: Optional[AdaptiveLimit] = None):
+        self.app = app
+        self.limit = limit or AdaptiveLimit(
+            settings.ADMISSION_INITIAL_LIMIT,
+            settings.ADMISSION_MIN_LIMIT,
+            settings.ADMISSION_MAX_LIMIT,
+            settings.ADMISSION_LATENCY_TOLERANCE,
+            settings.ADMISSION_BACKOFF_RATIO,
+            settings.ADMISSION_DECREASE_INTERVAL_MS / 1000,
+            settings.ADMISSION_BASELINE_ALPHA,
+        )
+        self.shares = {
+            HIGH: 1.0,
+            NORMAL: settings.ADMISSION_NORMAL_SHARE,
+            LOW: settings.ADMISSION_LOW_PRIORITY_SHARE,
+        }
+        self.admitted = 0
+        self.rejected: Dict[str, int] = {HIGH: 0, NORMAL: 0, LOW: 0}
+        global _current
+        _current = self
+        ADMISSION_LIMIT.set(self.limit.limit)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        priority = request_priority(scope["path"])
+        if priority == CRITICAL:
+            await self.app(scope, receive, send)
+            return
+
+        if not self.limit.try_acquire(self.shares[priority]):
+            self.rejected[priority] += 1
+            ADMISSION_REJECTED.labels(priority).inc()
+            await self._reject(send)
+            return
+
+        self.admitted += 1
+        ADMISSION_IN_FLIGHT.inc()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            ADMISSION_IN_FLIGHT.dec()
+            latency = time.perf_counter() - start
+            self.limit.release(
+                latency if priority != LOW else None,
+                status in OVERLOAD_STATUSES,
+                route_template(scope),
+            )
+            ADMISSION_LIMIT.set(self.limit.limit)
+
+    async def _reject(self, send):
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(REJECTED_BODY)).encode()),
+                    (
+                        b"retry-after",
+                        str(settings.ADMISSION_RETRY_AFTER_SECONDS).encode(),
+                    ),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": REJECTED_BODY})
+
+    def status(self) -> dict:
+        return {
+            "limit": round(self.limit.limit, 2),
+            "in_flight": self.limit.in_flight,
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+            "shares": self.shares,
+        }
+
+
+# The instance in the app's middleware stack, for /internal/admission
+_current: Optional[AdmissionControlMiddleware] = None
+
+
+def admission_status() -> dict:
+    if _current is None:
+        return {"enabled": False}
+    return dict(_current.status(), enabled=True)
@@ -0,0 +1,280 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+
+# Generation bumped by clear(), part of every generation tuple
+FLUSH_TAG = "*"
+
+
+class CachedResponse(NamedTuple):
+    status: int
+    headers: List[Tuple[bytes, bytes]]
+    body: bytes
+    stored_at: float
+
+
+class MemoryLRUBackend:
+    """Bounded in-process LRU, entries expire after their TTL.
+
+    Every tag has a generation, bumped when it is invalidated. ``set`` with
+    the ``generation`` read before building the value skips the write if a
+    tag was invalidated meanwhile.
+    """
+
+    blocking_writes = False
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._keys_by_tag = {}
+        self._generations = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def generation(self, tags: Iterable[str]) -> Tuple[int, ...]:
+        with self._lock:
+            return self._generation(tags)
+
+    def _generation(self, tags: Iterable[str]) -> Tuple[int, ...]:
+        return tuple(self._generations.get(tag, 0) for tag in (FLUSH_TAG, *tags))
+
+    def set(
+        self,
+        key: str,
+        value,
+        ttl: float,
+        tags: Iterable[str] = (),
+        generation: Optional[Tuple[int, ...]] = None,
+    ):
+        tags = tuple(tags)
+        with self._lock:
+            if generation is not None and generation != self._generation(tags):
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + ttl, tags, value)
+            for tag in tags:
+                self._keys_by_tag.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate_tags(self, tags: Iterable[str]):
+        with self._lock:
+            for tag in tags:
+                self._generations[tag] = self._generations.get(tag, 0) + 1
+                for key in self._keys_by_tag.pop(tag, ()):
+                    self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._generations[FLUSH_TAG] = self._generations.get(FLUSH_TAG, 0) + 1
+            self._entries.clear()
+            self._keys_by_tag.clear()
+
+    def _remove(self, key: str):
+        _, tags, _ = self._entries.pop(key)
+        for tag in tags:
+            keys = self._keys_by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_tag[tag]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteBackend:
+    """Response cache in a local SQLite file, shared by all workers on the host.
+
+    Lookups are single-row primary key reads on a WAL database and take
+    tens of microseconds, so they run inline on the event loop. Writes take
+    the database lock and may wait for other workers, callers on the event
+    loop run them in a thread (``blocking_writes``). Values are stored as
+    plain columns, never unpickled, since the file is shared.
+
+    Tag generations live in the file too, so a write checked against them
+    is skipped after an invalidation by any worker, not only this one.
+    """
+
+    PRUNE_EVERY = 256
+    blocking_writes = True
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        with self._connect() as connection:
+            connection.executescript("""
+                CREATE TABLE IF NOT EXISTS cache_entry (
+                    key TEXT PRIMARY KEY,
+                    expires_at REAL NOT NULL,
+                    stored_at REAL NOT NULL,
+                    status INTEGER NOT NULL,
+                    headers TEXT NOT NULL,
+                    body BLOB NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS cache_tag (
+                    tag TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    PRIMARY KEY (tag, key)
+                );
+                CREATE TABLE IF NOT EXISTS cache_generation (
+                    tag TEXT PRIMARY KEY,
+                    generation INTEGER NOT NULL
+                );
+                """)
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def get(self, key: str):
+        row = (
+            self._connect()
+            .execute(
+                "SELECT status, headers, body, stored_at FROM cache_entry "
+                "WHERE key = ? AND expires_at >= ?",
+                (key, time.time()),
+            )
+            .fetchone()
+        )
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        status, headers, body, stored_at = row
+        return CachedResponse(
+            status=status,
+            headers=[
+                (name.encode("latin-1"), value.encode("latin-1"))
+                for name, value in json.loads(headers)
+            ],
+            body=body,
+            stored_at=stored_at,
+        )
+
+    def generation(self, tags: Iterable[str]) -> Tuple[int, ...]:
+        return self._generation(self._connect(), tags)
+
+    def _generation(self, connection, tags: Iterable[str]) -> Tuple[int, ...]:
+        tags = (FLUSH_TAG, *tags)
+        placeholders = ", ".join("?" for _ in tags)
+        generations = dict(
+            connection.execute(
+                "SELECT tag, generation FROM cache_generation "
+                f"WHERE tag IN ({placeholders})",
+                tags,
+            ).fetchall()
+        )
+        return tuple(generations.get(tag, 0) for tag in tags)
+
+    def _bump_generations(self, connection, tags: Iterable[str]):
+        connection.executemany(
+            "INSERT INTO cache_generation (tag, generation) VALUES (?, 1) "
+            "ON CONFLICT (tag) DO UPDATE SET generation = generation + 1",
+            [(tag,) for tag in tags],
+        )
+
+    def set(
+        self,
+        key: str,
+        value: CachedResponse,
+        ttl: float,
+        tags=(),
+        generation: Optional[Tuple[int, ...]] = None,
+    ):
+        tags = tuple(tags)
+        connection = self._connect()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            if generation is not None and generation != self._generation(
+                connection, tags
+            ):
+                return
+            connection.execute(
+                "INSERT OR REPLACE INTO cache_entry "
+                "(key, expires_at, stored_at, status, headers, body) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    time.time() + ttl,
+                    value.stored_at,
+                    value.status,
+                    json.dumps(
+                        [
+                            (name.decode("latin-1"), header.decode("latin-1"))
+                            for name, header in value.headers
+                        ]
+                    ),
+                    value.body,
+                ),
+            )
+            connection.executemany(
+                "INSERT OR IGNORE INTO cache_tag (tag, key) VALUES (?, ?)",
+                [(tag, key) for tag in tags],
+            )
+
+        self._writes += 1
+        if self._writes % self.PRUNE_EVERY == 0:
+            self.prune()
+
+    def invalidate_tags(self, tags: Iterable[str]):
+        tags = list(tags)
+        if not tags:
+            return
+        placeholders = ", ".join("?" for _ in tags)
+        connection = self._connect()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute(
+                "DELETE FROM cache_entry WHERE key IN "
+                f"(SELECT key FROM cache_tag WHERE tag IN ({placeholders}))",
+                tags,
+            )
+            connection.execute(
+                f"DELETE FROM cache_tag WHERE tag IN ({placeholders})", tags
+            )
+            self._bump_generations(connection, tags)
+
+    def prune(self):
+        connection = self._connect()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute(
+                "DELETE FROM cache_entry WHERE expires_at < ?", (time.time(),)
+            )
+            connection.execute(
+                "DELETE FROM cache_tag WHERE key NOT IN (SELECT key FROM cache_entry)"
+            )
+
+    def clear(self):
+        connection = self._connect()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute("DELETE FROM cache_entry")
+            connection.execute("DELETE FROM cache_tag")
+            self._bump_generations(connection, [FLUSH_TAG])
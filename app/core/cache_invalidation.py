@@ -0,0 +1,103 @@
+import logging
+from itertools import chain
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger("app")
+
+# invalidator(table, keys): keys are primary keys as strings, None means
+# the whole table changed (bulk statements).
+_invalidators: List[Callable[[str, Optional[Set[str]]], None]] = []
+_flushers: List[Callable[[], None]] = []
+
+
+def register_invalidator(invalidator: Callable[[str, Optional[Set[str]]], None]):
+    _invalidators.append(invalidator)
+    return invalidator
+
+
+def register_flusher(flusher: Callable[[], None]):
+    _flushers.append(flusher)
+    return flusher
+
+
+def invalidate_local(changes: Dict[str, Optional[Set[str]]]):
+    """Evict entries built from the changed tables from this worker's caches."""
+    for table, keys in changes.items():
+        for invalidator in _invalidators:
+            try:
+                invalidator(table, keys)
+            except Exception as e:
+                logger.error("Cache invalidation for %s failed: %s", table, e)
+
+
+def flush_local():
+    for flusher in _flushers:
+        try:
+            flusher()
+        except Exception as e:
+            logger.error("Cache flush failed: %s", e)
+
+
+def _record_change(session: Session, table: str, keys: Optional[Iterable[str]]):
+    changes = session.info.setdefault("cache_changes", {})
+    if keys is None or changes.get(table, set()) is None:
+        changes[table] = None
+    else:
+        changes.setdefault(table, set()).update(keys)
+
+
+def pending_changes(session: Session) -> Dict[str, Optional[Set[str]]]:
+    return session.info.get("cache_changes", {})
+
+
+def defer_invalidation(session: Session, owner: Session):
+    """Hand the changes ``session`` commits to ``owner`` instead.
+
+    For sessions joined to a transaction ``owner`` commits, their own
+    commit() changes nothing visible yet.
+    """
+    session.info["invalidation_owner"] = owner
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_flushed_changes(session, flush_context):
+    for instance in chain(session.new, session.dirty, session.deleted):
+        state = inspect(instance)
+        primary_key = state.mapper.primary_key_from_instance(instance)
+        key = ":".join(str(value) for value in primary_key)
+        for table in state.mapper.tables:
+            _record_change(session, table.name, [key])
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _collect_bulk_changes(orm_execute_state):
+    if (
+        orm_execute_state.is_insert
+        or orm_execute_state.is_update
+        or orm_execute_state.is_delete
+    ):
+        table = getattr(orm_execute_state.statement, "table", None)
+        if table is not None and getattr(table, "name", None):
+            _record_change(orm_execute_state.session, table.name, None)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    changes = session.info.pop("cache_changes", None)
+    if not changes:
+        return
+
+    owner = session.info.get("invalidation_owner")
+    if owner is None:
+        invalidate_local(changes)
+        return
+    for table, keys in changes.items():
+        _record_change(owner, table, keys)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session):
+    session.info.pop("cache_changes", None)
@@ -0,0 +1,94 @@
+import logging
+import threading
+import time
+
+from sqlalchemy.pool import QueuePool
+
+from app import settings
+from app.core.tracing import record_span
+
+logger = logging.getLogger("app")
+
+
+class PoolWaitStats:
+    """Checkout wait times for one pool, shared by all threads using it."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.slow_checkouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.last_wait = 0.0
+
+    def record(self, wait: float):
+        with self._lock:
+            self.checkouts += 1
+            self.last_wait = wait
+            self.total_wait += wait
+            if wait > self.max_wait:
+                self.max_wait = wait
+            if wait * 1000 >= settings.DB_POOL_WAIT_WARNING_MS:
+                self.slow_checkouts += 1
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "slow_checkouts": self.slow_checkouts,
+                "total_wait_ms": round(self.total_wait * 1000, 3),
+                "avg_wait_ms": round(
+                    self.total_wait * 1000 / self.checkouts if self.checkouts else 0.0,
+                    3,
+                ),
+                "max_wait_ms": round(self.max_wait * 1000, 3),
+                "last_wait_ms": round(self.last_wait * 1000, 3),
+            }
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that times how long each checkout waits for a connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_stats = PoolWaitStats()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            end = time.perf_counter()
+            wait = end - start
+            self.wait_stats.record(wait)
+            record_span("db.checkout", start, end)
+            if wait * 1000 >= settings.DB_POOL_WAIT_WARNING_MS:
+                logger.warning(
+                    "Waited %.1f ms for a database connection (%s)",
+                    wait * 1000,
+                    self.status(),
+                )
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.wait_stats = self.wait_stats
+        return pool
+
+
+def pool_status(pool) -> dict:
+    status = {"class": type(pool).__name__}
+
+    if isinstance(pool, QueuePool):
+        status.update(
+            {
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "idle": pool.checkedin(),
+                "overflow": max(pool.overflow(), 0),
+                "max_overflow": pool._max_overflow,
+                "timeout": pool.timeout(),
+            }
+        )
+    if isinstance(pool, InstrumentedQueuePool):
+        status["wait"] = pool.wait_stats.as_dict()
+    return status
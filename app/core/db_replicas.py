@@ -0,0 +1,137 @@
+import itertools
+import logging
+import threading
+import time
+from typing import List
+
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger("app")
+
+# A replica that has replayed everything it received has no lag, even if
+# the primary has been idle, as long as it is still receiving: without a WAL
+# receiver (primary unreachable, replication broken) nothing new arrives and
+# the LSNs stay equal, so lag is NULL. Its pid is visible to any user. On a
+# primary lag is 0.
+REPLICA_LAG_QUERY = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() THEN 0
+    WHEN NOT EXISTS (SELECT 1 FROM pg_stat_wal_receiver) THEN NULL
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+END
+"""
+
+
+class ReplicaRouter:
+    """Round-robin over healthy replicas, falling back to the primary.
+
+    A replica is skipped while it is unreachable or lags behind the primary
+    by more than ``max_lag`` seconds, or has stopped receiving WAL. Health
+    is re-checked at most every ``check_interval`` seconds per replica, in
+    a background thread started by whichever request gets there first.
+    Requests never wait for a check, they keep the previous answer.
+
+    After any committed write ``may_be_stale`` holds for every replica for
+    ``max_lag`` seconds, and for a replica that lagged at its last check,
+    so caches do not keep results that predate the write.
+    """
+
+    def __init__(
+        self,
+        primary: Engine,
+        replicas: List[Engine],
+        max_lag: float = 5.0,
+        check_interval: float = 2.0,
+    ):
+        self.primary = primary
+        self.replicas = replicas
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._health = {}
+        self._lag = {}
+        self._last_write = float("-inf")
+
+    def choose(self) -> Engine:
+        if not self.replicas:
+            return self.primary
+
+        start = next(self._counter)
+        for offset in range(len(self.replicas)):
+            replica = self.replicas[(start + offset) % len(self.replicas)]
+            if self.is_healthy(replica):
+                return replica
+
+        logger.warning("No healthy read replica, routing reads to the primary")
+        return self.primary
+
+    def is_healthy(self, replica: Engine) -> bool:
+        now = time.monotonic()
+
+        with self._lock:
+            checked_at, healthy = self._health.get(replica, (None, True))
+            if checked_at is not None and now - checked_at < self.check_interval:
+                return healthy
+            # Claim the check so concurrent requests keep the previous answer
+            self._health[replica] = (now, healthy)
+
+        threading.Thread(
+            target=self._refresh, args=(replica,), name="replica-check", daemon=True
+        ).start()
+        return healthy
+
+    def check_all(self):
+        """Check every replica now, before requests are routed to them."""
+        for replica in self.replicas:
+            self._refresh(replica)
+
+    def _refresh(self, replica: Engine):
+        healthy = self._check(replica)
+        with self._lock:
+            self._health[replica] = (time.monotonic(), healthy)
+
+    def note_write(self):
+        self._last_write = time.monotonic()
+
+    def may_be_stale(self, engine: Engine) -> bool:
+        if engine not in self.replicas:
+            return False
+        with self._lock:
+            lag = self._lag.get(engine, 0.0)
+        return lag > 0 or time.monotonic() - self._last_write < self.max_lag
+
+    def _check(self, replica: Engine) -> bool:
+        try:
+            lag = self.replica_lag(replica)
+        except Exception as e:
+            logger.warning("Read replica %s is unavailable: %s", replica.url, e)
+            return False
+
+        with self._lock:
+            self._lag[replica] = lag
+
+        if lag > self.max_lag:
+            logger.warning(
+                "Read replica %s lags %.1f s behind the primary", replica.url, lag
+            )
+            return False
+        return True
+
+    def replica_lag(self, replica: Engine) -> float:
+        with replica.connect() as connection:
+            lag = connection.exec_driver_sql(REPLICA_LAG_QUERY).scalar()
+        if lag is None:
+            raise RuntimeError("replica is not receiving WAL from the primary")
+        return float(lag)
+
+    def status(self) -> List[dict]:
+        with self._lock:
+            return [
+                {
+                    "url": str(replica.url),
+                    "healthy": self._health.get(replica, (None, True))[1],
+                }
+                for replica in self.replicas
+            ]
@@ -0,0 +1,144 @@
+import logging
+from typing import Optional
+
+import anyio
+from fastapi import HTTPException
+from sqlalchemy import event
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+
+from app import settings
+from app.core.request_context import RequestContext, get_request_context
+
+logger = logging.getLogger("app")
+
+QUERY_CANCELED_PGCODE = "57014"
+
+# Cancel requests open their own connection to the server, keep them off
+# the threadpool that runs the routes.
+_cancel_limiter = None
+
+
+def statement_timeout_ms(route_path: str) -> Optional[float]:
+    return settings.DB_ROUTE_STATEMENT_TIMEOUTS_MS.get(route_path)
+
+
+def connect_args_for(url) -> dict:
+    """Connect timeout and default statement_timeout for new Postgres connections."""
+    if url.get_backend_name() != "postgresql":
+        return {}
+    connect_args = {}
+    if settings.DB_CONNECT_TIMEOUT_SECONDS:
+        connect_args["connect_timeout"] = settings.DB_CONNECT_TIMEOUT_SECONDS
+    if settings.DB_STATEMENT_TIMEOUT_MS:
+        timeout_ms = int(settings.DB_STATEMENT_TIMEOUT_MS)
+        connect_args["options"] = f"-c statement_timeout={timeout_ms}"
+    return connect_args
+
+
+@event.listens_for(Session, "after_begin")
+def _apply_route_statement_timeout(session, transaction, connection):
+    request_context = get_request_context()
+    if request_context is None or connection.dialect.name != "postgresql":
+        return
+
+    timeout_ms = statement_timeout_ms(request_context.route_path)
+    if timeout_ms is not None:
+        connection.exec_driver_sql(f"SET LOCAL statement_timeout = {int(timeout_ms)}")
+
+
+def is_query_canceled(exc: BaseException) -> bool:
+    return (
+        isinstance(exc, DBAPIError)
+        and getattr(exc.orig, "pgcode", None) == QUERY_CANCELED_PGCODE
+    )
+
+
+def raise_for_query_timeout(exc: BaseException):
+    """Turn a cancelled statement into a 504, leave other errors alone."""
+    if not is_query_canceled(exc):
+        return
+
+    request_context = get_request_context()
+    if request_context is not None and request_context.client_disconnected:
+        logger.info(
+            "Query cancelled after client disconnected from %s %s",
+            request_context.method,
+            request_context.route_path,
+        )
+    else:
+        logger.warning("Query exceeded its statement timeout: %s", exc.orig)
+
+    raise HTTPException(
+        status_code=504, detail="Database query took too long and was cancelled"
+    ) from exc
+
+
+async def cancel_running_queries(request_context: RequestContext):
+    global _cancel_limiter
+
+    if _cancel_limiter is None:
+        _cancel_limiter = anyio.CapacityLimiter(4)
+
+    for dbapi_connection in list(request_context.running_connections):
+        cancel = getattr(dbapi_connection, "cancel", None)
+        if cancel is None:
+            continue
+        try:
+            await anyio.to_thread.run_sync(cancel, limiter=_cancel_limiter)
+        except Exception as e:
+            logger.warning("Could not cancel query: %s", e)
+
+
+class CancelOnDisconnectMiddleware:
+    """Cancels the backend queries of a request whose client went away.
+
+    Incoming messages are pumped through a buffer so the disconnect is
+    noticed while a sync route is still blocked on the database. Must be
+    added inside QueryStatsMiddleware, which sets up the request context.
+    """
+
+    def __init__(self, app, buffer_size: int = 16):
+        self.app = app
+        self.buffer_size = buffer_size
+
+    async def __call__(self, scope, receive, send):
+        request_context = get_request_context()
+        if scope["type"] != "http" or request_context is None:
+            await self.app(scope, receive, send)
+            return
+
+        send_stream, receive_stream = anyio.create_memory_object_stream(
+            self.buffer_size
+        )
+        disconnect_message = None
+
+        async def pump():
+            async with send_stream:
+                while True:
+                    message = await receive()
+                    if message["type"] == "http.disconnect":
+                        request_context.client_disconnected = True
+                        await cancel_running_queries(request_context)
+                        await send_stream.send(message)
+                        return
+                    await send_stream.send(message)
+
+        async def buffered_receive():
+            nonlocal disconnect_message
+            if disconnect_message is not None:
+                return disconnect_message
+            try:
+                message = await receive_stream.receive()
+            except anyio.EndOfStream:
+                return {"type": "http.disconnect"}
+            if message["type"] == "http.disconnect":
+                disconnect_message = message
+            return message
+
+        async with anyio.create_task_group() as task_group:
+            task_group.start_soon(pump)
+            try:
+                await self.app(scope, buffered_receive, send)
+            finally:
+                task_group.cancel_scope.cancel()
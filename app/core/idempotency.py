@@ -0,0 +1,363 @@
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Optional, Tuple
+
+from sqlalchemy import and_, delete, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Engine, Row
+
+from app import settings
+from app.core.threadpool import run_sync_timed
+from app.db_connection import get_engine
+from app.idempotency.models import IdempotencyKey
+
+logger = logging.getLogger("app")
+
+IDEMPOTENCY_HEADER = b"idempotency-key"
+REPLAYED_HEADER = b"idempotent-replayed"
+MAX_KEY_LENGTH = 255
+# Set by the middlewares outside this one, a replay gets fresh ones
+_SKIPPED_HEADERS = {"x-trace-id", "server-timing", "x-db-queries"}
+
+_table = IdempotencyKey.__table__
+_DIALECT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _aware(value: datetime) -> datetime:
+    # SQLite hands back naive datetimes, they were stored as UTC
+    return value if value.tzinfo is not None else value.replace(tzinfo=timezone.utc)
+
+
+class IdempotencyStore:
+    """Claims, completes and releases keys, each call is one short transaction."""
+
+    def __init__(self, engine_factory: Callable[[], Engine] = get_engine):
+        self.engine_factory = engine_factory
+
+    def _where(self, key: str, route: str):
+        return and_(_table.c.key == key, _table.c.route == route)
+
+    def _is_stale(self, row: Row, now: datetime) -> bool:
+        if row.status_code is None:
+            # The request that claimed the key died without releasing it
+            lock_timeout = timedelta(seconds=settings.IDEMPOTENCY_LOCK_TIMEOUT_SECONDS)
+            return _aware(row.locked_at) + lock_timeout < now
+        return _aware(row.expires_at) < now
+
+    def _insert_if_absent(self, connection, values: dict) -> bool:
+        # ON CONFLICT DO NOTHING, a duplicate must not raise and log an error
+        statement = _DIALECT_INSERTS[connection.dialect.name](_table).values(**values)
+        statement = statement.on_conflict_do_nothing(
+            index_elements=[_table.c.key, _table.c.route]
+        )
+        return connection.execute(statement).rowcount == 1
+
+    def claim(
+        self, key: str, route: str, request_hash: str
+    ) -> Tuple[Optional[Row], Optional[datetime]]:
+        """The existing row, or None and the locked_at of the caller's claim.
+
+        locked_at identifies the claim to complete() and release(), after a
+        stale claim was taken over they leave the new owner's row alone.
+        Replays and polls only run the SELECT.
+        """
+        engine = self.engine_factory()
+        while True:
+            now = _utcnow()
+            with engine.begin() as connection:
+                row = connection.execute(
+                    select(_table).where(self._where(key, route))
+                ).first()
+                if row is not None:
+                    if not self._is_stale(row, now):
+                        return row, None
+                    connection.execute(
+                        delete(_table).where(
+                            self._where(key, route),
+                            _table.c.locked_at == row.locked_at,
+                        )
+                    )
+                    continue
+
+                claimed = self._insert_if_absent(
+                    connection,
+                    dict(
+                        key=key,
+                        route=route,
+                        request_hash=request_hash,
+                        locked_at=now,
+                        expires_at=now
+                        + timedelta(seconds=settings.IDEMPOTENCY_TTL_SECONDS),
+                    ),
+                )
+            if claimed:
+                if random.random() < settings.IDEMPOTENCY_PURGE_PROBABILITY:
+                    self.purge_expired()
+                return None, now
+            # A concurrent request claimed it in between, read its row
+
+    def _owned(self, key: str, route: str, locked_at: datetime):
+        return and_(
+            self._where(key, route),
+            _table.c.locked_at == locked_at,
+            _table.c.status_code.is_(None),
+        )
+
+    def complete(
+        self,
+        key: str,
+        route: str,
+        locked_at: datetime,
+        status: int,
+        headers: list,
+        body: bytes,
+    ) -> bool:
+        """False when the claim was lost, to a request that took it over."""
+        with self.engine_factory().begin() as connection:
+            result = connection.execute(
+                update(_table)
+                .where(self._owned(key, route, locked_at))
+                .values(
+                    status_code=status, response_headers=headers, response_body=body
+                )
+            )
+        return result.rowcount == 1
+
+    def release(self, key: str, route: str, locked_at: datetime) -> bool:
+        """False when the claim was lost, to a request that took it over."""
+        with self.engine_factory().begin() as connection:
+            result = connection.execute(
+                delete(_table).where(self._owned(key, route, locked_at))
+            )
+        return result.rowcount == 1
+
+    def purge_expired(self) -> int:
+        with self.engine_factory().begin() as connection:
+            result = connection.execute(
+                delete(_table).where(
+                    _table.c.expires_at < _utcnow(), _table.c.status_code.isnot(None)
+                )
+            )
+        return result.rowcount
+
+
+def hash_request_body(body: bytes) -> str:
+    """Keyed so the stored hash cannot be used to guess a password in the body."""
+    return hmac.new(
+        settings.IDEMPOTENCY_HASH_KEY.encode(), body, hashlib.sha256
+    ).hexdigest()
+
+
+def _is_final(status: Optional[int]) -> bool:
+    # Server errors may succeed on a retry, a stored redirect would send the
+    # client back here with the same key forever
+    return status is not None and (200 <= status < 300 or 400 <= status < 500)
+
+
+async def _send_json(send, status: int, detail: str, headers=()):
+    body = json.dumps({"detail": detail}).encode()
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                *headers,
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _read_body(receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            break
+    return b"".join(chunks)
+
+
+class IdempotencyMiddleware:
+    """Runs a POST with an Idempotency-Key header at most once per key.
+
+    The first request claims the key in the idempotency_keys table and
+    stores its response there, kept for IDEMPOTENCY_TTL_SECONDS. A retry
+    with the same key and body gets the stored response back after one
+    SELECT, with an Idempotent-Replayed header. A duplicate sent while
+    the first request still runs waits for it, up to
+    IDEMPOTENCY_WAIT_TIMEOUT_SECONDS, then gets a 409. Only 2xx and 4xx
+    responses are stored, after anything else the key can be retried.
+
+    Waiters poll the table, waiters in the claiming worker are also woken
+    as soon as the response is stored.
+    """
+
+    def __init__(
+        self,
+        app,
+        routes=None,
+        engine_factory: Callable[[], Engine] = get_engine,
+    ):
+        self.app = app
+        self.routes = {
+            route.rstrip("/")
+            for route in (routes if routes is not None else settings.IDEMPOTENCY_ROUTES)
+        }
+        self.store = IdempotencyStore(engine_factory)
+        self._finished: Dict[Tuple[str, str], asyncio.Event] = {}
+
+    def _key(self, scope) -> Optional[str]:
+        if scope["type"] != "http" or scope["method"] != "POST":
+            return None
+        if scope["path"].rstrip("/") not in self.routes:
+            return None
+        for name, value in scope["headers"]:
+            if name == IDEMPOTENCY_HEADER:
+                return value.decode("latin-1").strip()
+        return None
+
+    async def __call__(self, scope, receive, send):
+        key = self._key(scope)
+        if key is None:
+            await self.app(scope, receive, send)
+            return
+        if not key or len(key) > MAX_KEY_LENGTH:
+            await _send_json(
+                send,
+                400,
+                f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters",
+            )
+            return
+
+        body = await _read_body(receive)
+        route = scope["path"].rstrip("/") + "/"
+        body_hash = hash_request_body(body)
+
+        deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_TIMEOUT_SECONDS
+        row, locked_at = await run_sync_timed(self.store.claim, key, route, body_hash)
+        while row is not None:
+            if row.request_hash != body_hash:
+                await _send_json(
+                    send, 422, "Idempotency-Key was used with a different request"
+                )
+                return
+            if row.status_code is not None:
+                await self._replay(row, send)
+                return
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                await _send_json(
+                    send,
+                    409,
+                    "A request with this Idempotency-Key is still being processed",
+                    [(b"retry-after", b"1")],
+                )
+                return
+            await self._wait(
+                key, route, min(remaining, settings.IDEMPOTENCY_POLL_INTERVAL_MS / 1000)
+            )
+            row, locked_at = await run_sync_timed(
+                self.store.claim, key, route, body_hash
+            )
+
+        await self._run_once(scope, receive, send, key, route, locked_at, body)
+
+    async def _wait(self, key: str, route: str, timeout: float):
+        finished = self._finished.get((key, route))
+        if finished is None:
+            await asyncio.sleep(timeout)
+            return
+        try:
+            await asyncio.wait_for(finished.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _run_once(
+        self, scope, receive, send, key, route, locked_at: datetime, body: bytes
+    ):
+        finished = self._finished[(key, route)] = asyncio.Event()
+        body_sent = False
+        response = {"status": None, "headers": [], "body": []}
+
+        async def receive_body():
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        async def send_and_capture(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["headers"] = [
+                    [name.decode("latin-1"), value.decode("latin-1")]
+                    for name, value in message.get("headers", [])
+                    if name.decode("latin-1").lower() not in _SKIPPED_HEADERS
+                ]
+            elif message["type"] == "http.response.body":
+                response["body"].append(message.get("body", b""))
+            await send(message)
+
+        stored = False
+        try:
+            await self.app(scope, receive_body, send_and_capture)
+            if _is_final(response["status"]):
+                if not await run_sync_timed(
+                    self.store.complete,
+                    key,
+                    route,
+                    locked_at,
+                    response["status"],
+                    response["headers"],
+                    b"".join(response["body"]),
+                ):
+                    logger.warning(
+                        "Idempotency-Key claim was taken over, response not stored"
+                    )
+                stored = True
+        except Exception as e:
+            if response["status"] is not None:
+                # The response is out, only storing it failed
+                logger.warning("Could not store idempotent response: %s", e)
+            else:
+                raise
+        finally:
+            if not stored:
+                try:
+                    await run_sync_timed(self.store.release, key, route, locked_at)
+                except Exception as e:
+                    # The claim expires after IDEMPOTENCY_LOCK_TIMEOUT_SECONDS
+                    logger.warning("Could not release Idempotency-Key: %s", e)
+            finished.set()
+            self._finished.pop((key, route), None)
+
+    async def _replay(self, row: Row, send):
+        headers = [
+            (name.encode("latin-1"), value.encode("latin-1"))
+            for name, value in row.response_headers or []
+        ]
+        headers.append((REPLAYED_HEADER, b"true"))
+        await send(
+            {
+                "type": "http.response.start",
+                "status": row.status_code,
+                "headers": headers,
+            }
+        )
+        await send({"type": "http.response.body", "body": row.response_body or b""})
@@ -0,0 +1,66 @@
+import asyncio
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Callable, Optional
+
+from fastapi.dependencies.models import Dependant
+from fastapi.routing import APIRoute
+
+from app import settings
+from app.core.profiling import profile_current_thread, profiled_handler
+from app.core.threadpool import record_queue_wait
+from app.core.tracing import start_span, traced_handler
+
+_dispatched_at: ContextVar[Optional[float]] = ContextVar("dispatched_at", default=None)
+
+
+async def _mark_dispatch():
+    # Solved last, FastAPI hands a sync endpoint to the threadpool right after
+    _dispatched_at.set(time.perf_counter())
+
+
+@contextmanager
+def _endpoint_scope():
+    with start_span("endpoint"), profile_current_thread():
+        yield
+
+
+def instrument_endpoint(call: Callable) -> Callable:
+    if asyncio.iscoroutinefunction(call):
+
+        @wraps(call)
+        async def instrumented_async(*args, **kwargs):
+            with _endpoint_scope():
+                return await call(*args, **kwargs)
+
+        return instrumented_async
+
+    # Stays sync, so FastAPI runs it and validates its return value in the
+    # threadpool. The queue wait is measured from inside the worker thread.
+    @wraps(call)
+    def instrumented(*args, **kwargs):
+        dispatched_at = _dispatched_at.get()
+        if dispatched_at is not None:
+            record_queue_wait(dispatched_at, time.perf_counter())
+        with _endpoint_scope():
+            return call(*args, **kwargs)
+
+    return instrumented
+
+
+class InstrumentedRoute(APIRoute):
+    """Route with tracing spans and, when enabled, on-demand profiling."""
+
+    def get_route_handler(self) -> Callable:
+        # Replaced before FastAPI builds the handler, which calls the wrapper
+        if not asyncio.iscoroutinefunction(self.endpoint):
+            self.dependant.dependencies.append(
+                Dependant(call=_mark_dispatch, path=self.path_format, use_cache=False)
+            )
+        self.dependant.call = instrument_endpoint(self.endpoint)
+        handler = traced_handler(super().get_route_handler())
+        if settings.PROFILING_ENABLED:
+            handler = profiled_handler(handler, self.path)
+        return handler
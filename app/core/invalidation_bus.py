@@ -0,0 +1,186 @@
+import asyncio
+import json
+import logging
+import os
+import uuid
+from typing import Optional
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app import settings
+from app.core.cache_invalidation import flush_local, invalidate_local, pending_changes
+from app.core.db_timeouts import connect_args_for
+
+logger = logging.getLogger("app")
+
+# Lets a worker skip the notifications it sent itself, it already
+# invalidated its own caches after the commit
+WORKER_ID = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+# Postgres rejects NOTIFY payloads of 8000 bytes or more
+MAX_PAYLOAD_SIZE = 7900
+
+
+def notification_payloads(changes):
+    for table, keys in changes.items():
+        payload = json.dumps(
+            {
+                "origin": WORKER_ID,
+                "table": table,
+                "keys": None if keys is None else sorted(keys),
+            }
+        )
+        if len(payload) > MAX_PAYLOAD_SIZE:
+            payload = json.dumps({"origin": WORKER_ID, "table": table, "keys": None})
+        yield payload
+
+
+@event.listens_for(Session, "before_commit")
+def _notify_other_workers(session):
+    if session.info.get("invalidation_owner") is not None:
+        return
+
+    # commit() only flushes after this hook, flush now to see every change
+    if session.new or session.dirty or session.deleted:
+        session.flush()
+
+    changes = pending_changes(session)
+    if not changes:
+        return
+
+    connection = session.connection()
+    if connection.dialect.name != "postgresql":
+        return
+
+    # Sent inside the transaction, Postgres delivers it only on commit
+    for payload in notification_payloads(changes):
+        connection.execute(
+            text("SELECT pg_notify(:channel, :payload)"),
+            {"channel": settings.CACHE_INVALIDATION_CHANNEL, "payload": payload},
+        )
+
+
+def handle_notification(payload: str):
+    try:
+        message = json.loads(payload)
+    except ValueError:
+        logger.warning("Ignoring malformed cache invalidation: %s", payload)
+        return
+
+    if message.get("origin") == WORKER_ID:
+        return
+
+    keys = message.get("keys")
+    invalidate_local({message["table"]: None if keys is None else set(keys)})
+
+
+def _ping(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1")
+
+
+def _close_quietly(connection):
+    try:
+        connection.close()
+    except Exception:
+        pass
+
+
+class InvalidationListener:
+    """Listens for invalidations from other workers and evicts local entries.
+
+    Notifications sent while the connection is down are lost, so every
+    local cache is flushed whenever the listener (re)connects.
+    """
+
+    def __init__(self, engine: Engine, channel: str):
+        self.engine = engine
+        self.channel = channel
+        self.connected = False
+        self._task: Optional[asyncio.Task] = None
+
+    def _connect(self):
+        dialect = self.engine.dialect
+        cargs, cparams = dialect.create_connect_args(self.engine.url)
+        # Same connect timeout and options as the pooled connections
+        cparams.update(connect_args_for(self.engine.url))
+        connection = dialect.connect(*cargs, **cparams)
+        connection.autocommit = True
+        with connection.cursor() as cursor:
+            cursor.execute(f'LISTEN "{self.channel}"')
+        return connection
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        backoff = settings.CACHE_INVALIDATION_RECONNECT_MIN_SECONDS
+
+        while True:
+            connection = None
+            try:
+                connection = await loop.run_in_executor(None, self._connect)
+                self.connected = True
+                backoff = settings.CACHE_INVALIDATION_RECONNECT_MIN_SECONDS
+                await loop.run_in_executor(None, flush_local)
+                logger.info("Listening for cache invalidations on %s", self.channel)
+                await self._listen(loop, connection)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if self.connected:
+                    await loop.run_in_executor(None, flush_local)
+                logger.warning(
+                    "Cache invalidation listener disconnected, retrying in %.1fs: %s",
+                    backoff,
+                    e,
+                )
+            finally:
+                self.connected = False
+                if connection is not None:
+                    # May wait for a keepalive still stuck on the connection
+                    loop.run_in_executor(None, _close_quietly, connection)
+
+            await asyncio.sleep(backoff)
+            backoff = min(
+                backoff * 2, settings.CACHE_INVALIDATION_RECONNECT_MAX_SECONDS
+            )
+
+    async def _listen(self, loop, connection):
+        readable = asyncio.Event()
+        loop.add_reader(connection.fileno(), readable.set)
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(
+                        readable.wait(), settings.CACHE_INVALIDATION_KEEPALIVE_SECONDS
+                    )
+                except asyncio.TimeoutError:
+                    # A silent channel and a dead connection look the same. A
+                    # half-open connection blocks the ping, so it runs off the
+                    # loop and is given up on after another interval.
+                    await asyncio.wait_for(
+                        loop.run_in_executor(None, _ping, connection),
+                        settings.CACHE_INVALIDATION_KEEPALIVE_SECONDS,
+                    )
+                readable.clear()
+                connection.poll()
+                while connection.notifies:
+                    # Invalidating may write to a shared cache file, not on the loop
+                    await loop.run_in_executor(
+                        None, handle_notification, connection.notifies.pop(0).payload
+                    )
+        finally:
+            loop.remove_reader(connection.fileno())
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
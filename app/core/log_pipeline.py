@@ -0,0 +1,160 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from app import settings
+
+TEXT_FORMAT = "%(asctime)s - %(levelname)s - %(name)s - %(message)s"
+# Attributes every LogRecord has, anything else was passed through extra=
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, fields passed with ``extra=`` included."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "process": record.process,
+            "thread": record.threadName,
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry["stack"] = self.formatStack(record.stack_info)
+        return json.dumps(entry, default=str)
+
+
+class LoggerNameFilter(logging.Filter):
+    """Passes records from the ``include`` loggers and not from ``exclude``."""
+
+    def __init__(self, include=(), exclude=()):
+        super().__init__()
+        self.include = tuple(include)
+        self.exclude = tuple(exclude)
+
+    @staticmethod
+    def _matches(name: str, prefixes) -> bool:
+        return any(
+            name == prefix or name.startswith(prefix + ".") for prefix in prefixes
+        )
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.include and not self._matches(record.name, self.include):
+            return False
+        return not self._matches(record.name, self.exclude)
+
+
+class DebugSamplingFilter(logging.Filter):
+    """Keeps ``rate`` of the DEBUG records, every record above DEBUG passes."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return (
+            record.levelno > logging.DEBUG
+            or self.rate >= 1
+            or random.random() < self.rate
+        )
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Drops records when the queue is full instead of blocking the caller."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def _file_handler(filename: str, formatter: logging.Formatter, level=logging.DEBUG):
+    # Rotation is per process, run several workers with LOG_DIR per worker
+    # or log to stdout only
+    handler = RotatingFileHandler(
+        os.path.join(settings.LOG_DIR, filename),
+        maxBytes=settings.LOG_MAX_BYTES,
+        backupCount=settings.LOG_BACKUP_COUNT,
+        encoding="utf-8",
+        delay=True,
+    )
+    handler.setLevel(level)
+    handler.setFormatter(formatter)
+    return handler
+
+
+def configure_logging() -> QueueListener:
+    """Route every record through a queue, handlers run in a listener thread.
+
+    Request threads only format the message and enqueue the record, file
+    writes and rotation happen in the background. Loggers keep their old
+    destinations: everything except slow_query goes to stdout and dev.log,
+    "app" and "users" also to their own file, slow_query only to its own.
+    """
+    if settings.LOG_FORMAT == "json":
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter(TEXT_FORMAT)
+
+    os.makedirs(settings.LOG_DIR, exist_ok=True)
+    console = logging.StreamHandler(sys.stdout)
+    console.setFormatter(formatter)
+    handlers = [console, _file_handler("dev.log", formatter)]
+    for handler in handlers:
+        handler.addFilter(LoggerNameFilter(exclude=["slow_query"]))
+
+    for name in ("app", "users", "slow_query"):
+        handler = _file_handler(f"{name}.log", formatter)
+        handler.addFilter(LoggerNameFilter(include=[name]))
+        handlers.append(handler)
+
+    queue_handler = NonBlockingQueueHandler(queue.Queue(settings.LOG_QUEUE_SIZE))
+    queue_handler.addFilter(DebugSamplingFilter(settings.LOG_DEBUG_SAMPLE_RATE))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(settings.LOG_LEVELS.get("root", "INFO"))
+
+    for name in ("app", "users"):
+        logging.getLogger(name).setLevel(settings.LOG_LEVEL)
+    logging.getLogger("slow_query").setLevel(logging.WARNING)
+    for name, level in settings.LOG_LEVELS.items():
+        if name != "root":
+            logging.getLogger(name).setLevel(level)
+
+    listener = QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+
+def stop_logging(listener: QueueListener):
+    """Write out the queued records and close the files, on app shutdown."""
+    atexit.unregister(listener.stop)
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        if isinstance(handler, QueueHandler) and handler.queue is listener.queue:
+            root.removeHandler(handler)
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
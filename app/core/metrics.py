@@ -0,0 +1,235 @@
+import os
+import time
+from typing import Callable, Dict, Tuple
+
+from anyio import to_thread
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from starlette.routing import Match
+
+from app import settings
+from app.core.single_flight import single_flight_stats
+
+KNOWN_METHODS = {"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"}
+
+REQUESTS = Counter(
+    "http_requests_total", "HTTP requests", ["method", "route", "status"]
+)
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency",
+    ["method", "route"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "HTTP requests being served",
+    ["method"],
+    multiprocess_mode="livesum",
+)
+THREADPOOL_BUSY = Gauge(
+    "threadpool_busy_threads",
+    "Worker threads running sync routes",
+    multiprocess_mode="livesum",
+)
+THREADPOOL_SIZE = Gauge(
+    "threadpool_size", "Worker threads available", multiprocess_mode="livesum"
+)
+THREADPOOL_WAITING = Gauge(
+    "threadpool_waiting_tasks",
+    "Sync calls queued for a worker thread",
+    multiprocess_mode="livesum",
+)
+THREADPOOL_QUEUE_WAIT = Histogram(
+    "threadpool_queue_wait_seconds",
+    "Time sync routes waited for a worker thread",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0),
+)
+ADMISSION_LIMIT = Gauge(
+    "admission_concurrency_limit",
+    "Adaptive concurrency limit",
+    multiprocess_mode="livesum",
+)
+ADMISSION_IN_FLIGHT = Gauge(
+    "admission_in_flight_requests",
+    "Requests admitted and not finished",
+    multiprocess_mode="livesum",
+)
+ADMISSION_REJECTED = Counter(
+    "admission_rejected_total", "Requests shed with a 503", ["priority"]
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out_connections",
+    "Connections in use",
+    ["engine"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_SIZE = Gauge(
+    "db_pool_size", "Configured pool size", ["engine"], multiprocess_mode="livesum"
+)
+DB_POOL_OVERFLOW = Gauge(
+    "db_pool_overflow_connections",
+    "Connections opened beyond the pool size",
+    ["engine"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_CHECKOUTS = Counter("db_pool_checkouts_total", "Pool checkouts", ["engine"])
+DB_POOL_WAIT = Counter(
+    "db_pool_checkout_wait_seconds_total",
+    "Time spent waiting for a connection",
+    ["engine"],
+)
+CACHE_HITS = Counter("cache_hits_total", "Cache hits", ["cache"])
+CACHE_MISSES = Counter("cache_misses_total", "Cache misses", ["cache"])
+SINGLE_FLIGHT_COALESCED = Counter(
+    "single_flight_coalesced_total",
+    "Requests that waited for an identical lookup in flight",
+    ["group"],
+)
+BCRYPT_PENDING = Gauge(
+    "bcrypt_hashes_pending",
+    "Password hashes queued or running",
+    multiprocess_mode="livesum",
+)
+
+# cache name -> () returning (hits, misses) counted since process start
+_cache_stats: Dict[str, Callable[[], Tuple[int, int]]] = {}
+# engine name -> engine, the DB pools to report
+_engine_sources: Callable[[], dict] = dict
+# Last cumulative value seen per counter child, to add only the difference
+_last_totals: Dict[tuple, float] = {}
+
+
+def register_cache_stats(name: str, stats: Callable[[], Tuple[int, int]]):
+    _cache_stats[name] = stats
+
+
+def register_engine_source(engines: Callable[[], dict]):
+    global _engine_sources
+    _engine_sources = engines
+
+
+def _add_total(counter, labels: tuple, total: float):
+    key = (counter, labels)
+    delta = total - _last_totals.get(key, 0)
+    _last_totals[key] = total
+    if delta > 0:
+        counter.labels(*labels).inc(delta)
+
+
+def sample_threadpool():
+    """Threadpool gauges, only on the event loop that owns the limiter."""
+    limiter = to_thread.current_default_thread_limiter()
+    THREADPOOL_BUSY.set(limiter.borrowed_tokens)
+    THREADPOOL_SIZE.set(limiter.total_tokens)
+    THREADPOOL_WAITING.set(limiter.statistics().tasks_waiting)
+
+
+def sample_state():
+    sample_threadpool()
+    sample_counters()
+
+
+def sample_counters():
+    """DB pool, cache and single-flight state, from any thread."""
+    for name, engine in _engine_sources().items():
+        pool = engine.pool
+        if hasattr(pool, "checkedout"):
+            DB_POOL_CHECKED_OUT.labels(name).set(pool.checkedout())
+            DB_POOL_SIZE.labels(name).set(pool.size())
+            DB_POOL_OVERFLOW.labels(name).set(max(pool.overflow(), 0))
+        wait_stats = getattr(pool, "wait_stats", None)
+        if wait_stats is not None:
+            _add_total(DB_POOL_CHECKOUTS, (name,), wait_stats.checkouts)
+            _add_total(DB_POOL_WAIT, (name,), wait_stats.total_wait)
+
+    for name, stats in _cache_stats.items():
+        hits, misses = stats()
+        _add_total(CACHE_HITS, (name,), hits)
+        _add_total(CACHE_MISSES, (name,), misses)
+
+    for name, stats in single_flight_stats().items():
+        _add_total(SINGLE_FLIGHT_COALESCED, (name,), stats["coalesced"])
+
+
+def metrics_payload() -> Tuple[bytes, str]:
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_worker_dead():
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(os.getpid())
+
+
+def route_template(scope) -> str:
+    """Template of the route serving the request, "unmatched" for none.
+
+    The router stores the matched route in the shared scope. Requests a
+    middleware answered before routing (cache hits, shed requests,
+    idempotent replays) are matched against the app's routes here.
+    """
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    router = getattr(scope.get("app"), "router", None)
+    for candidate in getattr(router, "routes", ()):
+        match, _ = candidate.matches(scope)
+        if match == Match.FULL:
+            return candidate.path
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    """Counts requests and observes latency per route template.
+
+    Process state (thread pool, DB pools, cache counters) is sampled after
+    a request at most once per METRICS_SAMPLE_INTERVAL, not on every one.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._next_sample = 0.0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"] if scope["method"] in KNOWN_METHODS else "OTHER"
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        in_progress = IN_PROGRESS.labels(method)
+        in_progress.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            duration = time.perf_counter() - start
+            in_progress.dec()
+            path = route_template(scope)
+            REQUESTS.labels(method, path, str(status)).inc()
+            REQUEST_DURATION.labels(method, path).observe(duration)
+
+            now = time.monotonic()
+            if now >= self._next_sample:
+                self._next_sample = now + settings.METRICS_SAMPLE_INTERVAL
+                sample_state()
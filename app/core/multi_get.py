@@ -0,0 +1,32 @@
+from typing import Callable, Hashable, Iterable, List, Sequence, Tuple, TypeVar
+from urllib.parse import quote
+
+from fastapi import Response
+
+T = TypeVar("T")
+
+# Upper bound for ids/slugs in one multi-get request
+MAX_KEYS = 200
+
+
+def in_request_order(
+    rows: Iterable[T], keys: Sequence[Hashable], key_of: Callable[[T], Hashable]
+) -> Tuple[List[T], List[Hashable]]:
+    """Rows in the order their keys were requested, and the keys not found.
+
+    Repeated keys are returned once, at their first position.
+    """
+    rows_by_key = {key_of(row): row for row in rows}
+    found, missing = [], []
+    for key in dict.fromkeys(keys):
+        row = rows_by_key.get(key)
+        if row is None:
+            missing.append(key)
+        else:
+            found.append(row)
+    return found, missing
+
+
+def set_missing_header(response: Response, header: str, missing: Sequence[Hashable]):
+    if missing:
+        response.headers[header] = ",".join(quote(str(key)) for key in missing)
@@ -0,0 +1,53 @@
+import threading
+from typing import Hashable
+
+from app.core.cache_backends import MemoryLRUBackend
+from app.core.cache_invalidation import register_flusher, register_invalidator
+from app.core.metrics import register_cache_stats
+
+
+class NegativeCache:
+    """Remembers lookups that found nothing in ``table``.
+
+    Any committed change to the table, in this worker or announced by
+    another one, drops every entry. A miss is only recorded if no change
+    committed while its query ran, see ``generation``.
+    """
+
+    def __init__(self, table: str, ttl: float, max_entries: int):
+        self.table = table
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = MemoryLRUBackend(max_entries)
+        self._generation = 0
+        self._lock = threading.Lock()
+        register_invalidator(self._invalidate)
+        register_flusher(self.clear)
+        register_cache_stats(f"negative_{table}", lambda: (self.hits, self.misses))
+
+    @property
+    def generation(self) -> int:
+        """Read before running the lookup, pass it to ``add`` on a miss."""
+        return self._generation
+
+    def contains(self, key: Hashable) -> bool:
+        if self._entries.get(key) is None:
+            self.misses += 1
+            return False
+        self.hits += 1
+        return True
+
+    def add(self, key: Hashable, generation: int):
+        with self._lock:
+            if generation == self._generation:
+                self._entries.set(key, True, self.ttl)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def _invalidate(self, table: str, keys=None):
+        if table == self.table:
+            self.clear()
@@ -0,0 +1,242 @@
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional
+
+from anyio import to_thread
+
+from app import settings
+from app.internal.auth import has_internal_token
+
+logger = logging.getLogger("app")
+
+PROFILE_HEADER = "x-profile"
+PROFILE_NAME = re.compile(r"^[\w.-]+\.folded$")
+
+
+class Profile:
+    """Folded stacks sampled from the threads running one request."""
+
+    def __init__(self, method: str, route: str, reason: str):
+        self.method = method
+        self.route = route
+        self.reason = reason
+        self.started_at = time.time()
+        self.duration = 0.0
+        self.stacks = Counter()
+        self.samples = 0
+        self.name = "{}-{}-{}-{}.folded".format(
+            time.strftime("%Y%m%dT%H%M%S", time.gmtime(self.started_at)),
+            method,
+            re.sub(r"[^\w-]+", "_", route).strip("_") or "root",
+            os.urandom(4).hex(),
+        )
+
+    def add_stack(self, stack: str):
+        self.stacks[stack] += 1
+        self.samples += 1
+
+    def folded(self) -> str:
+        """One "frame;frame;frame count" line per stack, root frame first.
+
+        The format read by flamegraph.pl, speedscope and inferno.
+        """
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.items())
+
+    def save(self, directory: str) -> str:
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, self.name)
+        with open(path, "w", encoding="utf-8") as profile_file:
+            profile_file.write(self.folded())
+        _prune(directory, settings.PROFILING_MAX_FILES)
+        return path
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return "{} ({}:{})".format(
+        code.co_name, os.path.basename(code.co_filename), code.co_firstlineno
+    )
+
+
+def fold_stack(frame) -> str:
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class StackSampler:
+    """Samples the stacks of registered threads from a background thread.
+
+    The thread only runs while at least one request is being profiled,
+    with nothing registered the process pays nothing.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._targets: Dict[int, List[Profile]] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, thread_id: int, profile: Profile):
+        with self._lock:
+            self._targets.setdefault(thread_id, []).append(profile)
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="stack-sampler", daemon=True
+                )
+                self._thread.start()
+
+    def remove(self, thread_id: int, profile: Profile):
+        with self._lock:
+            profiles = self._targets.get(thread_id, [])
+            if profile in profiles:
+                profiles.remove(profile)
+            if not profiles:
+                self._targets.pop(thread_id, None)
+
+    def sample(self):
+        frames = sys._current_frames()
+        with self._lock:
+            targets = list(self._targets.items())
+        for thread_id, profiles in targets:
+            frame = frames.get(thread_id)
+            if frame is not None:
+                stack = fold_stack(frame)
+                for profile in profiles:
+                    profile.add_stack(stack)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._targets:
+                    self._thread = None
+                    return
+            self.sample()
+            time.sleep(self.interval)
+
+
+sampler = StackSampler(settings.PROFILING_INTERVAL_MS / 1000)
+# Route template -> fraction of its requests profiled, changed at runtime
+# through /internal/profiles/routes (per worker)
+route_sample_rates: Dict[str, float] = dict(settings.PROFILING_ROUTES)
+_profile_slots = threading.BoundedSemaphore(settings.PROFILING_MAX_CONCURRENT)
+
+_current_profile: ContextVar[Optional[Profile]] = ContextVar(
+    "current_profile", default=None
+)
+
+
+@contextmanager
+def profile_current_thread():
+    """Sample the calling thread while the request it serves is profiled."""
+    profile = _current_profile.get()
+    if profile is None:
+        yield
+        return
+
+    thread_id = threading.get_ident()
+    sampler.add(thread_id, profile)
+    try:
+        yield
+    finally:
+        sampler.remove(thread_id, profile)
+
+
+def _profile_reason(request, route: str) -> Optional[str]:
+    # Profiling costs CPU, INTERNAL_OPEN_ACCESS must not let anyone trigger it
+    if request.headers.get(PROFILE_HEADER) == "1" and has_internal_token(
+        request.headers.get("x-internal-token")
+    ):
+        return "header"
+    rate = route_sample_rates.get(route)
+    if rate and random.random() < rate:
+        return "sampled"
+    return None
+
+
+def profiled_handler(handler: Callable, route: str) -> Callable:
+    """Profile requests asked for by an admin header or a route sample rate.
+
+    Sync endpoints are sampled on their worker thread, async ones on the
+    event loop thread, which also shows whatever else the loop runs
+    meanwhile. The profile name is returned in X-Profile-Id.
+    """
+
+    async def handle(request):
+        reason = _profile_reason(request, route)
+        if reason is None or not _profile_slots.acquire(blocking=False):
+            return await handler(request)
+
+        profile = Profile(request.method, route, reason)
+        token = _current_profile.set(profile)
+        started = time.perf_counter()
+        try:
+            response = await handler(request)
+        finally:
+            _current_profile.reset(token)
+            profile.duration = time.perf_counter() - started
+            _profile_slots.release()
+
+        try:
+            await to_thread.run_sync(profile.save, settings.PROFILING_DIR)
+        except OSError as e:
+            logger.warning("Could not save profile %s: %s", profile.name, e)
+            return response
+        response.headers["X-Profile-Id"] = profile.name
+        logger.info(
+            "Profiled %s %s (%s): %d samples in %.1f ms",
+            profile.method,
+            route,
+            reason,
+            profile.samples,
+            profile.duration * 1000,
+        )
+        return response
+
+    return handle
+
+
+def _prune(directory: str, max_files: int):
+    for entry in list_profiles(directory)[max_files:]:
+        try:
+            os.remove(os.path.join(directory, entry["name"]))
+        except FileNotFoundError:
+            pass
+
+
+def list_profiles(directory: str) -> List[dict]:
+    """Saved profiles, newest first."""
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+
+    profiles = []
+    for name in names:
+        if not PROFILE_NAME.match(name):
+            continue
+        try:
+            stat = os.stat(os.path.join(directory, name))
+        except FileNotFoundError:
+            continue
+        profiles.append({"name": name, "size": stat.st_size, "modified": stat.st_mtime})
+    profiles.sort(key=lambda entry: entry["modified"], reverse=True)
+    return profiles
+
+
+def profile_path(directory: str, name: str) -> Optional[str]:
+    """Path of a saved profile, None for unknown or unsafe names."""
+    if not PROFILE_NAME.match(name):
+        return None
+    path = os.path.join(directory, name)
+    return path if os.path.isfile(path) else None
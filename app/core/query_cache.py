@@ -0,0 +1,92 @@
+import pickle
+from typing import Optional, Sequence
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, loading
+from sqlalchemy.orm.interfaces import UserDefinedOption
+
+from app import settings
+from app.core.cache_backends import MemoryLRUBackend
+from app.core.cache_invalidation import register_flusher, register_invalidator
+from app.core.metrics import register_cache_stats
+from app.db_connection import may_read_stale
+
+_cache = MemoryLRUBackend(settings.QUERY_CACHE_MAX_ENTRIES)
+
+
+class FromCache(UserDefinedOption):
+    """Opt-in query option, the result is served from the query cache.
+
+    Entries are tagged with the tables of every entity the statement loads
+    plus ``tags``, and dropped when a commit touches one of them::
+
+        db.query(Category).options(FromCache()).filter(...).first()
+    """
+
+    def __init__(self, ttl: Optional[float] = None, tags: Sequence[str] = ()):
+        super().__init__()
+        self.ttl = settings.QUERY_CACHE_TTL if ttl is None else ttl
+        self.tags = tuple(tags)
+
+
+def cache_key(orm_execute_state) -> str:
+    compiled = orm_execute_state.statement.compile()
+    parameters = dict(compiled.params)
+    parameters.update(orm_execute_state.parameters or {})
+    return f"{compiled}|{sorted(parameters.items(), key=lambda item: item[0])!r}"
+
+
+def _tables_of(orm_execute_state):
+    tables = set()
+    for mapper in orm_execute_state.all_mappers:
+        tables.update(table.name for table in mapper.tables)
+    return tables
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _serve_from_cache(orm_execute_state):
+    if not orm_execute_state.is_select:
+        return None
+
+    option = next(
+        (
+            opt
+            for opt in orm_execute_state.user_defined_options
+            if isinstance(opt, FromCache)
+        ),
+        None,
+    )
+    if option is None:
+        return None
+
+    key = cache_key(orm_execute_state)
+    cached = _cache.get(key)
+    if cached is None:
+        frozen_result = orm_execute_state.invoke_statement().freeze()
+        if may_read_stale(orm_execute_state.session):
+            return frozen_result()
+        # Pickled so the entry holds detached copies, never the instances
+        # that now belong to this session and may be modified by it
+        _cache.set(
+            key,
+            pickle.dumps(frozen_result),
+            option.ttl,
+            _tables_of(orm_execute_state) | set(option.tags),
+        )
+        return frozen_result()
+
+    return loading.merge_frozen_result(
+        orm_execute_state.session,
+        orm_execute_state.statement,
+        pickle.loads(cached),
+        load=False,
+    )()
+
+
+@register_invalidator
+def _invalidate_table(table: str, keys=None):
+    _cache.invalidate_tags([table])
+
+
+register_flusher(_cache.clear)
+register_cache_stats("query", lambda: (_cache.hits, _cache.misses))
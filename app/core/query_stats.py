@@ -0,0 +1,137 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+
+from app import settings
+from app.core.request_context import (
+    RequestContext,
+    get_request_context,
+    reset_request_context,
+    set_request_context,
+)
+
+logger = logging.getLogger("app")
+
+_captures = []
+
+
+class NPlusOneQueryError(AssertionError):
+    pass
+
+
+class QueryCapture:
+    """Every statement executed, by any engine, while the capture is active."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.statements = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def record(self, statement: str):
+        with self._lock:
+            self.statements.append(statement)
+
+
+@contextmanager
+def capture_queries():
+    capture = QueryCapture()
+    _captures.append(capture)
+    try:
+        yield capture
+    finally:
+        _captures.remove(capture)
+
+
+def query_started_at(conn) -> float:
+    return conn.info["query_started_at"]
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info["query_started_at"] = time.perf_counter()
+
+    request_context = get_request_context()
+    if request_context is not None:
+        request_context.running_connections.add(conn.connection.dbapi_connection)
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    duration = time.perf_counter() - query_started_at(conn)
+
+    for capture in _captures:
+        capture.record(statement)
+
+    request_context = get_request_context()
+    if request_context is not None:
+        request_context.running_connections.discard(conn.connection.dbapi_connection)
+        record_query(request_context, statement, duration)
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(exception_context):
+    request_context = get_request_context()
+    connection = exception_context.connection
+    if request_context is not None and connection is not None:
+        # The connection goes back to the pool, it must not be cancelled later
+        request_context.running_connections.discard(
+            connection.connection.dbapi_connection
+        )
+
+
+def record_query(request_context: RequestContext, statement: str, duration: float):
+    request_context.query_count += 1
+    request_context.query_time += duration
+    request_context.statements[statement] += 1
+
+    if (
+        settings.N_PLUS_ONE_MODE in ("warn", "raise")
+        and request_context.statements[statement] == settings.N_PLUS_ONE_THRESHOLD
+    ):
+        message = (
+            f"Possible N+1 query in {request_context.method} "
+            f"{request_context.route_path}: statement ran "
+            f"{settings.N_PLUS_ONE_THRESHOLD} times: {statement}"
+        )
+        if settings.N_PLUS_ONE_MODE == "raise":
+            raise NPlusOneQueryError(message)
+        logger.warning(message)
+
+
+class QueryStatsMiddleware:
+    """Adds X-DB-Queries and a Server-Timing db entry to every response."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_context = RequestContext(scope)
+        token = set_request_context(request_context)
+
+        async def send_with_stats(message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers["X-DB-Queries"] = str(request_context.query_count)
+                headers.append(
+                    "Server-Timing",
+                    f"db;dur={request_context.query_time * 1000:.1f};"
+                    f'desc="{request_context.query_count} queries"',
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_stats)
+        finally:
+            reset_request_context(token)
@@ -0,0 +1,52 @@
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Optional
+
+
+class RequestContext:
+    """Per-request state shared by middleware, dependencies and DB events.
+
+    The object itself is mutable: sync routes and dependencies run in
+    worker threads with a copy of the context, so they must update this
+    object rather than set context variables of their own.
+    """
+
+    def __init__(self, scope: dict):
+        self.scope = scope
+        self.started_at = time.perf_counter()
+        self.query_count = 0
+        self.query_time = 0.0
+        self.statements = Counter()
+        # DBAPI connections currently executing a statement for this request
+        self.running_connections = set()
+        self.client_disconnected = False
+        # Set when a read replica that may miss recent commits served a query
+        self.read_stale_replica = False
+
+    @property
+    def method(self) -> str:
+        return self.scope.get("method", "")
+
+    @property
+    def route_path(self) -> str:
+        """Route template once routing has happened, the raw path before."""
+        route = self.scope.get("route")
+        return getattr(route, "path", None) or self.scope.get("path", "")
+
+
+_request_context: ContextVar[Optional[RequestContext]] = ContextVar(
+    "request_context", default=None
+)
+
+
+def get_request_context() -> Optional[RequestContext]:
+    return _request_context.get()
+
+
+def set_request_context(context: Optional[RequestContext]):
+    return _request_context.set(context)
+
+
+def reset_request_context(token):
+    _request_context.reset(token)
@@ -0,0 +1,220 @@
+import logging
+import re
+import time
+from typing import Optional, Sequence, Tuple
+
+import anyio
+
+from app import settings
+from app.core.cache_backends import CachedResponse, MemoryLRUBackend, SQLiteBackend
+from app.core.cache_invalidation import register_flusher, register_invalidator
+from app.core.compression import negotiate_encoding
+from app.core.metrics import register_cache_stats
+from app.core.request_context import get_request_context
+
+logger = logging.getLogger("app")
+
+CACHEABLE_STATUS_CODES = {200}
+# Bodies above this size are served but not stored
+MAX_CACHED_BODY_SIZE = 1024 * 1024
+
+# Writes to a blocking backend run here, off the threadpool serving routes
+_write_limiter = None
+
+
+class CacheRule:
+    """GET responses for paths matching ``path_pattern`` are cached.
+
+    ``vary_headers`` become part of the key. ``tags`` are the tables the
+    response is built from: commits touching one of them purge it.
+    """
+
+    def __init__(
+        self,
+        path_pattern: str,
+        ttl: float,
+        tags: Sequence[str] = (),
+        vary_headers: Sequence[str] = (),
+    ):
+        self.path_pattern = re.compile(path_pattern)
+        self.ttl = ttl
+        self.tags = tuple(tags)
+        self.vary_headers = tuple(header.lower() for header in vary_headers)
+
+    def matches(self, path: str) -> bool:
+        return self.path_pattern.match(path) is not None
+
+
+def create_backend():
+    if settings.RESPONSE_CACHE_BACKEND == "memory":
+        return MemoryLRUBackend(settings.RESPONSE_CACHE_MAX_ENTRIES)
+    if settings.RESPONSE_CACHE_BACKEND == "sqlite":
+        return SQLiteBackend(settings.RESPONSE_CACHE_SQLITE_PATH)
+    return None
+
+
+def _header(scope, name: bytes) -> Optional[bytes]:
+    for key, value in scope["headers"]:
+        if key == name:
+            return value
+    return None
+
+
+def _read_stale_replica() -> bool:
+    request_context = get_request_context()
+    return request_context is not None and request_context.read_stale_replica
+
+
+class ResponseCacheMiddleware:
+    """Serves cached GET responses without running the route at all.
+
+    With ``vary_encoding`` the key includes the encoding negotiated from
+    Accept-Encoding, for a CompressionMiddleware placed inside this one.
+
+    A response is only stored if none of its tags was invalidated while
+    the route built it: the backend's tag generations are read before the
+    route runs and checked again by the write.
+    """
+
+    def __init__(
+        self, app, backend, rules: Sequence[CacheRule], vary_encoding: bool = False
+    ):
+        self.app = app
+        self.backend = backend
+        self.rules = rules
+        self.vary_encoding = vary_encoding
+        register_invalidator(self._invalidate)
+        register_flusher(self._flush)
+        register_cache_stats("response", lambda: (backend.hits, backend.misses))
+
+    def _invalidate(self, table: str, keys=None):
+        try:
+            self.backend.invalidate_tags([table])
+        except Exception as e:
+            logger.error("Could not invalidate response cache for %s: %s", table, e)
+
+    def _flush(self):
+        self.backend.clear()
+
+    def _rule_for(self, path: str) -> Optional[CacheRule]:
+        for rule in self.rules:
+            if rule.matches(path):
+                return rule
+        return None
+
+    def _cache_key(self, scope, rule: CacheRule) -> str:
+        parts = [scope["path"], scope.get("query_string", b"").decode("latin-1")]
+        for header in rule.vary_headers:
+            value = _header(scope, header.encode("latin-1")) or b""
+            parts.append(f"{header}={value.decode('latin-1')}")
+        if self.vary_encoding:
+            encoding = negotiate_encoding(_header(scope, b"accept-encoding"))
+            parts.append(f"encoding={encoding or 'identity'}")
+        return "|".join(parts)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["method"] == "GET":
+            rule = self._rule_for(scope["path"])
+            if rule is not None and self._is_cacheable_request(scope, rule):
+                await self._serve_cached(scope, receive, send, rule)
+                return
+
+        await self.app(scope, receive, send)
+
+    def _is_cacheable_request(self, scope, rule: CacheRule) -> bool:
+        for private_header in (b"authorization", b"cookie"):
+            if (
+                private_header.decode() not in rule.vary_headers
+                and _header(scope, private_header) is not None
+            ):
+                return False
+        cache_control = _header(scope, b"cache-control") or b""
+        return b"no-cache" not in cache_control and b"no-store" not in cache_control
+
+    async def _serve_cached(self, scope, receive, send, rule: CacheRule):
+        key = self._cache_key(scope, rule)
+        cached = self.backend.get(key)
+
+        if cached is not None:
+            age = int(time.time() - cached.stored_at)
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": cached.status,
+                    "headers": cached.headers
+                    + [(b"x-cache", b"HIT"), (b"age", str(age).encode())],
+                }
+            )
+            await send({"type": "http.response.body", "body": cached.body})
+            return
+
+        generation = self.backend.generation(rule.tags)
+        start_message = None
+        body = []
+        body_size = 0
+        storable = True
+
+        async def send_and_capture(message):
+            nonlocal start_message, body_size, storable
+
+            if message["type"] == "http.response.start":
+                start_message = message
+                storable = message["status"] in CACHEABLE_STATUS_CODES
+                for name, value in message.get("headers", []):
+                    if name.lower() == b"cache-control" and (
+                        b"no-store" in value or b"private" in value
+                    ):
+                        storable = False
+                message = dict(message)
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-cache", b"MISS")
+                ]
+            elif message["type"] == "http.response.body" and storable:
+                chunk = message.get("body", b"")
+                body_size += len(chunk)
+                if body_size > MAX_CACHED_BODY_SIZE:
+                    storable = False
+                    body.clear()
+                else:
+                    body.append(chunk)
+                if (
+                    not message.get("more_body", False)
+                    and storable
+                    and not _read_stale_replica()
+                ):
+                    await self._store(
+                        key, rule, generation, start_message, b"".join(body)
+                    )
+
+            await send(message)
+
+        await self.app(scope, receive, send_and_capture)
+
+    async def _store(
+        self, key: str, rule: CacheRule, generation: Tuple, start_message, body: bytes
+    ):
+        value = CachedResponse(
+            status=start_message["status"],
+            headers=list(start_message.get("headers", [])),
+            body=body,
+            stored_at=time.time(),
+        )
+        if not self.backend.blocking_writes:
+            self._store_if_current(key, rule, generation, value)
+            return
+
+        global _write_limiter
+
+        if _write_limiter is None:
+            _write_limiter = anyio.CapacityLimiter(4)
+        await anyio.to_thread.run_sync(
+            self._store_if_current, key, rule, generation, value, limiter=_write_limiter
+        )
+
+    def _store_if_current(
+        self, key: str, rule: CacheRule, generation: Tuple, value: CachedResponse
+    ):
+        try:
+            self.backend.set(key, value, rule.ttl, rule.tags, generation=generation)
+        except Exception as e:
+            logger.error("Could not store response in cache: %s", e)
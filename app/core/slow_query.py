@@ -0,0 +1,113 @@
+import json
+import logging
+import random
+import time
+
+from app import settings
+from app.core.query_stats import query_started_at
+from app.core.rate_limit import TokenBucket
+from app.core.request_context import get_request_context
+
+logger = logging.getLogger("app")
+slow_query_logger = logging.getLogger("slow_query")
+
+_log_bucket = TokenBucket(settings.SLOW_QUERY_LOG_PER_SECOND)
+_explain_bucket = TokenBucket(
+    settings.SLOW_QUERY_EXPLAIN_PER_MINUTE / 60,
+    capacity=max(settings.SLOW_QUERY_EXPLAIN_PER_MINUTE, 1.0),
+)
+_suppressed = 0
+
+MAX_PARAMETER_LENGTH = 200
+
+
+def slow_query_threshold_ms(route_path: str = None) -> float:
+    return settings.SLOW_QUERY_ROUTE_THRESHOLDS_MS.get(
+        route_path, settings.SLOW_QUERY_THRESHOLD_MS
+    )
+
+
+def redact_parameters(parameters):
+    if isinstance(parameters, dict):
+        return {
+            key: "***" if "password" in key else redact_parameters(value)
+            for key, value in parameters.items()
+        }
+    if isinstance(parameters, (list, tuple)):
+        return [redact_parameters(value) for value in parameters]
+    if isinstance(parameters, str) and len(parameters) > MAX_PARAMETER_LENGTH:
+        return parameters[:MAX_PARAMETER_LENGTH] + "..."
+    return parameters
+
+
+def _can_explain(conn, statement: str, executemany: bool) -> bool:
+    return (
+        conn.dialect.name == "postgresql"
+        and not executemany
+        and statement.lstrip()[:6].upper() == "SELECT"
+    )
+
+
+def explain_analyze(conn, statement: str, parameters) -> list:
+    """Run EXPLAIN (ANALYZE, BUFFERS) on the connection that ran the query.
+
+    A raw DBAPI cursor keeps the EXPLAIN out of the engine events, and a
+    savepoint keeps a failed EXPLAIN from aborting the caller's transaction.
+    """
+    dbapi_connection = conn.connection.dbapi_connection
+    in_transaction = not getattr(dbapi_connection, "autocommit", False)
+    cursor = dbapi_connection.cursor()
+
+    try:
+        if in_transaction:
+            cursor.execute("SAVEPOINT slow_query_explain")
+        try:
+            cursor.execute("EXPLAIN (ANALYZE, BUFFERS) " + statement, parameters)
+            plan = [row[0] for row in cursor.fetchall()]
+        except Exception:
+            if in_transaction:
+                cursor.execute("ROLLBACK TO SAVEPOINT slow_query_explain")
+            raise
+        if in_transaction:
+            cursor.execute("RELEASE SAVEPOINT slow_query_explain")
+        return plan
+    finally:
+        cursor.close()
+
+
+def log_slow_query(conn, cursor, statement, parameters, context, executemany):
+    global _suppressed
+
+    duration_ms = (time.perf_counter() - query_started_at(conn)) * 1000
+    request_context = get_request_context()
+    route_path = request_context.route_path if request_context else None
+
+    if duration_ms < slow_query_threshold_ms(route_path):
+        return
+
+    if not _log_bucket.acquire():
+        _suppressed += 1
+        return
+
+    entry = {
+        "duration_ms": round(duration_ms, 3),
+        "route": (
+            f"{request_context.method} {route_path}" if request_context else None
+        ),
+        "statement": statement,
+        "parameters": redact_parameters(parameters),
+    }
+    if _suppressed:
+        entry["suppressed_since_last"], _suppressed = _suppressed, 0
+
+    if (
+        _can_explain(conn, statement, executemany)
+        and random.random() < settings.SLOW_QUERY_EXPLAIN_SAMPLE_RATE
+        and _explain_bucket.acquire()
+    ):
+        try:
+            entry["explain"] = explain_analyze(conn, statement, parameters)
+        except Exception as e:
+            logger.warning("EXPLAIN of slow query failed: %s", e)
+
+    slow_query_logger.warning(json.dumps(entry, default=str))
@@ -0,0 +1,109 @@
+import logging
+import threading
+import time
+from typing import Callable, TypeVar
+
+from anyio import to_thread
+
+from app import settings
+from app.core.metrics import THREADPOOL_QUEUE_WAIT
+from app.core.tracing import record_span
+
+logger = logging.getLogger("app")
+
+T = TypeVar("T")
+
+
+class QueueWaitStats:
+    """How long sync calls waited for a free worker thread."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.slow_calls = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record(self, wait: float):
+        with self._lock:
+            self.calls += 1
+            self.total_wait += wait
+            if wait > self.max_wait:
+                self.max_wait = wait
+            if wait * 1000 >= settings.THREADPOOL_WAIT_WARNING_MS:
+                self.slow_calls += 1
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "slow_calls": self.slow_calls,
+                "total_wait_ms": round(self.total_wait * 1000, 3),
+                "avg_wait_ms": round(
+                    self.total_wait * 1000 / self.calls if self.calls else 0.0, 3
+                ),
+                "max_wait_ms": round(self.max_wait * 1000, 3),
+            }
+
+
+queue_wait_stats = QueueWaitStats()
+
+
+def threadpool_size() -> int:
+    """THREADPOOL_SIZE, or enough threads to use every pooled DB connection.
+
+    More threads than connections only adds threads blocked in pool
+    checkout, each holding a request that could have waited cheaply on
+    the event loop. The extra threads cover sync dependencies and routes
+    that do not touch the database.
+    """
+    if settings.THREADPOOL_SIZE > 0:
+        return settings.THREADPOOL_SIZE
+    engines = 1 + len(settings.REPLICA_DATABASE_URLS)
+    connections = (settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW) * engines
+    return connections + settings.THREADPOOL_EXTRA_THREADS
+
+
+def configure_threadpool() -> int:
+    """Resize the default AnyIO limiter, called from the app lifespan.
+
+    The limiter belongs to the running event loop, so this cannot run at
+    import time.
+    """
+    size = threadpool_size()
+    to_thread.current_default_thread_limiter().total_tokens = size
+    logger.info("Threadpool size set to %d threads", size)
+    return size
+
+
+def threadpool_status() -> dict:
+    limiter = to_thread.current_default_thread_limiter()
+    statistics = limiter.statistics()
+    return {
+        "size": limiter.total_tokens,
+        "busy": limiter.borrowed_tokens,
+        "waiting": statistics.tasks_waiting,
+        "queue_wait": queue_wait_stats.as_dict(),
+    }
+
+
+def record_queue_wait(queued_at: float, started_at: float):
+    """Record a call handed to the threadpool at ``queued_at`` that a worker
+    thread picked up at ``started_at``, both from time.perf_counter()."""
+    wait = started_at - queued_at
+    queue_wait_stats.record(wait)
+    THREADPOOL_QUEUE_WAIT.observe(wait)
+    record_span("threadpool.wait", queued_at, started_at)
+    if wait * 1000 >= settings.THREADPOOL_WAIT_WARNING_MS:
+        logger.warning("Waited %.1f ms for a worker thread", wait * 1000)
+
+
+async def run_sync_timed(func: Callable[..., T], *args, **kwargs) -> T:
+    """Run ``func`` in the default threadpool, recording the queue wait."""
+    queued_at = time.perf_counter()
+
+    def run():
+        record_queue_wait(queued_at, time.perf_counter())
+        return func(*args, **kwargs)
+
+    return await to_thread.run_sync(run)
@@ -0,0 +1,447 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from logging.handlers import QueueListener, RotatingFileHandler
+from typing import Callable, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app import settings
+from app.core.log_pipeline import NonBlockingQueueHandler
+from app.core.query_stats import query_started_at
+
+logger = logging.getLogger("app")
+
+# Spans keep perf_counter_ns timestamps, exporters shift them to unix time
+_EPOCH_OFFSET_NS = time.time_ns() - time.perf_counter_ns()
+# Browsing traces or scraping metrics should not fill the ring buffer
+UNTRACED_PREFIXES = ("/internal/", "/metrics")
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+
+def _new_id(nbytes: int) -> str:
+    return os.urandom(nbytes).hex()
+
+
+class Span:
+    __slots__ = (
+        "trace",
+        "span_id",
+        "parent_id",
+        "name",
+        "start",
+        "end",
+        "attributes",
+        "error",
+    )
+
+    def __init__(self, trace, name: str, parent_id: Optional[str], start: int):
+        self.trace = trace
+        self.span_id = _new_id(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.start = start
+        self.end = None
+        self.attributes = {}
+        self.error = None
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end or self.start) - self.start) / 1_000_000
+
+
+class Trace:
+    """Spans of one request, appended to from the event loop and threads."""
+
+    def __init__(self, trace_id: Optional[str] = None, sampled: bool = True):
+        self.trace_id = trace_id or _new_id(16)
+        self.sampled = sampled
+        self.spans: List[Span] = []
+        self.dropped_spans = 0
+
+    def add(self, span: Span):
+        if len(self.spans) < settings.TRACING_MAX_SPANS:
+            self.spans.append(span)
+        else:
+            self.dropped_spans += 1
+
+    @property
+    def root(self) -> Span:
+        return self.spans[0]
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+@contextmanager
+def start_span(name: str, **attributes):
+    """Child of the current span, a no-op when the request is not traced."""
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+
+    span = Span(parent.trace, name, parent.span_id, time.perf_counter_ns())
+    span.attributes.update(attributes)
+    parent.trace.add(span)
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.error = repr(e)
+        raise
+    finally:
+        span.end = time.perf_counter_ns()
+        _current_span.reset(token)
+
+
+def record_span(
+    name: str, start: float, end: float, error: Optional[str] = None, **attributes
+) -> Optional[Span]:
+    """Add an already timed child span, ``start`` and ``end`` from perf_counter."""
+    parent = _current_span.get()
+    if parent is None:
+        return None
+
+    span = Span(parent.trace, name, parent.span_id, int(start * 1_000_000_000))
+    span.end = int(end * 1_000_000_000)
+    span.attributes.update(attributes)
+    span.error = error
+    parent.trace.add(span)
+    return span
+
+
+class RingBufferExporter:
+    """Keeps the last ``capacity`` exported traces in memory."""
+
+    def __init__(self, capacity: int):
+        self._lock = threading.Lock()
+        self._traces = deque(maxlen=capacity)
+
+    def export(self, trace: Trace):
+        with self._lock:
+            self._traces.append(trace)
+
+    def clear(self):
+        with self._lock:
+            self._traces.clear()
+
+    def traces(self) -> List[Trace]:
+        """Newest first."""
+        with self._lock:
+            return list(reversed(self._traces))
+
+    def get(self, trace_id: str) -> Optional[Trace]:
+        with self._lock:
+            for trace in self._traces:
+                if trace.trace_id == trace_id:
+                    return trace
+        return None
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        # OTLP JSON encodes 64 bit integers as strings
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: dict) -> list:
+    return [
+        {"key": key, "value": _otlp_value(value)} for key, value in attributes.items()
+    ]
+
+
+def to_otlp(trace: Trace, service_name: str) -> dict:
+    """ExportTraceServiceRequest in the OTLP/JSON encoding."""
+    spans = []
+    for span in trace.spans:
+        otlp_span = {
+            "traceId": trace.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            # SPAN_KIND_SERVER for the request, SPAN_KIND_INTERNAL otherwise
+            "kind": 2 if span is trace.root else 1,
+            "startTimeUnixNano": str(span.start + _EPOCH_OFFSET_NS),
+            "endTimeUnixNano": str((span.end or span.start) + _EPOCH_OFFSET_NS),
+            "attributes": _otlp_attributes(span.attributes),
+            # STATUS_CODE_ERROR or STATUS_CODE_UNSET
+            "status": {"code": 2, "message": span.error} if span.error else {},
+        }
+        if span.parent_id:
+            otlp_span["parentSpanId"] = span.parent_id
+        spans.append(otlp_span)
+
+    return {
+        "resourceSpans": [
+            {
+                "resource": {
+                    "attributes": _otlp_attributes({"service.name": service_name})
+                },
+                "scopeSpans": [{"scope": {"name": __name__}, "spans": spans}],
+            }
+        ]
+    }
+
+
+class OTLPFileExporter:
+    """Appends one OTLP/JSON line per trace, written by a background thread.
+
+    The files can be replayed into a collector with the otlpjsonfile
+    receiver.
+    """
+
+    def __init__(self, path: str, service_name: str):
+        self.service_name = service_name
+        handler = RotatingFileHandler(
+            path,
+            maxBytes=settings.LOG_MAX_BYTES,
+            backupCount=settings.LOG_BACKUP_COUNT,
+            encoding="utf-8",
+            delay=True,
+        )
+        self._queue_handler = NonBlockingQueueHandler(
+            queue.Queue(settings.LOG_QUEUE_SIZE)
+        )
+        self._listener = QueueListener(self._queue_handler.queue, handler)
+        self._listener.start()
+
+    def export(self, trace: Trace):
+        # Encoding happens in the listener thread, the record only holds the trace
+        self._queue_handler.enqueue(
+            logging.makeLogRecord({"msg": "%s", "args": (_OTLPLine(self, trace),)})
+        )
+
+    @property
+    def dropped(self) -> int:
+        return self._queue_handler.dropped
+
+    def stop(self):
+        self._listener.stop()
+
+
+class _OTLPLine:
+    def __init__(self, exporter: OTLPFileExporter, trace: Trace):
+        self.exporter = exporter
+        self.trace = trace
+
+    def __str__(self) -> str:
+        return json.dumps(
+            to_otlp(self.trace, self.exporter.service_name), separators=(",", ":")
+        )
+
+
+ring_buffer = RingBufferExporter(settings.TRACING_BUFFER_SIZE)
+exporters: List = [ring_buffer]
+
+
+def configure_tracing():
+    """Add the OTLP file exporter when TRACING_OTLP_FILE is set."""
+    if settings.TRACING_OTLP_FILE:
+        exporter = OTLPFileExporter(
+            settings.TRACING_OTLP_FILE, settings.TRACING_SERVICE_NAME
+        )
+        exporters.append(exporter)
+        atexit.register(exporter.stop)
+
+
+def stop_tracing():
+    """Stop and drop the exporters added by configure_tracing()."""
+    while len(exporters) > 1:
+        exporter = exporters.pop()
+        atexit.unregister(exporter.stop)
+        exporter.stop()
+
+
+def export(trace: Trace):
+    for exporter in exporters:
+        try:
+            exporter.export(trace)
+        except Exception as e:
+            logger.warning("Trace exporter %s failed: %s", type(exporter).__name__, e)
+
+
+def _parse_traceparent(headers) -> Optional[tuple]:
+    for name, value in headers:
+        if name == b"traceparent":
+            match = _TRACEPARENT.match(value.decode("latin-1").strip().lower())
+            if match:
+                trace_id, parent_id, flags = match.groups()
+                return trace_id, parent_id, int(flags, 16) & 1 == 1
+    return None
+
+
+class TracingMiddleware:
+    """Opens the request span and times writing the response.
+
+    Requests are sampled with TRACING_SAMPLE_RATE, or when a W3C traceparent
+    header says the caller sampled them. With TRACING_SLOW_THRESHOLD_MS set
+    every request is recorded and the unsampled ones are still exported
+    when they turn out slower than the threshold. That puts the full cost
+    of tracing, spans for every query included, on every request, so the
+    threshold is off by default.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(UNTRACED_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+
+        parent_id = None
+        trace_id = None
+        sampled = random.random() < settings.TRACING_SAMPLE_RATE
+        traceparent = _parse_traceparent(scope.get("headers", ()))
+        if traceparent is not None:
+            trace_id, parent_id, parent_sampled = traceparent
+            sampled = sampled or parent_sampled
+        if not sampled and settings.TRACING_SLOW_THRESHOLD_MS <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace(trace_id, sampled)
+        root = Span(trace, scope["method"], parent_id, time.perf_counter_ns())
+        root.attributes.update(
+            {"http.method": scope["method"], "http.target": scope["path"]}
+        )
+        trace.add(root)
+        write = {}
+
+        async def send_with_span(message):
+            if message["type"] == "http.response.start":
+                root.attributes["http.status_code"] = message["status"]
+                message.setdefault("headers", []).append(
+                    (b"x-trace-id", trace.trace_id.encode())
+                )
+                write["start"] = time.perf_counter_ns()
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get(
+                "more_body", False
+            ):
+                write["end"] = time.perf_counter_ns()
+
+        token = _current_span.set(root)
+        try:
+            await self.app(scope, receive, send_with_span)
+        except BaseException as e:
+            root.error = repr(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            root.end = time.perf_counter_ns()
+            if "start" in write:
+                span = Span(trace, "http.response.write", root.span_id, write["start"])
+                span.end = write.get("end", root.end)
+                trace.add(span)
+
+            route = scope.get("route")
+            route_path = getattr(route, "path", None)
+            if route_path:
+                root.name = f"{scope['method']} {route_path}"
+                root.attributes["http.route"] = route_path
+            root.attributes["db.query_count"] = sum(
+                span.name == "db.query" for span in trace.spans
+            )
+
+            if trace.sampled or root.duration_ms >= settings.TRACING_SLOW_THRESHOLD_MS:
+                export(trace)
+
+
+def traced_handler(handler: Callable) -> Callable:
+    """Splits a route handler into dependencies, endpoint and serialization.
+
+    Dependencies covers body parsing and dependency resolution, up to the
+    "endpoint" span opened around the endpoint call. Serialization is
+    everything after it: response_model validation, encoding and building
+    the response.
+    """
+
+    async def handle(request):
+        if _current_span.get() is None:
+            return await handler(request)
+
+        with start_span("route") as span:
+            try:
+                return await handler(request)
+            finally:
+                _split_route_span(span)
+
+    return handle
+
+
+def _split_route_span(span: Span):
+    now = time.perf_counter_ns()
+    trace = span.trace
+    children = {
+        child.name: child
+        for child in trace.spans
+        if child.parent_id == span.span_id
+        and child.name in ("threadpool.wait", "endpoint")
+    }
+    endpoint = children.get("endpoint")
+    # Sync endpoints wait for a worker thread before they start
+    first = children.get("threadpool.wait", endpoint)
+
+    dependencies = Span(trace, "dependencies", span.span_id, span.start)
+    dependencies.end = first.start if first is not None else now
+    trace.add(dependencies)
+    if endpoint is not None and endpoint.end is not None:
+        serialize = Span(trace, "serialize", span.span_id, endpoint.end)
+        serialize.end = now
+        trace.add(serialize)
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_span.get() is not None:
+        record_span(
+            "db.query",
+            query_started_at(conn),
+            time.perf_counter(),
+            **_statement_attributes(conn, statement),
+            **{"db.rows": cursor.rowcount},
+        )
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(exception_context):
+    conn = exception_context.connection
+    if (
+        _current_span.get() is not None
+        and conn is not None
+        and "query_started_at" in conn.info
+    ):
+        record_span(
+            "db.query",
+            query_started_at(conn),
+            time.perf_counter(),
+            error=repr(exception_context.original_exception),
+            **_statement_attributes(conn, exception_context.statement or ""),
+        )
+
+
+def _statement_attributes(conn, statement: str) -> dict:
+    return {
+        "db.system": conn.dialect.name,
+        "db.statement": statement[: settings.TRACING_MAX_STATEMENT_LENGTH],
+    }
@@ -1,13 +1,155 @@
-import os
+import threading
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.orm import Session, declarative_base, sessionmaker
 
-DEV_DATABASE_URL = os.getenv("DEV_DATABASE_URL")
+from app import settings
+from app.core.cache_invalidation import register_invalidator
+from app.core.db_pool import InstrumentedQueuePool
+from app.core.db_replicas import ReplicaRouter
+from app.core.db_timeouts import connect_args_for
+from app.core.request_context import get_request_context
+from app.core.slow_query import log_slow_query
 
-engine = create_engine(DEV_DATABASE_URL)
+_engine = None
+_replica_router = None
+_engine_lock = threading.Lock()
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=True, bind=engine)
+
+def _create_engine(url):
+    engine = create_engine(
+        url,
+        poolclass=InstrumentedQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        connect_args=connect_args_for(make_url(url)),
+    )
+    event.listen(engine, "after_cursor_execute", log_slow_query)
+    return engine
+
+
+def get_engine() -> Engine:
+    """Primary engine, created on first use."""
+    global _engine
+
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                if not settings.DEV_DATABASE_URL:
+                    raise RuntimeError("DEV_DATABASE_URL is not set")
+                _engine = _create_engine(settings.DEV_DATABASE_URL)
+    return _engine
+
+
+def get_replica_router() -> ReplicaRouter:
+    global _replica_router
+
+    if _replica_router is None:
+        primary = get_engine()
+        with _engine_lock:
+            if _replica_router is None:
+                _replica_router = ReplicaRouter(
+                    primary,
+                    [_create_engine(url) for url in settings.REPLICA_DATABASE_URLS],
+                    max_lag=settings.DB_REPLICA_MAX_LAG_SECONDS,
+                    check_interval=settings.DB_REPLICA_CHECK_INTERVAL,
+                )
+    return _replica_router
+
+
+def active_engines() -> dict:
+    """Engines created so far by name, never creates one."""
+    engines = {}
+    if _engine is not None:
+        engines["primary"] = _engine
+    if _replica_router is not None:
+        for index, replica in enumerate(_replica_router.replicas):
+            engines[f"replica{index}"] = replica
+    return engines
+
+
+def init_db():
+    """Create the engines and pools up front, called from the app lifespan."""
+    get_replica_router().check_all()
+
+
+def dispose_db():
+    global _engine, _replica_router
+
+    with _engine_lock:
+        if _replica_router is not None:
+            for replica in _replica_router.replicas:
+                replica.dispose()
+        if _engine is not None:
+            _engine.dispose()
+        _engine = None
+        _replica_router = None
+
+
+class LazySession(Session):
+    """Session that resolves its engine on first use instead of on creation.
+
+    Sessions that never touch the database, e.g. in unit tests that patch
+    the queries, never create an engine or check out a connection.
+    """
+
+    def __init__(self, *args, bind_factory=get_engine, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._bind_factory = bind_factory
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self.bind is None:
+            self.bind = self._bind_factory()
+        return super().get_bind(mapper=mapper, clause=clause, **kwargs)
+
+
+def _choose_read_engine() -> Engine:
+    router = get_replica_router()
+    engine = router.choose()
+    request_context = get_request_context()
+    if request_context is not None and router.may_be_stale(engine):
+        request_context.read_stale_replica = True
+    return engine
+
+
+def reads_from_replica(db: Session) -> bool:
+    """True once ``db`` is bound to a read replica."""
+    return db.bind is not None and db.bind is not _engine
+
+
+def may_read_stale(db: Session) -> bool:
+    """True when ``db`` reads from a replica that may miss recent commits."""
+    return (
+        _replica_router is not None
+        and db.bind is not None
+        and _replica_router.may_be_stale(db.bind)
+    )
+
+
+@register_invalidator
+def _note_write(table: str, keys=None):
+    # Local commits and the ones announced by other workers alike
+    if _replica_router is not None:
+        _replica_router.note_write()
+
+
+# Committed objects keep their state: routes return them right after the
+# commit and expiring them would cost one SELECT per write to reload.
+# Server-generated columns come back through RETURNING (eager_defaults).
+SessionLocal = sessionmaker(
+    class_=LazySession, autocommit=False, autoflush=True, expire_on_commit=False
+)
+ReadSessionLocal = sessionmaker(
+    class_=LazySession,
+    autocommit=False,
+    autoflush=True,
+    expire_on_commit=False,
+    bind_factory=_choose_read_engine,
+)
 Base = declarative_base()
 
 
@@ -20,3 +162,13 @@ def get_db_session():
         yield db
     finally:
         db.close()
+
+
+def get_read_db_session():
+    """Session for read-only routes, served by a replica when one is healthy."""
+    db = ReadSessionLocal()
+
+    try:
+        yield db
+    finally:
+        db.close()
@@ -0,0 +1,25 @@
+from sqlalchemy import JSON, Column, DateTime, Integer, LargeBinary, String
+
+from app.db_connection import Base
+
+
+class IdempotencyKey(Base):
+    """First response to a POST sent with an Idempotency-Key header.
+
+    status_code is NULL while the first request is still running, later
+    requests with the same key wait for it and then replay the response.
+    locked_at identifies the claim of the request running it.
+    """
+
+    __tablename__ = "idempotency_keys"
+
+    key = Column(String(255), primary_key=True)
+    # Path the key was used on, the same key may be reused on another route
+    route = Column(String(255), primary_key=True)
+    # HMAC-SHA256 of the request body, a retry must send the same request
+    request_hash = Column(String(64), nullable=False)
+    status_code = Column(Integer, nullable=True)
+    response_headers = Column(JSON, nullable=True)
+    response_body = Column(LargeBinary, nullable=True)
+    locked_at = Column(DateTime(timezone=True), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
@@ -0,0 +1,39 @@
+import hmac
+from typing import Optional
+
+from fastapi import Header, HTTPException
+
+from app import settings
+
+
+def has_internal_token(token: Optional[str]) -> bool:
+    """True only for the configured token, never when none is configured."""
+    return (
+        bool(settings.INTERNAL_API_TOKEN)
+        and token is not None
+        and hmac.compare_digest(token, settings.INTERNAL_API_TOKEN)
+    )
+
+
+def has_internal_access(token: Optional[str]) -> bool:
+    if not settings.INTERNAL_API_TOKEN:
+        return settings.INTERNAL_OPEN_ACCESS
+    return has_internal_token(token)
+
+
+def _bearer_token(authorization: Optional[str]) -> Optional[str]:
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not token.strip():
+        return None
+    return token.strip()
+
+
+def verify_internal_token(
+    x_internal_token: Optional[str] = Header(None),
+    authorization: Optional[str] = Header(None),
+):
+    # Prometheus sends the token from a scrape config's authorization block
+    # as "Authorization: Bearer <token>"
+    token = x_internal_token or _bearer_token(authorization)
+    if not has_internal_access(token):
+        raise HTTPException(status_code=403, detail="Not authorized")
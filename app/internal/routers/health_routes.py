@@ -0,0 +1,10 @@
+from fastapi import APIRouter
+
+router = APIRouter()
+
+
+@router.get("/health")
+async def get_health():
+    # async and without the database: it must answer while the threadpool
+    # and the DB pool are saturated, load balancers would drop the worker
+    return {"status": "ok"}
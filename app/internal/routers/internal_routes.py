@@ -0,0 +1,132 @@
+import logging
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import FileResponse
+
+from app import settings
+from app.core.admission import admission_status
+from app.core.db_pool import pool_status
+from app.core.profiling import list_profiles, profile_path, route_sample_rates
+from app.core.single_flight import single_flight_stats
+from app.core.threadpool import threadpool_status
+from app.core.tracing import Trace, ring_buffer
+from app.db_connection import get_engine, get_replica_router
+from app.internal.auth import verify_internal_token
+
+router = APIRouter(dependencies=[Depends(verify_internal_token)])
+logger = logging.getLogger("app")
+
+
+@router.get("/db/pool")
+def get_db_pool_status():
+    replica_router = get_replica_router()
+    return {
+        "primary": pool_status(get_engine().pool),
+        "replicas": [
+            dict(pool_status(replica.pool), **health)
+            for replica, health in zip(replica_router.replicas, replica_router.status())
+        ],
+    }
+
+
+@router.get("/admission")
+def get_admission_status():
+    return admission_status()
+
+
+@router.get("/threadpool")
+async def get_threadpool_status():
+    # async: the limiter belongs to the event loop, not to a worker thread
+    return threadpool_status()
+
+
+@router.get("/single-flight")
+def get_single_flight_stats():
+    return single_flight_stats()
+
+
+def trace_summary(trace: Trace) -> dict:
+    root = trace.root
+    return {
+        "trace_id": trace.trace_id,
+        "name": root.name,
+        "status_code": root.attributes.get("http.status_code"),
+        "duration_ms": round(root.duration_ms, 3),
+        "spans": len(trace.spans),
+        "sampled": trace.sampled,
+        "error": root.error,
+    }
+
+
+@router.get("/traces")
+def get_traces(
+    limit: int = Query(50, ge=1, le=1000),
+    min_duration_ms: float = Query(0.0, ge=0),
+    name: Optional[str] = Query(None, description="Substring of the root span"),
+):
+    traces = [
+        trace_summary(trace)
+        for trace in ring_buffer.traces()
+        if trace.root.duration_ms >= min_duration_ms
+        and (name is None or name in trace.root.name)
+    ]
+    return traces[:limit]
+
+
+@router.get("/traces/{trace_id}")
+def get_trace(trace_id: str):
+    trace = ring_buffer.get(trace_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="Trace not found")
+
+    root = trace.root
+    depths = {root.parent_id: -1}
+    spans = []
+    # Parents start before their children, so sorting by start visits them first
+    for span in sorted(trace.spans, key=lambda span: span.start):
+        depth = depths.get(span.parent_id, -1) + 1
+        depths[span.span_id] = depth
+        spans.append(
+            {
+                "span_id": span.span_id,
+                "parent_id": span.parent_id,
+                "name": span.name,
+                "depth": depth,
+                "offset_ms": round((span.start - root.start) / 1_000_000, 3),
+                "duration_ms": round(span.duration_ms, 3),
+                "attributes": span.attributes,
+                "error": span.error,
+            }
+        )
+    return dict(trace_summary(trace), dropped_spans=trace.dropped_spans, spans=spans)
+
+
+@router.get("/profiles")
+def get_profiles(limit: int = Query(100, ge=1, le=1000)):
+    return {
+        "enabled": settings.PROFILING_ENABLED,
+        "route_sample_rates": route_sample_rates,
+        "profiles": list_profiles(settings.PROFILING_DIR)[:limit],
+    }
+
+
+@router.put("/profiles/routes")
+def set_profile_route_rate(
+    path: str = Query(..., description="Route template, e.g. /users/{user_id}"),
+    rate: float = Query(..., ge=0, le=1, description="0 stops profiling the route"),
+):
+    # Only changes this worker, PROFILING_ROUTES applies to all of them
+    if rate:
+        route_sample_rates[path] = rate
+    else:
+        route_sample_rates.pop(path, None)
+    return route_sample_rates
+
+
+@router.get("/profiles/{name}")
+def get_profile(name: str):
+    path = profile_path(settings.PROFILING_DIR, name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="text/plain", filename=name)
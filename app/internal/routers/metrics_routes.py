@@ -0,0 +1,20 @@
+from anyio import to_thread
+from fastapi import APIRouter, Depends, Response
+
+from app.core.metrics import metrics_payload, sample_counters, sample_threadpool
+from app.internal.auth import verify_internal_token
+
+router = APIRouter(dependencies=[Depends(verify_internal_token)])
+
+
+def collect_metrics():
+    sample_counters()
+    return metrics_payload()
+
+
+@router.get("/metrics")
+async def get_metrics():
+    sample_threadpool()
+    # Rendering reads every worker's file with PROMETHEUS_MULTIPROC_DIR set
+    payload, content_type = await to_thread.run_sync(collect_metrics)
+    return Response(content=payload, media_type=content_type)
@@ -1,32 +1,136 @@
 import logging
-import logging.config
-import os
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from app import settings
+from app.batch.routers import batch_routes
+from app.core.admission import AdmissionControlMiddleware
+from app.core.compression import CompressionMiddleware
+from app.core.db_timeouts import CancelOnDisconnectMiddleware
+from app.core.idempotency import IdempotencyMiddleware
+from app.core.invalidation_bus import InvalidationListener
+from app.core.log_pipeline import configure_logging, stop_logging
+from app.core.metrics import (
+    MetricsMiddleware,
+    mark_worker_dead,
+    register_engine_source,
+)
+from app.core.query_stats import QueryStatsMiddleware
+from app.core.response_cache import CacheRule, ResponseCacheMiddleware, create_backend
+from app.core.threadpool import configure_threadpool
+from app.core.tracing import TracingMiddleware, configure_tracing, stop_tracing
+from app.db_connection import active_engines, dispose_db, get_engine, init_db
+from app.internal.routers import health_routes, internal_routes, metrics_routes
 from app.products.routers import category_routes
 from app.users.routers import user_routes
 
-logging.basicConfig(level=logging.DEBUG)
-config_path = os.path.join(os.path.dirname(__file__), "logging.conf")
+logger = logging.getLogger("app")
+
 
-logging.config.fileConfig(config_path, disable_existing_loggers=False)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Not at import: the log listener thread and the log directory are only
+    # needed by a server that is actually starting
+    log_listener = configure_logging()
+    configure_tracing()
+    logger.debug("Starting the application")
+    configure_threadpool()
+    invalidation_listener = None
+    if settings.DEV_DATABASE_URL:
+        init_db()
+        if get_engine().dialect.name == "postgresql":
+            invalidation_listener = InvalidationListener(
+                get_engine(), settings.CACHE_INVALIDATION_CHANNEL
+            )
+            invalidation_listener.start()
+    else:
+        logger.warning("DEV_DATABASE_URL is not set, database routes will fail")
 
-# logging.config.fileConfig("logging.conf", disable_existing_loggers=False)
-logger = logging.getLogger("app")
-logger.debug("Starting the application")
+    yield
 
+    if invalidation_listener is not None:
+        await invalidation_listener.stop()
+    dispose_db()
+    mark_worker_dead()
+    stop_tracing()
+    stop_logging(log_listener)
 
-app = FastAPI()
 
+app = FastAPI(lifespan=lifespan)
+
+# Middleware added last runs first
+app.add_middleware(CancelOnDisconnectMiddleware)
+# Inside compression, stored responses must not depend on Accept-Encoding
+if settings.IDEMPOTENCY_ENABLED:
+    app.add_middleware(IdempotencyMiddleware)
+# Inside the response cache, so cached entries are stored compressed
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(
+        CompressionMiddleware, minimum_size=settings.COMPRESSION_MINIMUM_SIZE
+    )
+
+response_cache_backend = create_backend()
+if response_cache_backend is not None:
+    app.add_middleware(
+        ResponseCacheMiddleware,
+        backend=response_cache_backend,
+        vary_encoding=settings.COMPRESSION_ENABLED,
+        rules=[
+            CacheRule(
+                r"^/api/category/$",
+                settings.RESPONSE_CACHE_TTL_CATEGORY,
+                tags=["category"],
+            ),
+            CacheRule(
+                r"^/api/category/(slug/[^/]+|\d+)$",
+                settings.RESPONSE_CACHE_TTL_CATEGORY,
+                tags=["category"],
+            ),
+            CacheRule(
+                r"^/users/\d+$", settings.RESPONSE_CACHE_TTL_USER, tags=["users"]
+            ),
+        ],
+    )
+
+app.add_middleware(QueryStatsMiddleware)
+# Outside the caches and query stats so shed requests cost nothing, inside
+# metrics so the 503s are counted
+if settings.ADMISSION_ENABLED:
+    app.add_middleware(AdmissionControlMiddleware)
+if settings.METRICS_ENABLED:
+    register_engine_source(active_engines)
+    app.add_middleware(MetricsMiddleware)
+if settings.TRACING_ENABLED:
+    app.add_middleware(TracingMiddleware)
+# Outermost, so cached responses still get the CORS headers for their origin
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:5173"],  # React
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[
+        "X-DB-Queries",
+        "Server-Timing",
+        "X-Next-Cursor",
+        "X-Cache",
+        "X-Missing-Ids",
+        "X-Missing-Slugs",
+        "X-Trace-Id",
+        "Idempotent-Replayed",
+    ],
 )
 
 app.include_router(category_routes.router, prefix="/api/category", tags=["Category"])
+app.include_router(batch_routes.router, prefix="/api/batch", tags=["Batch"])
 app.include_router(user_routes.router, prefix="/users", tags=["Users"])
+app.include_router(
+    internal_routes.router,
+    prefix="/internal",
+    tags=["Internal"],
+    include_in_schema=False,
+)
+app.include_router(metrics_routes.router, include_in_schema=False)
+app.include_router(health_routes.router, tags=["Health"])
@@ -35,6 +35,7 @@ class Category(Base):
         UniqueConstraint("name", "level", name="uq_category_name_level"),
         UniqueConstraint("slug", name="uq_category_slug"),
     )
+    __mapper_args__ = {"eager_defaults": True}
 
 
 class Product(Base):
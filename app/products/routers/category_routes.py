@@ -1,10 +1,22 @@
 import logging
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 
-from app.db_connection import SessionLocal, get_db_session
+from app import settings
+from app.core.db_timeouts import raise_for_query_timeout
+from app.core.fast_json import RawJSONResponse, json_list_response, schema_columns
+from app.core.instrumented_route import InstrumentedRoute
+from app.core.multi_get import MAX_KEYS, in_request_order, set_missing_header
+from app.core.negative_cache import NegativeCache
+from app.core.single_flight import SingleFlight
+from app.db_connection import (
+    SessionLocal,
+    get_db_session,
+    get_read_db_session,
+    reads_from_replica,
+)
 from app.products.models import Category
 from app.products.schemas.category_schema import (
     CategoryCreate,
@@ -12,58 +24,132 @@ from app.products.schemas.category_schema import (
     CategoryReturn,
     CategoryUpdate,
 )
-from app.products.utils.category_utils import check_existing_category
+from app.products.utils.category_utils import (
+    check_existing_category,
+    find_category_by_slug,
+)
 
-router = APIRouter()
-db = SessionLocal()
+router = APIRouter(route_class=InstrumentedRoute)
 logger = logging.getLogger("app")
 
+# Concurrent lookups of the same category share one query and one body
+category_lookups = SingleFlight("category")
+# Slugs and ids known not to exist, cleared by any committed category write
+category_misses = NegativeCache(
+    "category", settings.NEGATIVE_CACHE_TTL, settings.NEGATIVE_CACHE_MAX_ENTRIES
+)
+
+
+def load_category_json(key, db: Session, query) -> str:
+    generation = category_misses.generation
+
+    def to_json(category) -> str:
+        if not category:
+            category_misses.add(key, generation)
+            raise HTTPException(status_code=404, detail="Category does not exist")
+        return CategoryReturn.model_validate(
+            category, from_attributes=True
+        ).model_dump_json()
+
+    def load():
+        category = query(db)
+        if not category and reads_from_replica(db):
+            # The replica may not have replayed a create yet, only the
+            # primary can tell the category does not exist
+            with SessionLocal() as primary_db:
+                return to_json(query(primary_db))
+        return to_json(category)
+
+    return category_lookups.do(key, load)
+
 
 @router.get("/", response_model=List[CategoryReturn])
-def get_categories(db: Session = Depends(get_db_session)):
+def get_categories(
+    ids: Optional[List[int]] = Query(None, max_length=MAX_KEYS),
+    slugs: Optional[List[str]] = Query(None, max_length=MAX_KEYS),
+    db: Session = Depends(get_read_db_session),
+):
+    if ids and slugs:
+        raise HTTPException(status_code=400, detail="Pass either ids or slugs")
+
     try:
-        categories = db.query(Category).all()
-        return categories
+        query = db.query(*schema_columns(Category, CategoryReturn))
+
+        if ids:
+            categories, missing = in_request_order(
+                query.filter(Category.id.in_(ids)).all(),
+                ids,
+                lambda category: category.id,
+            )
+            response = json_list_response(CategoryReturn, categories)
+            set_missing_header(response, "X-Missing-Ids", missing)
+            return response
+        if slugs:
+            categories, missing = in_request_order(
+                query.filter(Category.slug.in_(slugs)).all(),
+                slugs,
+                lambda category: category.slug,
+            )
+            response = json_list_response(CategoryReturn, categories)
+            set_missing_header(response, "X-Missing-Slugs", missing)
+            return response
+
+        return json_list_response(CategoryReturn, query.all())
     except Exception as e:
-        logger.error(f"Unexpected exception while retrieving categories: {e}")
+        raise_for_query_timeout(e)
+        logger.error("Unexpected exception while retrieving categories: %s", e)
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
 @router.get("/slug/{category_slug}", response_model=CategoryReturn)
-def get_category_by_slug(category_slug: str, db: Session = Depends(get_db_session)):
-    try:
-        category = db.query(Category).filter(Category.slug == category_slug).first()
+def get_category_by_slug(
+    category_slug: str, db: Session = Depends(get_read_db_session)
+):
+    if category_misses.contains(("slug", category_slug)):
+        raise HTTPException(status_code=404, detail="Category does not exist")
 
-        if not category:
-            raise HTTPException(status_code=404, detail="Category does not exist")
-        return category
+    try:
+        body = load_category_json(
+            ("slug", category_slug),
+            db,
+            lambda session: find_category_by_slug(session, category_slug),
+        )
+        return RawJSONResponse(body)
 
     except HTTPException as http_excep:
         logger.error(
-            f"Unexpected exception while retrieving category by slug: {http_excep}"
+            "Unexpected exception while retrieving category by slug: %s", http_excep
         )
         raise
     except Exception as e:
-        logger.error(f"Exception while retrieving category by slug: {e}")
+        raise_for_query_timeout(e)
+        logger.error("Exception while retrieving category by slug: %s", e)
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
 @router.get("/{category_id}", response_model=CategoryReturn)
-def get_category_by_id(category_id: int, db: Session = Depends(get_db_session)):
-    try:
-        category = db.query(Category).filter(Category.id == category_id).first()
+def get_category_by_id(category_id: int, db: Session = Depends(get_read_db_session)):
+    if category_misses.contains(("id", category_id)):
+        raise HTTPException(status_code=404, detail="Category does not exist")
 
-        if not category:
-            raise HTTPException(status_code=404, detail="Category does not exist")
-        return category
+    try:
+        body = load_category_json(
+            ("id", category_id),
+            db,
+            lambda session: session.query(Category)
+            .filter(Category.id == category_id)
+            .first(),
+        )
+        return RawJSONResponse(body)
 
     except HTTPException as http_excep:
         logger.error(
-            f"Unexpected exception while retrieving category by id: {http_excep}"
+            "Unexpected exception while retrieving category by id: %s", http_excep
         )
         raise
     except Exception as e:
-        logger.error(f"Exception while retrieving category by id: {e}")
+        raise_for_query_timeout(e)
+        logger.error("Exception while retrieving category by id: %s", e)
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
@@ -76,7 +162,6 @@ def create_category(
         new_category = Category(**category_data.model_dump())
         db.add(new_category)
         db.commit()
-        db.refresh(new_category)
 
         return new_category
     except HTTPException:
@@ -84,7 +169,8 @@ def create_category(
 
     except Exception as e:
         db.rollback()
-        logger.error(f"Unexpected exception while creating category: {e}")
+        raise_for_query_timeout(e)
+        logger.error("Unexpected exception while creating category: %s", e)
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
@@ -104,13 +190,13 @@ def update_category(
             setattr(category, key, value)
 
         db.commit()
-        db.refresh(category)
 
         return category
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Unexpected error while updating category: {e}")
+        raise_for_query_timeout(e)
+        logger.error("Unexpected error while updating category: %s", e)
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
@@ -126,5 +212,6 @@ def delete_category(category_id: int, db: Session = Depends(get_db_session)):
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Unexpected error while deleting category: {e}")
+        raise_for_query_timeout(e)
+        logger.error("Unexpected error while deleting category: %s", e)
         raise HTTPException(status_code=500, detail="Internal server error")
@@ -1,6 +1,7 @@
 from fastapi import HTTPException
 from sqlalchemy.orm import Session
 
+from app.core.query_cache import FromCache
 from app.products.models import Category
 from app.products.schemas.category_schema import CategoryCreate
 
@@ -27,3 +28,7 @@ def check_existing_category(db: Session, category_data: CategoryCreate):
             detail_msg = "Category slug already exists"
 
         raise HTTPException(status_code=400, detail=detail_msg)
+
+
+def find_category_by_slug(db: Session, slug: str):
+    return db.query(Category).options(FromCache()).filter(Category.slug == slug).first()
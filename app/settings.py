@@ -0,0 +1,232 @@
+import os
+import tempfile
+
+
+def env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+
+def env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value not in (None, "") else default
+
+
+def env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value in (None, ""):
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def env_route_map(name: str) -> dict:
+    """Parse "/users/=500,/api/category/=100" into {route path: float}."""
+    routes = {}
+    for item in os.getenv(name, "").split(","):
+        if "=" in item:
+            path, value = item.rsplit("=", 1)
+            routes[path.strip()] = float(value)
+    return routes
+
+
+def env_str_map(name: str) -> dict:
+    """Parse "users=INFO,sqlalchemy.engine=WARNING" into {name: value}."""
+    values = {}
+    for item in os.getenv(name, "").split(","):
+        if "=" in item:
+            key, value = item.split("=", 1)
+            values[key.strip()] = value.strip()
+    return values
+
+
+def env_list(name: str, default: str = "") -> list:
+    """Parse "/health,/metrics" into ["/health", "/metrics"]."""
+    return [
+        item.strip() for item in os.getenv(name, default).split(",") if item.strip()
+    ]
+
+
+DEV_DATABASE_URL = os.getenv("DEV_DATABASE_URL")
+
+# Connection pool, see https://docs.sqlalchemy.org/en/20/core/pooling.html
+DB_POOL_SIZE = env_int("DB_POOL_SIZE", 5)
+DB_MAX_OVERFLOW = env_int("DB_MAX_OVERFLOW", 10)
+DB_POOL_TIMEOUT = env_float("DB_POOL_TIMEOUT", 30.0)
+DB_POOL_RECYCLE = env_int("DB_POOL_RECYCLE", -1)
+DB_POOL_PRE_PING = env_bool("DB_POOL_PRE_PING", False)
+# Checkouts waiting longer than this are logged as a warning
+DB_POOL_WAIT_WARNING_MS = env_float("DB_POOL_WAIT_WARNING_MS", 100.0)
+# Give up on an unreachable Postgres server after this long, 0 waits forever
+DB_CONNECT_TIMEOUT_SECONDS = env_int("DB_CONNECT_TIMEOUT_SECONDS", 3)
+
+# Shared secret for /internal endpoints and /metrics, sent as X-Internal-Token
+# or "Authorization: Bearer". Prometheus sends the latter from a scrape config
+# with "authorization: {credentials: <token>}". Without a token they answer
+# 403, unless INTERNAL_OPEN_ACCESS opens them for local development.
+INTERNAL_API_TOKEN = os.getenv("INTERNAL_API_TOKEN")
+INTERNAL_OPEN_ACCESS = env_bool("INTERNAL_OPEN_ACCESS", False)
+
+# Comma separated replica URLs, read-only routes fall back to the primary
+REPLICA_DATABASE_URLS = [
+    url.strip()
+    for url in os.getenv("REPLICA_DATABASE_URLS", "").split(",")
+    if url.strip()
+]
+DB_REPLICA_MAX_LAG_SECONDS = env_float("DB_REPLICA_MAX_LAG_SECONDS", 5.0)
+DB_REPLICA_CHECK_INTERVAL = env_float("DB_REPLICA_CHECK_INTERVAL", 2.0)
+
+# dev, test or production
+APP_ENV = os.getenv("APP_ENV", "dev").lower()
+
+# Repeated identical statements in one request: off, warn or raise
+N_PLUS_ONE_MODE = os.getenv(
+    "N_PLUS_ONE_MODE", "warn" if APP_ENV in ("dev", "test") else "off"
+).lower()
+N_PLUS_ONE_THRESHOLD = env_int("N_PLUS_ONE_THRESHOLD", 5)
+
+# Slow query log, thresholds can be overridden per route template
+SLOW_QUERY_THRESHOLD_MS = env_float("SLOW_QUERY_THRESHOLD_MS", 200.0)
+SLOW_QUERY_ROUTE_THRESHOLDS_MS = env_route_map("SLOW_QUERY_ROUTE_THRESHOLDS_MS")
+SLOW_QUERY_LOG_PER_SECOND = env_float("SLOW_QUERY_LOG_PER_SECOND", 10.0)
+# EXPLAIN (ANALYZE, BUFFERS) runs the query again, keep both values small
+SLOW_QUERY_EXPLAIN_SAMPLE_RATE = env_float("SLOW_QUERY_EXPLAIN_SAMPLE_RATE", 0.05)
+SLOW_QUERY_EXPLAIN_PER_MINUTE = env_float("SLOW_QUERY_EXPLAIN_PER_MINUTE", 6.0)
+
+# statement_timeout for every connection, 0 disables it. Routes listed in
+# DB_ROUTE_STATEMENT_TIMEOUTS_MS get their own budget per transaction.
+DB_STATEMENT_TIMEOUT_MS = env_int("DB_STATEMENT_TIMEOUT_MS", 30000)
+DB_ROUTE_STATEMENT_TIMEOUTS_MS = env_route_map("DB_ROUTE_STATEMENT_TIMEOUTS_MS")
+
+# HTTP response cache: off, memory (per worker) or sqlite (shared per host)
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "off").lower()
+RESPONSE_CACHE_MAX_ENTRIES = env_int("RESPONSE_CACHE_MAX_ENTRIES", 1024)
+# An empty path would give every connection its own private database
+RESPONSE_CACHE_SQLITE_PATH = os.getenv("RESPONSE_CACHE_SQLITE_PATH") or os.path.join(
+    tempfile.gettempdir(), "factoryapi-response-cache.sqlite3"
+)
+RESPONSE_CACHE_TTL_CATEGORY = env_float("RESPONSE_CACHE_TTL_CATEGORY", 60.0)
+RESPONSE_CACHE_TTL_USER = env_float("RESPONSE_CACHE_TTL_USER", 10.0)
+
+# Query result cache for statements run with the FromCache() option
+QUERY_CACHE_TTL = env_float("QUERY_CACHE_TTL", 30.0)
+QUERY_CACHE_MAX_ENTRIES = env_int("QUERY_CACHE_MAX_ENTRIES", 4096)
+
+# Cross-worker cache invalidation over Postgres LISTEN/NOTIFY
+CACHE_INVALIDATION_CHANNEL = os.getenv(
+    "CACHE_INVALIDATION_CHANNEL", "cache_invalidation"
+)
+CACHE_INVALIDATION_KEEPALIVE_SECONDS = env_float(
+    "CACHE_INVALIDATION_KEEPALIVE_SECONDS", 30.0
+)
+CACHE_INVALIDATION_RECONNECT_MIN_SECONDS = env_float(
+    "CACHE_INVALIDATION_RECONNECT_MIN_SECONDS", 0.5
+)
+CACHE_INVALIDATION_RECONNECT_MAX_SECONDS = env_float(
+    "CACHE_INVALIDATION_RECONNECT_MAX_SECONDS", 30.0
+)
+
+# Negative cache for category slugs and ids that do not exist
+NEGATIVE_CACHE_TTL = env_float("NEGATIVE_CACHE_TTL", 300.0)
+NEGATIVE_CACHE_MAX_ENTRIES = env_int("NEGATIVE_CACHE_MAX_ENTRIES", 10000)
+
+# Logging: level of the app and users loggers, per logger overrides such as
+# "root=WARNING,sqlalchemy.engine=INFO", text or json lines
+LOG_LEVEL = os.getenv("LOG_LEVEL", "DEBUG" if APP_ENV == "dev" else "INFO").upper()
+LOG_LEVELS = {name: level.upper() for name, level in env_str_map("LOG_LEVELS").items()}
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text" if APP_ENV == "dev" else "json").lower()
+LOG_DIR = os.getenv("LOG_DIR", "logs")
+LOG_MAX_BYTES = env_int("LOG_MAX_BYTES", 10 * 1024 * 1024)
+LOG_BACKUP_COUNT = env_int("LOG_BACKUP_COUNT", 5)
+# Fraction of DEBUG records kept, records above DEBUG are never sampled
+LOG_DEBUG_SAMPLE_RATE = env_float("LOG_DEBUG_SAMPLE_RATE", 1.0)
+# Records beyond this many waiting to be written are dropped
+LOG_QUEUE_SIZE = env_int("LOG_QUEUE_SIZE", 10000)
+
+# Response compression, br and zstd need the brotli and zstandard packages
+COMPRESSION_ENABLED = env_bool("COMPRESSION_ENABLED", True)
+COMPRESSION_MINIMUM_SIZE = env_int("COMPRESSION_MINIMUM_SIZE", 500)
+COMPRESSION_GZIP_LEVEL = env_int("COMPRESSION_GZIP_LEVEL", 6)
+COMPRESSION_BROTLI_QUALITY = env_int("COMPRESSION_BROTLI_QUALITY", 4)
+COMPRESSION_ZSTD_LEVEL = env_int("COMPRESSION_ZSTD_LEVEL", 3)
+
+# Prometheus metrics. With several workers also set PROMETHEUS_MULTIPROC_DIR
+# to an empty directory, /metrics then aggregates all of them.
+METRICS_ENABLED = env_bool("METRICS_ENABLED", True)
+METRICS_SAMPLE_INTERVAL = env_float("METRICS_SAMPLE_INTERVAL", 1.0)
+
+# Request tracing. Sampled requests are exported, with a slow threshold the
+# slow ones are exported as well. The threshold is off by default: to catch
+# the slow requests every request has to build its full span tree, one span
+# per query included, which costs far more than tracing just the sample.
+TRACING_ENABLED = env_bool("TRACING_ENABLED", True)
+TRACING_SAMPLE_RATE = env_float(
+    "TRACING_SAMPLE_RATE", 1.0 if APP_ENV == "dev" else 0.01
+)
+TRACING_SLOW_THRESHOLD_MS = env_float("TRACING_SLOW_THRESHOLD_MS", 0.0)
+TRACING_BUFFER_SIZE = env_int("TRACING_BUFFER_SIZE", 200)
+TRACING_MAX_SPANS = env_int("TRACING_MAX_SPANS", 1000)
+TRACING_MAX_STATEMENT_LENGTH = env_int("TRACING_MAX_STATEMENT_LENGTH", 2000)
+# OTLP/JSON lines, one trace per line, off when empty
+TRACING_OTLP_FILE = os.getenv("TRACING_OTLP_FILE", "")
+TRACING_SERVICE_NAME = os.getenv("TRACING_SERVICE_NAME", "factoryapi")
+
+# On-demand profiling. Requests sent with "X-Profile: 1" and the internal
+# token, or sampled from PROFILING_ROUTES ("/users/=0.01"), run under a
+# stack sampler and are saved as folded stacks for flame graphs. Disabled,
+# routes are not wrapped at all.
+PROFILING_ENABLED = env_bool("PROFILING_ENABLED", False)
+PROFILING_ROUTES = env_route_map("PROFILING_ROUTES")
+PROFILING_INTERVAL_MS = env_float("PROFILING_INTERVAL_MS", 5.0)
+PROFILING_MAX_CONCURRENT = env_int("PROFILING_MAX_CONCURRENT", 4)
+# An empty value counts as unset, like for IDEMPOTENCY_HASH_KEY
+PROFILING_DIR = os.getenv("PROFILING_DIR") or os.path.join(
+    tempfile.gettempdir(), "factoryapi-profiles"
+)
+PROFILING_MAX_FILES = env_int("PROFILING_MAX_FILES", 200)
+
+# Worker threads for sync routes, 0 sizes the pool to the DB connections
+# (pool size plus overflow, per engine) plus THREADPOOL_EXTRA_THREADS
+THREADPOOL_SIZE = env_int("THREADPOOL_SIZE", 0)
+THREADPOOL_EXTRA_THREADS = env_int("THREADPOOL_EXTRA_THREADS", 4)
+THREADPOOL_WAIT_WARNING_MS = env_float("THREADPOOL_WAIT_WARNING_MS", 100.0)
+
+# Admission control: concurrency limit per worker adjusted by AIMD on latency,
+# requests over it get a 503 with Retry-After instead of queueing. Paths are
+# prefixes of the request path.
+ADMISSION_ENABLED = env_bool("ADMISSION_ENABLED", True)
+ADMISSION_INITIAL_LIMIT = env_int("ADMISSION_INITIAL_LIMIT", 20)
+ADMISSION_MIN_LIMIT = env_int("ADMISSION_MIN_LIMIT", 2)
+ADMISSION_MAX_LIMIT = env_int("ADMISSION_MAX_LIMIT", 200)
+# Slower than this many times the route's usual latency counts as overload
+ADMISSION_LATENCY_TOLERANCE = env_float("ADMISSION_LATENCY_TOLERANCE", 2.0)
+ADMISSION_DECREASE_INTERVAL_MS = env_float("ADMISSION_DECREASE_INTERVAL_MS", 250.0)
+ADMISSION_BASELINE_ALPHA = env_float("ADMISSION_BASELINE_ALPHA", 0.05)
+ADMISSION_BACKOFF_RATIO = env_float("ADMISSION_BACKOFF_RATIO", 0.9)
+ADMISSION_RETRY_AFTER_SECONDS = env_int("ADMISSION_RETRY_AFTER_SECONDS", 1)
+ADMISSION_NORMAL_SHARE = env_float("ADMISSION_NORMAL_SHARE", 0.9)
+ADMISSION_LOW_PRIORITY_SHARE = env_float("ADMISSION_LOW_PRIORITY_SHARE", 0.5)
+ADMISSION_CRITICAL_PATHS = env_list(
+    "ADMISSION_CRITICAL_PATHS", "/health,/internal/,/metrics"
+)
+ADMISSION_HIGH_PRIORITY_PATHS = env_list(
+    "ADMISSION_HIGH_PRIORITY_PATHS", "/users/token,/users/protected-user"
+)
+ADMISSION_LOW_PRIORITY_PATHS = env_list(
+    "ADMISSION_LOW_PRIORITY_PATHS", "/api/batch/,/users/bulk"
+)
+
+# Idempotency-Key support for POST routes, responses are kept for the TTL.
+# A claim older than the lock timeout without a response is taken over.
+IDEMPOTENCY_ENABLED = env_bool("IDEMPOTENCY_ENABLED", True)
+IDEMPOTENCY_ROUTES = env_list("IDEMPOTENCY_ROUTES", "/api/category/,/users/")
+# Key of the HMAC stored for each request body, bodies sent to /users/ hold
+# plaintext passwords. Defaults to the JWT signing key.
+IDEMPOTENCY_HASH_KEY = os.getenv("IDEMPOTENCY_HASH_KEY") or os.getenv(
+    "SECRET_KEY", "mysecretkey"
+)
+IDEMPOTENCY_TTL_SECONDS = env_float("IDEMPOTENCY_TTL_SECONDS", 24 * 3600.0)
+IDEMPOTENCY_LOCK_TIMEOUT_SECONDS = env_float("IDEMPOTENCY_LOCK_TIMEOUT_SECONDS", 60.0)
+IDEMPOTENCY_WAIT_TIMEOUT_SECONDS = env_float("IDEMPOTENCY_WAIT_TIMEOUT_SECONDS", 10.0)
+IDEMPOTENCY_POLL_INTERVAL_MS = env_float("IDEMPOTENCY_POLL_INTERVAL_MS", 100.0)
+# Chance that a new claim also deletes the expired responses
+IDEMPOTENCY_PURGE_PROBABILITY = env_float("IDEMPOTENCY_PURGE_PROBABILITY", 0.01)
@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, Integer, String
+from sqlalchemy import Boolean, Column, Index, Integer, String, text
 
 from app.db_connection import Base
 
@@ -12,3 +12,23 @@ class User(Base):
     hashed_password = Column(String(255), nullable=False)
     is_active = Column(Boolean, default=True)
     is_superuser = Column(Boolean, default=False)
+
+    __table_args__ = (
+        # Prefix search (LIKE 'abc%') cannot use the unique b-tree indexes
+        # under a non-C collation, pattern_ops indexes can.
+        Index(
+            "ix_users_username_pattern",
+            "username",
+            postgresql_ops={"username": "text_pattern_ops"},
+        ),
+        Index(
+            "ix_users_email_pattern",
+            "email",
+            postgresql_ops={"email": "text_pattern_ops"},
+        ),
+        # Partial indexes on id for the rare flag values used by the admin
+        # filters, they also serve the keyset ORDER BY id.
+        Index("ix_users_inactive_id", "id", postgresql_where=text("NOT is_active")),
+        Index("ix_users_superuser_id", "id", postgresql_where=text("is_superuser")),
+    )
+    __mapper_args__ = {"eager_defaults": True}
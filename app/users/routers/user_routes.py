@@ -1,18 +1,30 @@
 import logging
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import Session
 
-from app.db_connection import SessionLocal, get_db_session
+from app.core.db_timeouts import raise_for_query_timeout
+from app.core.fast_json import json_list_response, schema_columns
+from app.core.instrumented_route import InstrumentedRoute
+from app.core.multi_get import MAX_KEYS, in_request_order, set_missing_header
+from app.db_connection import get_db_session, get_read_db_session
 from app.users.auth import create_access_token, get_current_user, verify_password
 from app.users.models import User
-from app.users.schemas.user_schema import UserCreate, UserLogin, UserRead, UserUpdate
-from app.users.security import get_password_hash
+from app.users.schemas.user_schema import (
+    UserBulkCreate,
+    UserBulkResult,
+    UserCreate,
+    UserLogin,
+    UserRead,
+    UserUpdate,
+)
+from app.users.security import get_password_hash, hash_passwords
+from app.users.utils.user_utils import find_existing_usernames_and_emails
 
-router = APIRouter()
-db = SessionLocal()
+router = APIRouter(route_class=InstrumentedRoute)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 logger = logging.getLogger("users")
 logger.debug("User routes module loaded.")
@@ -35,22 +47,71 @@ def read_protected_route_user(
     logger.debug("Protected USER ROUTE")
 
     # Zwróć szczegóły bieżącego użytkownika
-    logger.info(f"User {current_user.username} accessed protected user route.")
+    logger.info("User %s accessed protected user route.", current_user.username)
     return current_user
 
 
 @router.get("/", response_model=List[UserRead])
-def get_users(db: Session = Depends(get_db_session)):
+def get_users(
+    limit: int = Query(50, ge=1, le=500),
+    after_id: Optional[int] = Query(None, description="Keyset cursor: last seen id"),
+    username: Optional[str] = Query(None, min_length=1, description="Prefix"),
+    email: Optional[str] = Query(None, min_length=1, description="Prefix"),
+    is_active: Optional[bool] = None,
+    is_superuser: Optional[bool] = None,
+    ids: Optional[List[int]] = Query(
+        None, max_length=MAX_KEYS, description="Multi-get, replaces paging"
+    ),
+    db: Session = Depends(get_read_db_session),
+):
+    # Filtered out ids would be reported as missing, as if they did not exist
+    if ids and any(
+        value is not None for value in (username, email, is_active, is_superuser)
+    ):
+        raise HTTPException(status_code=400, detail="Pass either ids or filters")
+
     try:
-        users = db.query(User).all()
-        return users
+        query = db.query(*schema_columns(User, UserRead))
+
+        if after_id is not None and not ids:
+            query = query.filter(User.id > after_id)
+        if username is not None:
+            query = query.filter(User.username.startswith(username, autoescape=True))
+        if email is not None:
+            query = query.filter(User.email.startswith(email, autoescape=True))
+        if is_active is not None:
+            query = query.filter(User.is_active == is_active)
+        if is_superuser is not None:
+            query = query.filter(User.is_superuser == is_superuser)
+
+        if ids:
+            users, missing = in_request_order(
+                query.filter(User.id.in_(ids)).all(), ids, lambda user: user.id
+            )
+            response = json_list_response(UserRead, users)
+            set_missing_header(response, "X-Missing-Ids", missing)
+            return response
+
+        # Fetch one extra row to know whether another page exists
+        users = query.order_by(User.id).limit(limit + 1).all()
+
+        next_cursor = None
+        if len(users) > limit:
+            users = users[:limit]
+            next_cursor = users[-1].id
+
+        response = json_list_response(UserRead, users)
+        if next_cursor is not None:
+            response.headers["X-Next-Cursor"] = str(next_cursor)
+        return response
     except Exception as e:
-        logger.error(f"Unexpected exception while retrieving users: {e}")
+        raise_for_query_timeout(e)
+        logger.error("Unexpected exception while retrieving users: %s", e)
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
 @router.get("/{user_id}", response_model=UserRead)
-def get_user_by_id(user_id: int, db: Session = Depends(get_db_session)):
+def get_user_by_id(user_id: int, db: Session = Depends(get_read_db_session)):
     try:
         user = db.query(User).filter(User.id == user_id).first()
 
@@ -59,17 +120,25 @@ def get_user_by_id(user_id: int, db: Session = Depends(get_db_session)):
         return user
 
     except HTTPException as http_excep:
-        logger.error(f"Unexpected exception while retrieving user: {http_excep}")
+        logger.error("Unexpected exception while retrieving user: %s", http_excep)
         raise
     except Exception as e:
-        logger.error(f"Exception while retrieving user: {e}")
+        raise_for_query_timeout(e)
+        logger.error("Exception while retrieving user: %s", e)
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
 @router.post("/", response_model=UserRead, status_code=201)
 def create_user(user_data: UserCreate, db: Session = Depends(get_db_session)):
+    return add_user(user_data, get_password_hash(user_data.password), db)
+
+
+def add_user(user_data: UserCreate, hashed_password: str, db: Session) -> User:
+    """create_user with the password already hashed.
+
+    The batch route hashes its passwords before it opens its transaction.
+    """
     try:
-        hashed_password = get_password_hash(user_data.password)
         new_user = User(
             username=user_data.username,
             email=user_data.email,
@@ -77,12 +146,100 @@ def create_user(user_data: UserCreate, db: Session = Depends(get_db_session)):
         )
         db.add(new_user)
         db.commit()
-        db.refresh(new_user)
 
         return new_user
     except Exception as e:
         db.rollback()
-        logger.error(f"Unexpected exception while creating user: {e}")
+        raise_for_query_timeout(e)
+        logger.error("Unexpected exception while creating user: %s", e)
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+
+@router.post("/bulk", response_model=List[UserBulkResult], status_code=200)
+def create_users_bulk(bulk_data: UserBulkCreate, db: Session = Depends(get_db_session)):
+    try:
+        results = [None] * len(bulk_data.users)
+        taken_usernames, taken_emails = find_existing_usernames_and_emails(
+            db,
+            (user.username for user in bulk_data.users),
+            (user.email for user in bulk_data.users),
+        )
+
+        seen_usernames, seen_emails = set(), set()
+        candidates = []
+        for index, user in enumerate(bulk_data.users):
+            if user.username in taken_usernames or user.email in taken_emails:
+                results[index] = UserBulkResult(
+                    index=index,
+                    status="conflict",
+                    detail="Username or email already exists",
+                )
+            elif user.username in seen_usernames or user.email in seen_emails:
+                results[index] = UserBulkResult(
+                    index=index,
+                    status="duplicate",
+                    detail="Username or email repeated in batch",
+                )
+            else:
+                seen_usernames.add(user.username)
+                seen_emails.add(user.email)
+                candidates.append((index, user))
+
+        # End the read transaction first, the connection would otherwise sit
+        # idle in transaction while the passwords are hashed
+        db.rollback()
+        hashed_passwords = hash_passwords([user.password for _, user in candidates])
+
+        created = {}
+        if candidates:
+            statement = (
+                insert(User)
+                .values(
+                    [
+                        {
+                            "username": user.username,
+                            "email": user.email,
+                            "hashed_password": hashed_password,
+                        }
+                        for (_, user), hashed_password in zip(
+                            candidates, hashed_passwords
+                        )
+                    ]
+                )
+                # Rows raced in by concurrent requests are reported as conflicts
+                .on_conflict_do_nothing()
+                .returning(
+                    User.id,
+                    User.username,
+                    User.email,
+                    User.is_active,
+                    User.is_superuser,
+                )
+            )
+            created = {row.username: row for row in db.execute(statement)}
+            db.commit()
+
+        for index, user in candidates:
+            row = created.get(user.username)
+            if row is None:
+                results[index] = UserBulkResult(
+                    index=index,
+                    status="conflict",
+                    detail="Username or email already exists",
+                )
+            else:
+                results[index] = UserBulkResult(
+                    index=index,
+                    status="created",
+                    user=UserRead.model_validate(row, from_attributes=True),
+                )
+
+        # Encoded in the worker thread, not by FastAPI on the event loop
+        return json_list_response(UserBulkResult, results)
+    except Exception as e:
+        db.rollback()
+        raise_for_query_timeout(e)
+        logger.error("Unexpected exception while creating users in bulk: %s", e)
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
@@ -101,13 +258,13 @@ def update_user(
                 setattr(user, key, value)
 
         db.commit()
-        db.refresh(user)
 
         return user
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Unexpected error while updating user: {e}")
+        raise_for_query_timeout(e)
+        logger.error("Unexpected error while updating user: %s", e)
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
@@ -123,7 +280,8 @@ def delete_user(user_id: int, db: Session = Depends(get_db_session)):
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Unexpected error while deleting user: {e}")
+        raise_for_query_timeout(e)
+        logger.error("Unexpected error while deleting user: %s", e)
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
@@ -1,6 +1,6 @@
-from typing import Optional
+from typing import List, Literal, Optional
 
-from pydantic import BaseModel, ConfigDict, EmailStr
+from pydantic import BaseModel, ConfigDict, EmailStr, Field
 
 
 class UserLogin(BaseModel):
@@ -34,3 +34,14 @@ class UserUpdate(BaseModel):
     password: Optional[str] = None
     is_active: Optional[bool] = None
     is_superuser: Optional[bool] = None
+
+
+class UserBulkCreate(BaseModel):
+    users: List[UserCreate] = Field(min_length=1, max_length=1000)
+
+
+class UserBulkResult(BaseModel):
+    index: int
+    status: Literal["created", "conflict", "duplicate"]
+    detail: Optional[str] = None
+    user: Optional[UserRead] = None
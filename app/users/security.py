@@ -1,5 +1,12 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
 import bcrypt
 
+from app.core.metrics import BCRYPT_PENDING
+
 
 def get_password_hash(password: str) -> str:
     """Hash a password using bcrypt."""
@@ -8,3 +15,40 @@ def get_password_hash(password: str) -> str:
     hashed_password = bcrypt.hashpw(password.encode("utf-8"), salt)
     return hashed_password.decode("utf-8")
     return hashed_password.decode("utf-8")
+
+
+_hash_executor = None
+_hash_executor_lock = threading.Lock()
+
+
+def _get_hash_executor() -> ThreadPoolExecutor:
+    global _hash_executor
+
+    if _hash_executor is None:
+        with _hash_executor_lock:
+            if _hash_executor is None:
+                _hash_executor = ThreadPoolExecutor(
+                    max_workers=os.cpu_count() or 1, thread_name_prefix="bcrypt"
+                )
+    return _hash_executor
+
+
+def hash_passwords(passwords: List[str]) -> List[str]:
+    """Hash many passwords in parallel, preserving input order.
+
+    bcrypt releases the GIL while hashing, so a thread pool sized to the
+    number of cores keeps all of them busy without process start-up costs.
+    """
+
+    if len(passwords) <= 1:
+        return [get_password_hash(password) for password in passwords]
+
+    # Hashes queued or running in the executor, across all requests
+    BCRYPT_PENDING.inc(len(passwords))
+    futures = [
+        _get_hash_executor().submit(get_password_hash, password)
+        for password in passwords
+    ]
+    for future in futures:
+        future.add_done_callback(lambda _: BCRYPT_PENDING.dec())
+    return [future.result() for future in futures]
@@ -0,0 +1,28 @@
+from typing import Iterable, Set, Tuple
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from app.users.models import User
+
+
+def find_existing_usernames_and_emails(
+    db: Session, usernames: Iterable[str], emails: Iterable[str]
+) -> Tuple[Set[str], Set[str]]:
+    """Return the usernames and emails already taken, in a single query."""
+
+    usernames = set(usernames)
+    emails = set(emails)
+
+    if not usernames and not emails:
+        return set(), set()
+
+    rows = (
+        db.query(User.username, User.email)
+        .filter(or_(User.username.in_(usernames), User.email.in_(emails)))
+        .all()
+    )
+
+    taken_usernames = {row.username for row in rows if row.username in usernames}
+    taken_emails = {row.email for row in rows if row.email in emails}
+    return taken_usernames, taken_emails
@@ -0,0 +1,54 @@
+"""Measure how long a fresh interpreter takes to import the app.
+
+Usage: python benchmarks/bench_import_time.py [module] [runs]
+
+Each run starts a new interpreter, so the numbers include everything a
+uvicorn worker or CLI script pays before it can serve its first request.
+Run it with and without DEV_DATABASE_URL set: importing must not need a
+database.
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SNIPPET = """
+import time
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start)
+"""
+
+
+def measure(module: str, runs: int) -> list:
+    timings = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", SNIPPET.format(module=module)],
+            cwd=ROOT,
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        timings.append(float(output.strip().splitlines()[-1]))
+    return timings
+
+
+def main():
+    module = sys.argv[1] if len(sys.argv) > 1 else "app.main"
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    timings = measure(module, runs)
+    print(
+        f"import {module}: runs={runs} "
+        f"min={min(timings) * 1000:.1f} ms "
+        f"median={statistics.median(timings) * 1000:.1f} ms "
+        f"max={max(timings) * 1000:.1f} ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
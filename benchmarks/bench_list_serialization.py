@@ -0,0 +1,87 @@
+"""Compare response_model serialization of ORM objects with json_list_response.
+
+Usage: python -m benchmarks.bench_list_serialization [rows] [repeats]
+
+Serves the same page of categories from an in-memory SQLite database
+through two routes on a bare FastAPI app. One loads Category instances and
+returns them with response_model=List[CategoryReturn], as get_categories
+did. The other queries the schema's columns and returns the plain rows
+through json_list_response. It prints the median time per request and
+checks that both bodies decode to the same JSON.
+"""
+
+import statistics
+import sys
+import time
+from typing import List
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+from app.core.fast_json import json_list_response, schema_columns
+from app.products.models import Category
+from app.products.schemas.category_schema import CategoryReturn
+
+
+def create_database(n: int):
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Category.__table__.create(engine)
+    with Session(engine) as db:
+        db.add_all(
+            Category(id=i, name=f"category {i}", slug=f"category-{i}", level=i % 20)
+            for i in range(1, n + 1)
+        )
+        db.commit()
+    return engine
+
+
+def build_app(engine) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/orm", response_model=List[CategoryReturn])
+    def orm_objects():
+        with Session(engine) as db:
+            return db.query(Category).all()
+
+    @app.get("/fast")
+    def plain_rows():
+        with Session(engine) as db:
+            rows = db.query(*schema_columns(Category, CategoryReturn)).all()
+        return json_list_response(CategoryReturn, rows)
+
+    return app
+
+
+def timed(client: TestClient, path: str, repeats: int) -> float:
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        response = client.get(path)
+        timings.append(time.perf_counter() - start)
+        assert response.status_code == 200
+    return statistics.median(timings) * 1000
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+    client = TestClient(build_app(create_database(n)))
+    assert client.get("/orm").json() == client.get("/fast").json()
+
+    orm = timed(client, "/orm", repeats)
+    fast = timed(client, "/fast", repeats)
+    print(f"{n} rows, median of {repeats} requests")
+    print(f"  response_model + ORM objects: {orm:8.2f} ms")
+    print(f"  json_list_response + rows:    {fast:8.2f} ms  ({orm / fast:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Compare the write endpoints with and without expire_on_commit.
+
+Usage: DEV_DATABASE_URL=postgresql://... python -m benchmarks.bench_write_endpoints [n]
+
+Runs POST and PUT against /api/category/ and POST and PUT against /users/
+through the TestClient, once with sessions that expire on commit (every
+response then reloads the row with a SELECT, as the old db.refresh() did)
+and once with the app's SessionLocal. It prints the time and the number of
+SQL statements per request. Rows created by the benchmark are deleted at
+the end.
+"""
+
+import statistics
+import sys
+import time
+import uuid
+
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import sessionmaker
+
+from app.core.query_stats import capture_queries
+from app.db_connection import LazySession, SessionLocal, get_db_session
+from app.main import app
+from app.products.models import Category
+from app.users.models import User
+
+
+def make_override(session_factory):
+    def override():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    return override
+
+
+def run(client: TestClient, n: int) -> dict:
+    results = {}
+    tag = uuid.uuid4().hex[:8]
+
+    def timed(name, call):
+        timings, queries = [], []
+        for i in range(n):
+            with capture_queries() as captured:
+                start = time.perf_counter()
+                response = call(i)
+                timings.append(time.perf_counter() - start)
+            assert response.status_code < 300, response.text
+            queries.append(captured.count)
+        results[name] = (statistics.median(timings) * 1000, statistics.mean(queries))
+
+    category_ids = []
+
+    def create_category(i):
+        response = client.post(
+            "/api/category/",
+            json={"name": f"bench-{tag}-{i}", "slug": f"bench-{tag}-{i}"},
+        )
+        category_ids.append(response.json()["id"])
+        return response
+
+    timed("POST /api/category/", create_category)
+    timed(
+        "PUT /api/category/{id}",
+        lambda i: client.put(
+            f"/api/category/{category_ids[i]}",
+            json={"name": f"bench-{tag}-{i}-u", "slug": f"bench-{tag}-{i}-u"},
+        ),
+    )
+
+    user_ids = []
+
+    def create_user(i):
+        response = client.post(
+            "/users/",
+            json={
+                "username": f"bench-{tag}-{i}",
+                "email": f"bench-{tag}-{i}@example.com",
+                "password": "benchmark",
+            },
+        )
+        user_ids.append(response.json()["id"])
+        return response
+
+    timed("POST /users/", create_user)
+    timed(
+        "PUT /users/{id}",
+        lambda i: client.put(f"/users/{user_ids[i]}", json={"is_active": False}),
+    )
+    return results
+
+
+def cleanup():
+    db = SessionLocal()
+    try:
+        db.query(Category).filter(Category.slug.like("bench-%")).delete(
+            synchronize_session=False
+        )
+        db.query(User).filter(User.username.like("bench-%")).delete(
+            synchronize_session=False
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    configs = {
+        "expire_on_commit=True": sessionmaker(
+            class_=LazySession, autoflush=True, expire_on_commit=True
+        ),
+        "expire_on_commit=False": SessionLocal,
+    }
+
+    with TestClient(app) as client:
+        try:
+            for label, session_factory in configs.items():
+                app.dependency_overrides[get_db_session] = make_override(
+                    session_factory
+                )
+                print(label)
+                for name, (median_ms, queries) in run(client, n).items():
+                    print(f"  {name:<26} {median_ms:7.2f} ms  {queries:.1f} queries")
+        finally:
+            app.dependency_overrides.clear()
+            cleanup()
+
+
+if __name__ == "__main__":
+    main()
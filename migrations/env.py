@@ -5,6 +5,7 @@ from sqlalchemy import engine_from_config, pool
 
 from alembic import context
 from app.db_connection import Base  # noqa: F401
+from app.idempotency import models as idempotency_models  # noqa: F401
 from app.products import models as product_models  # noqa: F401
 from app.users import models as user_models  # noqa: F401
 
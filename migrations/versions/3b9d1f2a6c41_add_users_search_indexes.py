@@ -0,0 +1,32 @@
+"""Add users search and filter indexes
+
+Revision ID: 3b9d1f2a6c41
+Revises: 7063e6fc3c3d
+Create Date: 2026-10-19 09:12:31.402118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b9d1f2a6c41'
+down_revision: Union[str, None] = '7063e6fc3c3d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_users_username_pattern', 'users', ['username'], unique=False, postgresql_ops={'username': 'text_pattern_ops'})
+    op.create_index('ix_users_email_pattern', 'users', ['email'], unique=False, postgresql_ops={'email': 'text_pattern_ops'})
+    op.create_index('ix_users_inactive_id', 'users', ['id'], unique=False, postgresql_where=sa.text('NOT is_active'))
+    op.create_index('ix_users_superuser_id', 'users', ['id'], unique=False, postgresql_where=sa.text('is_superuser'))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_users_superuser_id', table_name='users', postgresql_where=sa.text('is_superuser'))
+    op.drop_index('ix_users_inactive_id', table_name='users', postgresql_where=sa.text('NOT is_active'))
+    op.drop_index('ix_users_email_pattern', table_name='users', postgresql_ops={'email': 'text_pattern_ops'})
+    op.drop_index('ix_users_username_pattern', table_name='users', postgresql_ops={'username': 'text_pattern_ops'})
@@ -0,0 +1,192 @@
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+from app.batch.routers import batch_routes
+from app.core import cache_invalidation
+from app.db_connection import SessionLocal, get_db_session
+from app.main import app
+from app.products.models import Category
+from app.products.routers import category_routes
+from app.users.models import User
+from tests.products.factories.models_factory import get_random_category_dict
+
+
+@pytest.fixture
+def sqlite_db(monkeypatch):
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Category.__table__.create(engine)
+    User.__table__.create(engine)
+
+    def get_sqlite_session():
+        db = SessionLocal(bind=engine)
+        try:
+            yield db
+        finally:
+            db.close()
+
+    invalidated = []
+    monkeypatch.setattr(
+        cache_invalidation,
+        "_invalidators",
+        [lambda table, keys: invalidated.append((table, keys))],
+    )
+    app.dependency_overrides[get_db_session] = get_sqlite_session
+    yield SessionLocal(bind=engine), invalidated
+    app.dependency_overrides.pop(get_db_session)
+    engine.dispose()
+
+
+def category_data():
+    data = get_random_category_dict()
+    data.pop("id")
+    return data
+
+
+"""
+- [ ] Test batch runs every operation and commits once
+"""
+
+
+def test_unit_batch_commits_all_operations(client, sqlite_db):
+    db, invalidated = sqlite_db
+    first, second = category_data(), category_data()
+
+    response = client.post(
+        "/api/batch/",
+        json={
+            "operations": [
+                {"op": "create_category", "data": first},
+                {"op": "create_category", "data": second},
+                {"op": "update_category", "id": 1, "data": dict(first, level=7)},
+            ]
+        },
+    )
+
+    assert response.status_code == 200
+    assert response.json()["committed"] is True
+    assert [result["status_code"] for result in response.json()["results"]] == [
+        201,
+        201,
+        200,
+    ]
+    assert db.get(Category, 1).level == 7
+    assert db.query(Category).count() == 2
+    # Caches are only invalidated by the real commit, once
+    assert invalidated == [("category", {"1", "2"})]
+
+
+"""
+- [ ] Test failing operation rolls back the whole batch
+"""
+
+
+def test_unit_batch_rolls_back_on_failure(client, sqlite_db):
+    db, invalidated = sqlite_db
+
+    response = client.post(
+        "/api/batch/",
+        json={
+            "operations": [
+                {"op": "create_category", "data": category_data()},
+                {"op": "delete_category", "id": 999},
+                {"op": "create_category", "data": category_data()},
+            ]
+        },
+    )
+
+    assert response.status_code == 409
+    assert response.json()["committed"] is False
+    assert [result["index"] for result in response.json()["results"]] == [0, 1]
+    assert response.json()["results"][1]["status_code"] == 404
+    assert response.json()["results"][1]["detail"] == "Category not found"
+    assert db.query(Category).count() == 0
+    assert invalidated == []
+
+
+"""
+- [ ] Test invalid operation data is reported per operation
+"""
+
+
+def test_unit_batch_invalid_operation_data(client, sqlite_db):
+    response = client.post(
+        "/api/batch/",
+        json={"operations": [{"op": "update_user", "data": {}}]},
+    )
+
+    assert response.status_code == 409
+    assert response.json()["results"][0]["status_code"] == 422
+    assert response.json()["results"][0]["detail"] == "Operation requires an id"
+
+
+"""
+- [ ] Test passwords are hashed before the batch opens its transaction
+"""
+
+
+def test_unit_batch_hashes_passwords_first(client, sqlite_db, monkeypatch):
+    db, _ = sqlite_db
+    calls = []
+
+    def hash_passwords(passwords):
+        calls.append(("hash", list(passwords)))
+        return [f"hashed {password}" for password in passwords]
+
+    def connection(self, *args, **kwargs):
+        calls.append(("connection",))
+        return original_connection(self, *args, **kwargs)
+
+    original_connection = Session.connection
+    monkeypatch.setattr(batch_routes, "hash_passwords", hash_passwords)
+    monkeypatch.setattr(Session, "connection", connection)
+
+    users = [
+        {"username": f"user{i}", "email": f"user{i}@example.com", "password": f"pw{i}"}
+        for i in range(2)
+    ]
+    response = client.post(
+        "/api/batch/",
+        json={
+            "operations": [
+                {"op": "create_user", "data": users[0]},
+                {"op": "create_category", "data": category_data()},
+                {"op": "create_user", "data": users[1]},
+            ]
+        },
+    )
+
+    assert response.status_code == 200
+    assert calls[0] == ("hash", ["pw0", "pw1"])
+    assert calls[1] == ("connection",)
+    assert [user.hashed_password for user in db.query(User).order_by(User.id)] == [
+        "hashed pw0",
+        "hashed pw1",
+    ]
+
+
+"""
+- [ ] Test a server error in an operation keeps its status for the batch
+"""
+
+
+def test_unit_batch_server_error_status(client, sqlite_db, monkeypatch):
+    def create_category(data, db):
+        raise HTTPException(status_code=504, detail="Query timed out")
+
+    monkeypatch.setattr(category_routes, "create_category", create_category)
+
+    response = client.post(
+        "/api/batch/",
+        json={"operations": [{"op": "create_category", "data": category_data()}]},
+    )
+
+    assert response.status_code == 504
+    assert response.json()["committed"] is False
+    assert response.json()["results"][0]["status_code"] == 504
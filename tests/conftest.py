@@ -1,6 +1,18 @@
-from dotenv import load_dotenv
+import os
+import tempfile
 
-from .fixtures import client, db_session  # noqa: F401
-from .utils.pytest_utils import pytest_collection_modifyitems  # noqa: F401
+# Before the app is imported: log files of the app under test stay out of
+# the working tree
+os.environ.setdefault("LOG_DIR", tempfile.mkdtemp(prefix="factoryapi-logs-"))
+
+from dotenv import load_dotenv  # noqa: E402
+
+from .fixtures import (  # noqa: E402, F401
+    client,
+    db_session,
+    query_budget,
+    reset_local_caches,
+)
+from .utils.pytest_utils import pytest_collection_modifyitems  # noqa: E402, F401
 
 load_dotenv()
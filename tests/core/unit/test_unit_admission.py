@@ -0,0 +1,163 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.admission import (
+    CRITICAL,
+    HIGH,
+    LOW,
+    NORMAL,
+    AdaptiveLimit,
+    AdmissionControlMiddleware,
+    request_priority,
+)
+from app.internal.routers import health_routes
+
+
+def get_test_client(limit: AdaptiveLimit):
+    started = threading.Event()
+    release = threading.Event()
+    app = FastAPI()
+    app.add_middleware(AdmissionControlMiddleware, limit=limit)
+    app.include_router(health_routes.router)
+
+    @app.get("/api/category/")
+    def blocking():
+        started.set()
+        release.wait(5)
+        return []
+
+    return TestClient(app), started, release
+
+
+"""
+- [ ] Test the limit grows while fast and backs off once per interval when slow
+"""
+
+
+def test_unit_adaptive_limit_aimd():
+    limit = AdaptiveLimit(
+        initial=4, minimum=2, maximum=5, tolerance=2, backoff=0.5, decrease_interval=60
+    )
+
+    for _ in range(4):
+        assert limit.try_acquire()
+    assert not limit.try_acquire()
+    for _ in range(4):
+        limit.release(0.01)
+
+    grown = limit.limit
+    assert 4 < grown < 5
+
+    # Unused capacity is not grown, low priority releases do not count
+    limit.try_acquire()
+    limit.release(0.01)
+    limit.try_acquire()
+    limit.release(None)
+    assert limit.limit == grown
+
+    limit.try_acquire()
+    limit.try_acquire()
+    limit.release(120)
+    limit.release(120, overloaded=True)
+
+    assert limit.limit == pytest.approx(grown / 2)
+    assert limit.in_flight == 0
+
+
+"""
+- [ ] Test a route slower than the others by design does not collapse the limit
+"""
+
+
+def test_unit_adaptive_limit_per_route_baseline():
+    limit = AdaptiveLimit(initial=20, minimum=2, maximum=200, tolerance=2, backoff=0.9)
+
+    # Logins spend ~370 ms hashing, lookups take 5 ms, both at light load
+    for _ in range(100):
+        for route, latency in (("/users/token", 0.37), ("/users/{user_id}", 0.005)):
+            limit.try_acquire()
+            limit.release(latency, route=route)
+
+    assert limit.limit >= 20
+
+    # A spike against the route's own baseline still backs off
+    limit.try_acquire()
+    limit.release(1.5, route="/users/token")
+
+    assert limit.limit == pytest.approx(20 * 0.9)
+
+    # And recovers at light load once latency is back to normal
+    for _ in range(100):
+        limit.try_acquire()
+        limit.release(0.37, route="/users/token")
+
+    assert limit.limit >= 20
+
+
+"""
+- [ ] Test a sustained slowdown keeps the limit reduced
+"""
+
+
+def test_unit_adaptive_limit_sustained_slowdown():
+    limit = AdaptiveLimit(initial=20, minimum=2, maximum=200, tolerance=2, backoff=0.9)
+
+    for _ in range(50):
+        limit.try_acquire()
+        limit.release(0.005, route="/api/category/")
+
+    # The database slows down for far longer than 1 / baseline_alpha requests
+    for _ in range(1000):
+        limit.try_acquire()
+        limit.release(0.05, route="/api/category/")
+
+    assert limit.limit == pytest.approx(20 * 0.9)
+    assert limit.baselines["/api/category/"] == pytest.approx(0.005)
+
+
+"""
+- [ ] Test priorities share the limit and paths map to classes
+"""
+
+
+def test_unit_admission_priorities():
+    limit = AdaptiveLimit(initial=2, minimum=1, maximum=10, tolerance=2, backoff=0.9)
+
+    assert limit.try_acquire(share=0.9)
+    assert not limit.try_acquire(share=0.5)
+    assert limit.try_acquire(share=0.9)
+    assert not limit.try_acquire(share=1.0)
+
+    assert request_priority("/health") == CRITICAL
+    assert request_priority("/users/token") == HIGH
+    assert request_priority("/users/5") == NORMAL
+    assert request_priority("/api/batch/") == LOW
+
+
+"""
+- [ ] Test requests over the limit get a fast 503 while health checks pass
+"""
+
+
+def test_unit_admission_sheds_with_retry_after():
+    limit = AdaptiveLimit(initial=1, minimum=1, maximum=10, tolerance=2, backoff=0.9)
+    client, started, release = get_test_client(limit)
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        first = executor.submit(client.get, "/api/category/")
+        assert started.wait(5)
+
+        shed = client.get("/api/category/")
+        health = client.get("/health")
+        release.set()
+
+    assert first.result().status_code == 200
+    assert shed.status_code == 503
+    assert shed.headers["Retry-After"] == "1"
+    assert shed.json() == {"detail": "Server is overloaded, retry later"}
+    assert health.json() == {"status": "ok"}
+    assert limit.in_flight == 0
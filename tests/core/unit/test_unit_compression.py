@@ -0,0 +1,119 @@
+import gzip
+
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.core.cache_backends import MemoryLRUBackend
+from app.core.compression import CompressionMiddleware, negotiate_encoding
+from app.core.response_cache import CacheRule, ResponseCacheMiddleware
+
+ITEMS = [{"id": i, "name": f"item {i}"} for i in range(200)]
+
+
+def get_test_client(cache_backend=None) -> TestClient:
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=500)
+    if cache_backend is not None:
+        app.add_middleware(
+            ResponseCacheMiddleware,
+            backend=cache_backend,
+            rules=[CacheRule(r"^/items$", 60)],
+            vary_encoding=True,
+        )
+
+    @app.get("/items")
+    def get_items():
+        return ITEMS
+
+    @app.get("/small")
+    def get_small():
+        return {"id": 1}
+
+    @app.get("/binary")
+    def get_binary():
+        return PlainTextResponse("x" * 1000, media_type="application/octet-stream")
+
+    @app.get("/stream")
+    def get_stream():
+        def chunks():
+            for i in range(3):
+                yield f"line {i}\n" * 10
+
+        return StreamingResponse(chunks(), media_type="text/plain")
+
+    return TestClient(app)
+
+
+"""
+- [ ] Test Accept-Encoding negotiation honours q-values and wildcards
+"""
+
+
+def test_unit_compression_negotiate_encoding():
+    assert negotiate_encoding(None) is None
+    assert negotiate_encoding(b"identity") is None
+    assert negotiate_encoding(b"gzip, deflate") == "gzip"
+    assert negotiate_encoding(b"GZIP;q=0.5") == "gzip"
+    assert negotiate_encoding(b"gzip;q=0") is None
+    assert negotiate_encoding(b"*") is not None
+    assert negotiate_encoding(b"*, gzip;q=0") != "gzip"
+
+
+"""
+- [ ] Test large JSON is compressed, small and binary bodies are not
+"""
+
+
+def test_unit_compression_threshold_and_content_type():
+    client = get_test_client()
+    headers = {"Accept-Encoding": "gzip"}
+
+    response = client.get("/items", headers=headers)
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.headers["Vary"] == "Accept-Encoding"
+    assert int(response.headers["Content-Length"]) < len(response.content)
+    assert response.json() == ITEMS
+
+    assert "Content-Encoding" not in client.get("/small", headers=headers).headers
+    assert "Content-Encoding" not in client.get("/binary", headers=headers).headers
+    identity = {"Accept-Encoding": "identity"}
+    assert "Content-Encoding" not in client.get("/items", headers=identity).headers
+
+
+"""
+- [ ] Test streamed bodies are compressed chunk by chunk
+"""
+
+
+def test_unit_compression_streaming():
+    client = get_test_client()
+
+    with client.stream("GET", "/stream", headers={"Accept-Encoding": "gzip"}) as r:
+        raw = b"".join(r.iter_raw())
+
+    assert r.headers["Content-Encoding"] == "gzip"
+    assert "Content-Length" not in r.headers
+    assert gzip.decompress(raw) == b"".join(
+        (f"line {i}\n" * 10).encode() for i in range(3)
+    )
+
+
+"""
+- [ ] Test response cache stores one compressed body per encoding
+"""
+
+
+def test_unit_compression_cached_per_encoding():
+    client = get_test_client(MemoryLRUBackend())
+
+    first = client.get("/items", headers={"Accept-Encoding": "gzip"})
+    second = client.get("/items", headers={"Accept-Encoding": "gzip"})
+    identity = client.get("/items", headers={"Accept-Encoding": "identity"})
+
+    assert first.headers["X-Cache"] == "MISS"
+    assert second.headers["X-Cache"] == "HIT"
+    assert second.headers["Content-Encoding"] == "gzip"
+    assert second.json() == ITEMS
+    assert identity.headers["X-Cache"] == "MISS"
+    assert "Content-Encoding" not in identity.headers
@@ -0,0 +1,80 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import TimeoutError
+
+from app.core.db_pool import InstrumentedQueuePool, pool_status
+
+
+def get_test_engine(**kwargs):
+    return create_engine("sqlite://", poolclass=InstrumentedQueuePool, **kwargs)
+
+
+"""
+- [ ] Test pool status reports checked out and idle connections
+"""
+
+
+def test_unit_pool_status_counts_connections():
+    engine = get_test_engine(pool_size=2, max_overflow=1)
+
+    first = engine.connect()
+    second = engine.connect()
+    second.close()
+
+    status = pool_status(engine.pool)
+
+    assert status["checked_out"] == 1
+    assert status["idle"] == 1
+    assert status["overflow"] == 0
+    assert status["wait"]["checkouts"] == 2
+
+    first.close()
+    engine.dispose()
+
+
+"""
+- [ ] Test slow checkout is recorded and logged
+"""
+
+
+def test_unit_pool_checkout_wait_is_logged(monkeypatch, caplog):
+    monkeypatch.setattr("app.settings.DB_POOL_WAIT_WARNING_MS", 50)
+    engine = get_test_engine(pool_size=1, max_overflow=0, pool_timeout=0.1)
+
+    connection = engine.connect()
+    with pytest.raises(TimeoutError):
+        engine.connect()
+
+    status = pool_status(engine.pool)
+
+    assert status["wait"]["slow_checkouts"] == 1
+    assert status["wait"]["max_wait_ms"] >= 100
+    assert "Waited" in caplog.text
+
+    connection.close()
+    engine.dispose()
+
+
+"""
+- [ ] Test internal pool endpoint requires the token, closed without one
+"""
+
+
+def test_unit_internal_pool_endpoint_token(client, monkeypatch):
+    monkeypatch.setattr("app.settings.INTERNAL_API_TOKEN", None)
+    monkeypatch.setattr("app.settings.DEV_DATABASE_URL", "postgresql://localhost/test")
+
+    assert client.get("/internal/db/pool").status_code == 403
+
+    monkeypatch.setattr("app.settings.INTERNAL_OPEN_ACCESS", True)
+
+    assert client.get("/internal/db/pool").status_code == 200
+
+    monkeypatch.setattr("app.settings.INTERNAL_API_TOKEN", "secret")
+
+    assert client.get("/internal/db/pool").status_code == 403
+
+    response = client.get("/internal/db/pool", headers={"X-Internal-Token": "secret"})
+
+    assert response.status_code == 200
+    assert response.json()["primary"]["class"] == "InstrumentedQueuePool"
@@ -0,0 +1,113 @@
+import threading
+import time
+
+from sqlalchemy import create_engine
+
+from app.core.db_replicas import ReplicaRouter
+
+
+def get_router(lags, **kwargs):
+    primary = create_engine("sqlite://")
+    replicas = [create_engine("sqlite://") for _ in lags]
+    router = ReplicaRouter(primary, replicas, **kwargs)
+
+    def replica_lag(replica):
+        lag = lags[replicas.index(replica)]
+        if isinstance(lag, Exception):
+            raise lag
+        return lag
+
+    router.replica_lag = replica_lag
+    return router
+
+
+"""
+- [ ] Test reads go to the primary without replicas
+"""
+
+
+def test_unit_replica_router_without_replicas():
+    router = get_router([])
+
+    assert router.choose() is router.primary
+
+
+"""
+- [ ] Test healthy replicas are used round-robin
+"""
+
+
+def test_unit_replica_router_round_robin():
+    router = get_router([0, 0])
+
+    chosen = [router.choose() for _ in range(4)]
+
+    assert chosen == router.replicas * 2
+
+
+"""
+- [ ] Test lagging or unreachable replicas fall back to the primary
+"""
+
+
+def test_unit_replica_router_lag_fallback():
+    router = get_router([30, ConnectionError("down"), 1], max_lag=5)
+    router.check_all()
+
+    assert {router.choose() for _ in range(3)} == {router.replicas[2]}
+
+    router = get_router([30, ConnectionError("down")], max_lag=5)
+    router.check_all()
+
+    assert router.choose() is router.primary
+    assert [replica["healthy"] for replica in router.status()] == [False, False]
+
+
+"""
+- [ ] Test replicas may be stale after a write or while they lag
+"""
+
+
+def test_unit_replica_router_may_be_stale():
+    router = get_router([0, 1], max_lag=5)
+    router.check_all()
+
+    assert not router.may_be_stale(router.replicas[0])
+    assert router.may_be_stale(router.replicas[1])
+    assert not router.may_be_stale(router.primary)
+
+    router.note_write()
+
+    assert router.may_be_stale(router.replicas[0])
+    assert not router.may_be_stale(router.primary)
+
+
+"""
+- [ ] Test requests do not wait for a due health check
+"""
+
+
+def test_unit_replica_router_checks_in_background():
+    router = get_router([0], check_interval=0)
+    checking = threading.Event()
+    release = threading.Event()
+
+    def slow_replica_lag(replica):
+        checking.set()
+        release.wait(5)
+        raise ConnectionError("down")
+
+    router.replica_lag = slow_replica_lag
+
+    # The previous answer is used while the check hangs on the connection
+    assert router.choose() is router.replicas[0]
+    assert checking.wait(5)
+    assert router.choose() is router.replicas[0]
+
+    release.set()
+    for _ in range(50):
+        if not router.status()[0]["healthy"]:
+            break
+        time.sleep(0.01)
+
+    assert router.status()[0]["healthy"] is False
@@ -0,0 +1,32 @@
+from sqlalchemy import create_engine
+
+from app.db_connection import SessionLocal
+from app.products.models import Category
+from tests.products.factories.models_factory import get_random_category_dict
+
+"""
+- [ ] Test committed objects are readable without another query
+"""
+
+
+def test_unit_session_keeps_state_after_commit(query_budget):
+    engine = create_engine("sqlite://")
+    Category.__table__.create(engine)
+    category_data = get_random_category_dict()
+    category_data.pop("id")
+
+    db = SessionLocal(bind=engine)
+    try:
+        category = Category(**category_data)
+        db.add(category)
+
+        with query_budget(1):
+            db.commit()
+
+        with query_budget(0):
+            assert category.id is not None
+            assert category.slug == category_data["slug"]
+            assert category.level == category_data["level"]
+    finally:
+        db.close()
+        engine.dispose()
@@ -0,0 +1,83 @@
+import threading
+
+import anyio
+from sqlalchemy.engine import make_url
+
+from app.core.db_timeouts import CancelOnDisconnectMiddleware, connect_args_for
+from app.core.request_context import (
+    RequestContext,
+    get_request_context,
+    reset_request_context,
+    set_request_context,
+)
+
+
+class FakeDBAPIConnection:
+    def __init__(self):
+        self.cancelled = threading.Event()
+
+    def cancel(self):
+        self.cancelled.set()
+
+
+"""
+- [ ] Test connect and default statement timeouts are only set for Postgres
+"""
+
+
+def test_unit_connect_args_statement_timeout(monkeypatch):
+    monkeypatch.setattr("app.settings.DB_STATEMENT_TIMEOUT_MS", 1500)
+    monkeypatch.setattr("app.settings.DB_CONNECT_TIMEOUT_SECONDS", 3)
+
+    assert connect_args_for(make_url("postgresql://localhost/db")) == {
+        "connect_timeout": 3,
+        "options": "-c statement_timeout=1500",
+    }
+    assert connect_args_for(make_url("sqlite://")) == {}
+
+
+"""
+- [ ] Test client disconnect cancels the running query
+"""
+
+
+def test_unit_cancel_on_disconnect():
+    connection = FakeDBAPIConnection()
+    received = []
+
+    async def app(scope, receive, send):
+        get_request_context().running_connections.add(connection)
+        received.append(await receive())
+        received.append(await receive())
+
+    messages = [
+        {"type": "http.request", "body": b"", "more_body": False},
+        {"type": "http.disconnect"},
+    ]
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        await anyio.sleep_forever()
+
+    async def send(message):
+        pass
+
+    async def main():
+        scope = {"type": "http", "method": "GET", "path": "/slow"}
+        request_context = RequestContext(scope)
+        token = set_request_context(request_context)
+        try:
+            await CancelOnDisconnectMiddleware(app)(scope, receive, send)
+        finally:
+            reset_request_context(token)
+        return request_context
+
+    request_context = anyio.run(main)
+
+    assert [message["type"] for message in received] == [
+        "http.request",
+        "http.disconnect",
+    ]
+    assert request_context.client_disconnected
+    assert connection.cancelled.is_set()
@@ -0,0 +1,37 @@
+import json
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app.core.fast_json import json_list_response, schema_columns
+from app.products.models import Category
+from app.products.schemas.category_schema import CategoryReturn
+from tests.products.factories.models_factory import get_random_category_dict
+
+"""
+- [ ] Test plain rows encode to the same JSON as the response_model path
+"""
+
+
+def test_unit_fast_json_matches_response_model():
+    engine = create_engine("sqlite://")
+    Category.__table__.create(engine)
+
+    with Session(engine) as db:
+        for id_ in range(1, 4):
+            db.add(Category(**dict(get_random_category_dict(), id=id_)))
+        db.commit()
+
+        rows = db.query(*schema_columns(Category, CategoryReturn)).all()
+        expected = jsonable_encoder(
+            [
+                CategoryReturn.model_validate(category, from_attributes=True)
+                for category in db.query(Category).all()
+            ]
+        )
+
+    response = json_list_response(CategoryReturn, rows)
+
+    assert response.media_type == "application/json"
+    assert json.loads(response.body) == expected
@@ -0,0 +1,157 @@
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, select
+from sqlalchemy.pool import StaticPool
+
+from app import settings
+from app.core.idempotency import (
+    IdempotencyMiddleware,
+    IdempotencyStore,
+    hash_request_body,
+)
+from app.core.query_stats import capture_queries
+from app.idempotency.models import IdempotencyKey
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    IdempotencyKey.__table__.create(engine)
+    yield engine
+    engine.dispose()
+
+
+def get_test_client(engine, fail_first=False):
+    app = FastAPI()
+    app.add_middleware(
+        IdempotencyMiddleware, routes=["/items/"], engine_factory=lambda: engine
+    )
+    calls = []
+    started = threading.Event()
+    release = threading.Event()
+    release.set()
+
+    @app.post("/items/", status_code=201)
+    def create_item(item: dict):
+        calls.append(item)
+        started.set()
+        release.wait(5)
+        if fail_first and len(calls) == 1:
+            raise HTTPException(status_code=503, detail="Try again")
+        return {"id": len(calls), **item}
+
+    return TestClient(app), calls, started, release
+
+
+def stored_keys(engine) -> list:
+    with engine.connect() as connection:
+        return connection.execute(select(IdempotencyKey.__table__)).all()
+
+
+"""
+- [ ] Test a retry with the same key replays the first response
+"""
+
+
+def test_unit_idempotency_replays_response(engine):
+    client, calls, _, _ = get_test_client(engine)
+    headers = {"Idempotency-Key": "key-1"}
+
+    first = client.post("/items/", json={"name": "a"}, headers=headers)
+    with capture_queries() as queries:
+        retry = client.post("/items/", json={"name": "a"}, headers=headers)
+    other_body = client.post("/items/", json={"name": "b"}, headers=headers)
+    without_key = client.post("/items/", json={"name": "a"})
+
+    assert first.status_code == retry.status_code == 201
+    assert retry.json() == first.json() == {"id": 1, "name": "a"}
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert "Idempotent-Replayed" not in first.headers
+    # A replay only reads the stored response
+    assert [statement.split()[0] for statement in queries.statements] == ["SELECT"]
+    assert other_body.status_code == 422
+    assert without_key.json()["id"] == 2
+    assert len(calls) == 2
+    [row] = stored_keys(engine)
+    assert (row.key, row.route, row.status_code) == ("key-1", "/items/", 201)
+    # Keyed, a plain digest of a body with a password could be brute forced
+    assert row.request_hash == hash_request_body(b'{"name": "a"}')
+    assert row.request_hash != hashlib.sha256(b'{"name": "a"}').hexdigest()
+
+
+"""
+- [ ] Test a concurrent duplicate waits for the first request
+"""
+
+
+def test_unit_idempotency_concurrent_duplicate_waits(engine, monkeypatch):
+    monkeypatch.setattr(settings, "IDEMPOTENCY_POLL_INTERVAL_MS", 10.0)
+    client, calls, started, release = get_test_client(engine)
+    release.clear()
+    headers = {"Idempotency-Key": "key-2"}
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        first = executor.submit(client.post, "/items/", json={}, headers=headers)
+        assert started.wait(5)
+        duplicate = executor.submit(client.post, "/items/", json={}, headers=headers)
+        # Let the duplicate find the key claimed before the first one finishes
+        time.sleep(0.1)
+        release.set()
+
+    assert first.result().json() == duplicate.result().json() == {"id": 1}
+    assert duplicate.result().headers["Idempotent-Replayed"] == "true"
+    assert len(calls) == 1
+
+
+"""
+- [ ] Test server errors and expired responses let the key run again
+"""
+
+
+def test_unit_idempotency_errors_and_expiry_not_replayed(engine, monkeypatch):
+    client, calls, _, _ = get_test_client(engine, fail_first=True)
+    headers = {"Idempotency-Key": "key-3"}
+
+    failed = client.post("/items/", json={}, headers=headers)
+
+    assert failed.status_code == 503
+    assert stored_keys(engine) == []
+
+    assert client.post("/items/", json={}, headers=headers).json() == {"id": 2}
+
+    monkeypatch.setattr(settings, "IDEMPOTENCY_TTL_SECONDS", -1.0)
+    client.post("/items/", json={}, headers={"Idempotency-Key": "key-4"})
+    response = client.post("/items/", json={}, headers={"Idempotency-Key": "key-4"})
+
+    assert response.json() == {"id": 4}
+    assert "Idempotent-Replayed" not in response.headers
+    assert len(calls) == 4
+
+
+"""
+- [ ] Test a request whose stale claim was taken over cannot complete or release it
+"""
+
+
+def test_unit_idempotency_taken_over_claim(engine, monkeypatch):
+    store = IdempotencyStore(lambda: engine)
+    _, slow_claim = store.claim("key-5", "/items/", "hash")
+    monkeypatch.setattr(settings, "IDEMPOTENCY_LOCK_TIMEOUT_SECONDS", -1.0)
+    row, new_claim = store.claim("key-5", "/items/", "hash")
+
+    assert row is None
+    assert new_claim != slow_claim
+    assert not store.complete("key-5", "/items/", slow_claim, 201, [], b"slow")
+    assert not store.release("key-5", "/items/", slow_claim)
+    assert store.complete("key-5", "/items/", new_claim, 201, [], b"new")
+    assert [row.response_body for row in stored_keys(engine)] == [b"new"]
@@ -0,0 +1,231 @@
+import asyncio
+import json
+import socket
+import threading
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import Integer, String, create_engine
+from sqlalchemy.orm import DeclarativeBase, Mapped, Session, mapped_column
+
+from app.core import cache_invalidation
+from app.core.invalidation_bus import (
+    WORKER_ID,
+    InvalidationListener,
+    handle_notification,
+    notification_payloads,
+)
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+class Item(Base):
+    __tablename__ = "invalidation_bus_item"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    name: Mapped[str] = mapped_column(String(50))
+
+
+def record_invalidations(monkeypatch):
+    invalidated, flushes = [], []
+    monkeypatch.setattr(
+        cache_invalidation,
+        "_invalidators",
+        [lambda table, keys: invalidated.append((table, keys))],
+    )
+    monkeypatch.setattr(cache_invalidation, "_flushers", [lambda: flushes.append(1)])
+    return invalidated, flushes
+
+
+class FakeConnection:
+    def __init__(self):
+        self.reader, self.writer = socket.socketpair()
+        self.reader.setblocking(False)
+        self.notifies = []
+        self.closed = False
+        self.hung = threading.Event()
+        self.released = threading.Event()
+
+    def notify(self, payload):
+        self.notifies.append(SimpleNamespace(payload=payload))
+        self.writer.send(b"x")
+
+    def fileno(self):
+        return self.reader.fileno()
+
+    def poll(self):
+        if self.closed:
+            raise ConnectionError("server closed the connection")
+        try:
+            self.reader.recv(1024)
+        except BlockingIOError:
+            pass
+
+    @contextmanager
+    def cursor(self):
+        yield self
+
+    def execute(self, statement):
+        # A half-open connection: the ping never gets an answer
+        self.hung.set()
+        self.released.wait(5)
+
+    def close(self):
+        self.released.set()
+        self.reader.close()
+        self.writer.close()
+
+
+"""
+- [ ] Test notifications from other workers invalidate, own ones are skipped
+"""
+
+
+def test_unit_invalidation_bus_handle_notification(monkeypatch):
+    invalidated, _ = record_invalidations(monkeypatch)
+
+    handle_notification(
+        json.dumps({"origin": "other", "table": "users", "keys": ["1"]})
+    )
+    handle_notification(json.dumps({"origin": "other", "table": "category"}))
+    handle_notification(json.dumps({"origin": WORKER_ID, "table": "users"}))
+    handle_notification("not json")
+
+    assert invalidated == [("users", {"1"}), ("category", None)]
+
+
+"""
+- [ ] Test oversized key lists fall back to invalidating the whole table
+"""
+
+
+def test_unit_invalidation_bus_payload_size():
+    keys = {str(key) for key in range(5000)}
+    payloads = [json.loads(p) for p in notification_payloads({"users": keys})]
+
+    assert payloads == [{"origin": WORKER_ID, "table": "users", "keys": None}]
+
+
+"""
+- [ ] Test commits on other databases do not notify
+"""
+
+
+def test_unit_invalidation_bus_commit_without_postgres(monkeypatch):
+    invalidated, _ = record_invalidations(monkeypatch)
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+
+    with Session(engine) as session:
+        session.add(Item(id=1, name="item"))
+        session.commit()
+
+    assert invalidated == [("invalidation_bus_item", {"1"})]
+
+
+"""
+- [ ] Test listener evicts entries and flushes after reconnecting
+"""
+
+
+def test_unit_invalidation_bus_listener_reconnects(monkeypatch):
+    invalidated, flushes = record_invalidations(monkeypatch)
+    monkeypatch.setattr("app.settings.CACHE_INVALIDATION_RECONNECT_MIN_SECONDS", 0.01)
+    connections = []
+
+    def connect():
+        if not connections:
+            connections.append(None)
+            raise ConnectionError("database is starting up")
+        connections.append(FakeConnection())
+        return connections[-1]
+
+    async def scenario():
+        listener = InvalidationListener(engine=None, channel="cache_invalidation")
+        listener._connect = connect
+        listener.start()
+
+        while len(connections) < 2:
+            await asyncio.sleep(0.01)
+        connections[1].notify(json.dumps({"origin": "other", "table": "users"}))
+        while not invalidated:
+            await asyncio.sleep(0.01)
+
+        connections[1].closed = True
+        connections[1].writer.send(b"x")
+        while len(connections) < 3:
+            await asyncio.sleep(0.01)
+
+        await listener.stop()
+
+    asyncio.run(scenario())
+
+    assert invalidated == [("users", None)]
+    # Once on connect, once on disconnect and once on reconnect
+    assert len(flushes) == 3
+
+
+"""
+- [ ] Test a keepalive hanging on a dead connection neither blocks the loop nor the listener
+"""
+
+
+def test_unit_invalidation_bus_keepalive_off_the_loop(monkeypatch):
+    record_invalidations(monkeypatch)
+    monkeypatch.setattr("app.settings.CACHE_INVALIDATION_KEEPALIVE_SECONDS", 0.05)
+    monkeypatch.setattr("app.settings.CACHE_INVALIDATION_RECONNECT_MIN_SECONDS", 0.01)
+    connections = []
+
+    def connect():
+        connections.append(FakeConnection())
+        return connections[-1]
+
+    async def scenario():
+        listener = InvalidationListener(engine=None, channel="cache_invalidation")
+        listener._connect = connect
+        listener.start()
+
+        while not connections:
+            await asyncio.sleep(0.01)
+        ticks = 0
+        while len(connections) < 2:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+        await listener.stop()
+        return ticks
+
+    ticks = asyncio.run(scenario())
+
+    assert connections[0].hung.is_set()
+    # The loop kept running while the ping hung
+    assert ticks >= 5
+
+
+"""
+- [ ] Test the listener connects with the pool's connect timeout and options
+"""
+
+
+def test_unit_invalidation_bus_connect_args(monkeypatch):
+    monkeypatch.setattr("app.settings.DB_CONNECT_TIMEOUT_SECONDS", 3)
+    monkeypatch.setattr("app.settings.DB_STATEMENT_TIMEOUT_MS", 30000)
+    engine = create_engine("postgresql://user:secret@db/app")
+    params = {}
+
+    def connect(*args, **kwargs):
+        params.update(kwargs)
+        raise ConnectionError("unreachable")
+
+    monkeypatch.setattr(engine.dialect, "connect", connect)
+    listener = InvalidationListener(engine=engine, channel="cache_invalidation")
+
+    with pytest.raises(ConnectionError):
+        listener._connect()
+
+    assert params["connect_timeout"] == 3
+    assert params["options"] == "-c statement_timeout=30000"
+    assert params["host"] == "db"
@@ -0,0 +1,89 @@
+import atexit
+import json
+import logging
+import queue
+
+import pytest
+
+from app.core.log_pipeline import (
+    DebugSamplingFilter,
+    JsonFormatter,
+    NonBlockingQueueHandler,
+    configure_logging,
+)
+
+
+@pytest.fixture
+def restore_logging():
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+    yield
+    root.handlers[:] = handlers
+    root.setLevel(level)
+
+
+def make_record(level=logging.INFO, **extra):
+    record = logging.makeLogRecord(
+        {"name": "app", "levelno": level, "levelname": logging.getLevelName(level)}
+    )
+    record.msg, record.args = "Category %s created", ("shoes",)
+    record.__dict__.update(extra)
+    return record
+
+
+"""
+- [ ] Test JSON formatter renders message and extra fields
+"""
+
+
+def test_unit_log_pipeline_json_formatter():
+    entry = json.loads(JsonFormatter().format(make_record(request_id="abc")))
+
+    assert entry["message"] == "Category shoes created"
+    assert entry["level"] == "INFO"
+    assert entry["logger"] == "app"
+    assert entry["request_id"] == "abc"
+
+
+"""
+- [ ] Test DEBUG sampling and full queue never block or drop other levels
+"""
+
+
+def test_unit_log_pipeline_sampling_and_full_queue():
+    sampling = DebugSamplingFilter(rate=0)
+
+    assert not sampling.filter(make_record(logging.DEBUG))
+    assert sampling.filter(make_record(logging.WARNING))
+
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=1))
+    handler.handle(make_record())
+    handler.handle(make_record())
+
+    assert handler.queue.qsize() == 1
+    assert handler.dropped == 1
+
+
+"""
+- [ ] Test records reach their files through the background listener
+"""
+
+
+def test_unit_log_pipeline_routes_records(monkeypatch, tmp_path, restore_logging):
+    monkeypatch.setattr("app.settings.LOG_DIR", str(tmp_path))
+    monkeypatch.setattr("app.settings.LOG_FORMAT", "json")
+
+    listener = configure_logging()
+    logging.getLogger("users").info("User %s logged in", "alice")
+    logging.getLogger("slow_query").warning("SELECT pg_sleep(1)")
+    atexit.unregister(listener.stop)
+    listener.stop()
+
+    users_log = (tmp_path / "users.log").read_text()
+    dev_log = (tmp_path / "dev.log").read_text()
+
+    assert json.loads(users_log)["message"] == "User alice logged in"
+    assert "alice" in dev_log
+    assert "pg_sleep" in (tmp_path / "slow_query.log").read_text()
+    assert "pg_sleep" not in dev_log
+    assert not (tmp_path / "app.log").exists()
@@ -0,0 +1,99 @@
+import anyio
+from fastapi import FastAPI, Response
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from app.core.metrics import MetricsMiddleware, register_cache_stats, sample_state
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def get_test_client() -> TestClient:
+    app = FastAPI()
+
+    @app.middleware("http")
+    async def cached(request, call_next):
+        # Stands in for a cache hit, answered without reaching the router
+        if request.headers.get("x-cached"):
+            return Response("{}")
+        return await call_next(request)
+
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/metrics-test/{item_id}")
+    def get_item(item_id: int):
+        return {"id": item_id}
+
+    return TestClient(app)
+
+
+"""
+- [ ] Test requests are counted per route template, also when answered early
+"""
+
+
+def test_unit_metrics_requests_per_route():
+    labels = {"method": "GET", "route": "/metrics-test/{item_id}"}
+    before_ok = sample("http_requests_total", status="200", **labels)
+    before_invalid = sample("http_requests_total", status="422", **labels)
+    before_count = sample("http_request_duration_seconds_count", **labels)
+
+    client = get_test_client()
+    client.get("/metrics-test/1")
+    client.get("/metrics-test/2")
+    client.get("/metrics-test/not-a-number")
+    client.get("/metrics-test/3", headers={"X-Cached": "1"})
+    client.get("/unknown")
+
+    assert sample("http_requests_total", status="200", **labels) == before_ok + 3
+    assert sample("http_requests_total", status="422", **labels) == before_invalid + 1
+    assert sample("http_request_duration_seconds_count", **labels) == before_count + 4
+    assert sample("http_requests_total", method="GET", route="unmatched", status="404")
+    assert sample("http_requests_in_progress", method="GET") == 0
+
+
+"""
+- [ ] Test cache counters only add what changed since the last sample
+"""
+
+
+def test_unit_metrics_cache_counters():
+    stats = {"hits": 3, "misses": 1}
+    register_cache_stats("metrics-test", lambda: (stats["hits"], stats["misses"]))
+
+    async def sample_twice():
+        sample_state()
+        stats["hits"] += 2
+        sample_state()
+
+    anyio.run(sample_twice)
+
+    assert sample("cache_hits_total", cache="metrics-test") == 5
+    assert sample("cache_misses_total", cache="metrics-test") == 1
+    assert sample("threadpool_size") > 0
+
+
+"""
+- [ ] Test /metrics serves the Prometheus text format
+"""
+
+
+def test_unit_metrics_endpoint(client, monkeypatch):
+    monkeypatch.setattr("app.settings.INTERNAL_API_TOKEN", "secret")
+
+    response = client.get("/metrics", headers={"X-Internal-Token": "secret"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "http_requests_total" in response.text
+    assert "threadpool_size" in response.text
+
+    # As sent by a Prometheus scrape config
+    response = client.get("/metrics", headers={"Authorization": "Bearer secret"})
+
+    assert response.status_code == 200
+    assert (
+        client.get("/metrics", headers={"Authorization": "Bearer x"}).status_code == 403
+    )
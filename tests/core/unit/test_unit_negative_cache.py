@@ -0,0 +1,32 @@
+from app.core.cache_invalidation import invalidate_local
+from app.core.negative_cache import NegativeCache
+
+"""
+- [ ] Test committed writes to the table clear recorded misses
+"""
+
+
+def test_unit_negative_cache_invalidated_by_writes():
+    misses = NegativeCache("negative_item", ttl=60, max_entries=10)
+    misses.add("missing", misses.generation)
+
+    invalidate_local({"other_table": None})
+    assert misses.contains("missing")
+
+    invalidate_local({"negative_item": {"1"}})
+    assert not misses.contains("missing")
+
+
+"""
+- [ ] Test misses found before a concurrent write are not recorded
+"""
+
+
+def test_unit_negative_cache_skips_stale_misses():
+    misses = NegativeCache("negative_item", ttl=60, max_entries=10)
+    generation = misses.generation
+
+    invalidate_local({"negative_item": None})
+    misses.add("created-meanwhile", generation)
+
+    assert not misses.contains("created-meanwhile")
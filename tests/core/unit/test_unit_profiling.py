@@ -0,0 +1,113 @@
+import time
+
+import pytest
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+
+from app import settings
+from app.core import profiling
+from app.core.instrumented_route import InstrumentedRoute
+from app.core.profiling import Profile, list_profiles
+
+PROFILE_HEADERS = {"X-Profile": "1", "X-Internal-Token": "secret"}
+
+
+@pytest.fixture(autouse=True)
+def profiling_settings(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "PROFILING_ENABLED", True)
+    monkeypatch.setattr(settings, "PROFILING_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "INTERNAL_API_TOKEN", "secret")
+    monkeypatch.setattr(profiling, "route_sample_rates", {})
+
+
+def busy_work(seconds: float):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def get_test_client() -> TestClient:
+    router = APIRouter(route_class=InstrumentedRoute)
+
+    @router.get("/profiled/{item_id}")
+    def get_item(item_id: int):
+        busy_work(0.05)
+        return {"id": item_id}
+
+    app = FastAPI()
+    app.include_router(router)
+    return TestClient(app)
+
+
+"""
+- [ ] Test the admin header profiles the endpoint thread into a folded file
+"""
+
+
+def test_unit_profiling_header(tmp_path, monkeypatch):
+    client = get_test_client()
+
+    response = client.get("/profiled/1", headers=PROFILE_HEADERS)
+
+    assert response.json() == {"id": 1}
+    name = response.headers["X-Profile-Id"]
+    assert [entry["name"] for entry in list_profiles(str(tmp_path))] == [name]
+    lines = (tmp_path / name).read_text().splitlines()
+    _, count = lines[0].rsplit(" ", 1)
+    assert int(count) > 0
+    assert any("busy_work (test_unit_profiling.py" in line for line in lines)
+
+    response = client.get("/profiled/1", headers={"X-Profile": "1"})
+
+    assert "X-Profile-Id" not in response.headers
+
+    # Open internal access does not open profiling without a token
+    monkeypatch.setattr(settings, "INTERNAL_API_TOKEN", None)
+    monkeypatch.setattr(settings, "INTERNAL_OPEN_ACCESS", True)
+    response = client.get("/profiled/1", headers={"X-Profile": "1"})
+
+    assert "X-Profile-Id" not in response.headers
+
+
+"""
+- [ ] Test per route sample rates and disabled profiling
+"""
+
+
+def test_unit_profiling_route_rate_and_disabled(monkeypatch):
+    client = get_test_client()
+    profiling.route_sample_rates["/profiled/{item_id}"] = 1.0
+
+    assert "X-Profile-Id" in client.get("/profiled/1").headers
+
+    profiling.route_sample_rates.clear()
+
+    assert "X-Profile-Id" not in client.get("/profiled/1").headers
+
+    monkeypatch.setattr(settings, "PROFILING_ENABLED", False)
+    response = get_test_client().get("/profiled/1", headers=PROFILE_HEADERS)
+
+    assert "X-Profile-Id" not in response.headers
+
+
+"""
+- [ ] Test saving keeps only the newest profiles
+"""
+
+
+def test_unit_profiling_prunes_old_files(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "PROFILING_MAX_FILES", 2)
+    names = []
+    for index in range(3):
+        profile = Profile("GET", "/items/{item_id}", "header")
+        profile.add_stack("main (app.py:1);handler (app.py:10)")
+        profile.save(str(tmp_path))
+        names.append(profile.name)
+        # Distinct modification times, newest last
+        (tmp_path / profile.name).touch()
+        time.sleep(0.01)
+
+    assert {entry["name"] for entry in list_profiles(str(tmp_path))} == set(names[1:])
+    assert (
+        tmp_path / names[2]
+    ).read_text() == "main (app.py:1);handler (app.py:10) 1\n"
@@ -0,0 +1,80 @@
+import pytest
+from sqlalchemy import Integer, String, create_engine, update
+from sqlalchemy.orm import DeclarativeBase, Mapped, Session, mapped_column
+
+from app.core.query_cache import FromCache, _cache
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+class Item(Base):
+    __tablename__ = "query_cache_item"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    slug: Mapped[str] = mapped_column(String(50))
+
+
+@pytest.fixture
+def session():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    _cache.clear()
+    with Session(engine, expire_on_commit=False) as session:
+        session.add_all([Item(id=1, slug="first"), Item(id=2, slug="second")])
+        session.commit()
+        yield session
+    _cache.clear()
+
+
+def find_item(session, slug):
+    return session.query(Item).options(FromCache()).filter(Item.slug == slug).first()
+
+
+"""
+- [ ] Test repeated cached query does not hit the database
+"""
+
+
+def test_unit_query_cache_hit(session, query_budget):
+    assert find_item(session, "first").id == 1
+
+    with query_budget(0):
+        assert find_item(session, "first").id == 1
+
+    assert find_item(session, "second").id == 2
+
+
+"""
+- [ ] Test commit touching the table invalidates cached results
+"""
+
+
+def test_unit_query_cache_commit_invalidates(session):
+    item = find_item(session, "first")
+    item.slug = "renamed"
+    session.commit()
+
+    assert find_item(session, "first") is None
+
+    session.execute(update(Item).where(Item.id == 2).values(slug="first"))
+    session.commit()
+
+    assert find_item(session, "first").id == 2
+
+
+"""
+- [ ] Test rolled back changes keep cached results
+"""
+
+
+def test_unit_query_cache_rollback_keeps_entries(session, query_budget):
+    find_item(session, "second")
+    session.get(Item, 2).slug = "changed"
+    session.flush()
+    session.rollback()
+    session.expunge_all()
+
+    with query_budget(0):
+        assert find_item(session, "second").slug == "second"
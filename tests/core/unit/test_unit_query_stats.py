@@ -0,0 +1,86 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from app.core.query_stats import NPlusOneQueryError, QueryStatsMiddleware
+from app.core.request_context import (
+    RequestContext,
+    reset_request_context,
+    set_request_context,
+)
+
+engine = create_engine("sqlite://")
+
+
+def run_queries(count: int, statement: str = "SELECT 1"):
+    with engine.connect() as connection:
+        for _ in range(count):
+            connection.execute(text(statement))
+
+
+def get_test_client(queries: int) -> TestClient:
+    app = FastAPI()
+    app.add_middleware(QueryStatsMiddleware)
+
+    @app.get("/items")
+    def get_items():
+        run_queries(queries)
+        return []
+
+    return TestClient(app)
+
+
+"""
+- [ ] Test response reports query count and database time
+"""
+
+
+def test_unit_query_stats_response_headers():
+    response = get_test_client(queries=3).get("/items")
+
+    assert response.status_code == 200
+    assert response.headers["X-DB-Queries"] == "3"
+    assert response.headers["Server-Timing"].startswith("db;dur=")
+    assert 'desc="3 queries"' in response.headers["Server-Timing"]
+
+
+"""
+- [ ] Test query budget fixture counts statements
+"""
+
+
+def test_unit_query_budget_fixture(query_budget):
+    with query_budget(2) as captured:
+        run_queries(2)
+
+    assert captured.count == 2
+
+    with pytest.raises(AssertionError):
+        with query_budget(1):
+            run_queries(2)
+
+
+"""
+- [ ] Test repeated identical statements are reported as N+1
+"""
+
+
+@pytest.mark.parametrize("mode", ["warn", "raise"])
+def test_unit_query_stats_n_plus_one(monkeypatch, caplog, mode):
+    monkeypatch.setattr("app.settings.N_PLUS_ONE_MODE", mode)
+    monkeypatch.setattr("app.settings.N_PLUS_ONE_THRESHOLD", 3)
+    request_context = RequestContext({"type": "http", "method": "GET", "path": "/x"})
+    token = set_request_context(request_context)
+
+    try:
+        if mode == "raise":
+            with pytest.raises(NPlusOneQueryError):
+                run_queries(3, "SELECT 2")
+        else:
+            run_queries(3, "SELECT 2")
+            assert "Possible N+1 query in GET /x" in caplog.text
+    finally:
+        reset_request_context(token)
+
+    assert request_context.query_count == 3
@@ -0,0 +1,177 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.cache_backends import CachedResponse, MemoryLRUBackend, SQLiteBackend
+from app.core.cache_invalidation import invalidate_local
+from app.core.response_cache import CacheRule, ResponseCacheMiddleware
+
+
+def get_test_client(backend, during_request=lambda: None):
+    app = FastAPI()
+    app.add_middleware(
+        ResponseCacheMiddleware,
+        backend=backend,
+        rules=[CacheRule(r"^/items/\d+$", 60, tags=["items"], vary_headers=["x-lang"])],
+    )
+    calls = []
+
+    @app.get("/items/{item_id}")
+    def get_item(item_id: int):
+        calls.append(item_id)
+        during_request()
+        return {"id": item_id, "version": len(calls)}
+
+    @app.put("/items/{item_id}")
+    def update_item(item_id: int):
+        invalidate_local({"items": {str(item_id)}})
+        return {"id": item_id}
+
+    return TestClient(app), calls
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        return MemoryLRUBackend(max_entries=10)
+    return SQLiteBackend(str(tmp_path / "cache.sqlite3"))
+
+
+"""
+- [ ] Test cache hit skips the route
+"""
+
+
+def test_unit_response_cache_hit_skips_route(backend):
+    client, calls = get_test_client(backend)
+
+    first = client.get("/items/1")
+    second = client.get("/items/1")
+
+    assert first.headers["X-Cache"] == "MISS"
+    assert second.headers["X-Cache"] == "HIT"
+    assert second.json() == first.json()
+    assert calls == [1]
+
+
+"""
+- [ ] Test vary headers and authorization bypass
+"""
+
+
+def test_unit_response_cache_vary_and_private(backend):
+    client, calls = get_test_client(backend)
+
+    client.get("/items/1", headers={"X-Lang": "en"})
+    client.get("/items/1", headers={"X-Lang": "pl"})
+    client.get("/items/1", headers={"X-Lang": "en"})
+    response = client.get("/items/1", headers={"Authorization": "Bearer token"})
+
+    assert "X-Cache" not in response.headers
+    assert calls == [1, 1, 1]
+
+
+"""
+- [ ] Test committed changes purge the matching tags
+"""
+
+
+def test_unit_response_cache_write_purges(backend):
+    client, calls = get_test_client(backend)
+
+    client.get("/items/1")
+    client.put("/items/1")
+    response = client.get("/items/1")
+
+    assert response.headers["X-Cache"] == "MISS"
+    assert response.json()["version"] == 2
+
+
+"""
+- [ ] Test a response built while its tags were invalidated is not stored
+"""
+
+
+def test_unit_response_cache_skips_store_after_concurrent_write(backend):
+    writes = [{"items": {"1"}}]
+
+    def concurrent_write():
+        if writes:
+            invalidate_local(writes.pop())
+
+    client, calls = get_test_client(backend, during_request=concurrent_write)
+
+    first = client.get("/items/1")
+    second = client.get("/items/1")
+    third = client.get("/items/1")
+
+    assert [first.headers["X-Cache"], second.headers["X-Cache"]] == ["MISS", "MISS"]
+    assert third.headers["X-Cache"] == "HIT"
+    assert third.json()["version"] == 2
+
+
+"""
+- [ ] Test memory backend evicts least recently used and expired entries
+"""
+
+
+def test_unit_memory_backend_lru_and_ttl():
+    backend = MemoryLRUBackend(max_entries=2)
+    backend.set("a", 1, ttl=60)
+    backend.set("b", 2, ttl=60)
+    backend.get("a")
+    backend.set("c", 3, ttl=60)
+
+    assert backend.get("a") == 1
+    assert backend.get("b") is None
+
+    backend.set("expired", 4, ttl=-1)
+
+    assert backend.get("expired") is None
+    assert len(backend) == 1
+
+
+"""
+- [ ] Test SQLite backend is shared between instances
+"""
+
+
+def test_unit_sqlite_backend_shared(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    response = CachedResponse(200, [(b"content-type", b"application/json")], b"{}", 0)
+
+    SQLiteBackend(path).set("key", response, ttl=60, tags=["items"])
+
+    assert SQLiteBackend(path).get("key") == response
+
+    SQLiteBackend(path).invalidate_tags(["items"])
+
+    assert SQLiteBackend(path).get("key") is None
+
+
+"""
+- [ ] Test SQLite backend skips a write after another worker invalidated its tags
+"""
+
+
+def test_unit_sqlite_backend_generation_shared(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    response = CachedResponse(200, [(b"content-type", b"application/json")], b"{}", 0)
+    worker, other_worker = SQLiteBackend(path), SQLiteBackend(path)
+
+    generation = worker.generation(["items"])
+    other_worker.invalidate_tags(["items"])
+    worker.set("key", response, ttl=60, tags=["items"], generation=generation)
+
+    assert worker.get("key") is None
+
+    generation = worker.generation(["items"])
+    worker.set("key", response, ttl=60, tags=["items"], generation=generation)
+
+    assert other_worker.get("key") == response
+
+    generation = worker.generation(["items"])
+    other_worker.clear()
+    worker.set("key", response, ttl=60, tags=["items"], generation=generation)
+
+    assert worker.get("key") is None
@@ -0,0 +1,77 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.core.single_flight import SingleFlight, single_flight_stats
+
+
+def run_concurrently(group, key, fn, callers=5):
+    release = threading.Event()
+    started = threading.Barrier(callers + 1)
+
+    def call():
+        started.wait()
+        return group.do(key, fn(release))
+
+    with ThreadPoolExecutor(callers) as executor:
+        futures = [executor.submit(call) for _ in range(callers)]
+        started.wait()
+        while group.stats()["coalesced"] < callers - 1:
+            time.sleep(0.001)
+        release.set()
+        return futures
+
+
+"""
+- [ ] Test concurrent calls for one key share a single execution
+"""
+
+
+def test_unit_single_flight_coalesces():
+    group = SingleFlight("test-coalesce")
+    executions = []
+
+    def lookup(release):
+        def run():
+            release.wait()
+            executions.append(1)
+            return '{"id": 1}'
+
+        return run
+
+    futures = run_concurrently(group, ("id", 1), lookup)
+
+    assert [future.result() for future in futures] == ['{"id": 1}'] * 5
+    assert executions == [1]
+    assert single_flight_stats()["test-coalesce"] == {
+        "calls": 5,
+        "coalesced": 4,
+        "in_flight": 0,
+    }
+
+    group.do(("id", 1), lambda: "again")
+    assert group.stats()["coalesced"] == 4
+
+
+"""
+- [ ] Test waiting callers get the leader's exception
+"""
+
+
+def test_unit_single_flight_shares_errors():
+    group = SingleFlight("test-errors")
+
+    def failing(release):
+        def run():
+            release.wait()
+            raise LookupError("missing")
+
+        return run
+
+    futures = run_concurrently(group, "slug", failing)
+
+    for future in futures:
+        with pytest.raises(LookupError):
+            future.result()
@@ -0,0 +1,103 @@
+import json
+
+import pytest
+from sqlalchemy import create_engine, event, text
+
+from app.core.rate_limit import TokenBucket
+from app.core.request_context import (
+    RequestContext,
+    reset_request_context,
+    set_request_context,
+)
+from app.core.slow_query import log_slow_query, redact_parameters
+
+engine = create_engine("sqlite://")
+event.listen(engine, "after_cursor_execute", log_slow_query)
+
+
+@pytest.fixture(scope="function")
+def slow_query_entries(monkeypatch):
+    entries = []
+    monkeypatch.setattr("app.settings.SLOW_QUERY_THRESHOLD_MS", 0)
+    monkeypatch.setattr("app.core.slow_query._log_bucket", TokenBucket(1000))
+    monkeypatch.setattr(
+        "app.core.slow_query.slow_query_logger.warning",
+        lambda message: entries.append(json.loads(message)),
+    )
+    return entries
+
+
+def run_query(statement="SELECT :password AS password", **parameters):
+    with engine.connect() as connection:
+        connection.execute(text(statement), parameters or {"password": "secret"})
+
+
+"""
+- [ ] Test slow query is logged with route and parameters
+"""
+
+
+def test_unit_slow_query_logged(slow_query_entries):
+    request_context = RequestContext({"type": "http", "method": "GET", "path": "/x"})
+    token = set_request_context(request_context)
+    try:
+        run_query()
+    finally:
+        reset_request_context(token)
+
+    assert len(slow_query_entries) == 1
+    assert slow_query_entries[0]["route"] == "GET /x"
+    assert slow_query_entries[0]["parameters"] == ["secret"]
+    assert slow_query_entries[0]["duration_ms"] >= 0
+
+
+"""
+- [ ] Test password parameters are redacted
+"""
+
+
+def test_unit_slow_query_redacts_parameters():
+    parameters = {"username": "user", "hashed_password": "hash", "long": "x" * 500}
+
+    redacted = redact_parameters(parameters)
+
+    assert redacted["username"] == "user"
+    assert redacted["hashed_password"] == "***"
+    assert len(redacted["long"]) < 500
+
+
+"""
+- [ ] Test per-route threshold overrides the default
+"""
+
+
+def test_unit_slow_query_route_threshold(slow_query_entries, monkeypatch):
+    monkeypatch.setattr(
+        "app.settings.SLOW_QUERY_ROUTE_THRESHOLDS_MS", {"/reports": 60_000}
+    )
+    request_context = RequestContext(
+        {"type": "http", "method": "GET", "path": "/reports"}
+    )
+    token = set_request_context(request_context)
+    try:
+        run_query()
+    finally:
+        reset_request_context(token)
+
+    assert slow_query_entries == []
+
+
+"""
+- [ ] Test slow query log is rate limited
+"""
+
+
+def test_unit_slow_query_rate_limited(slow_query_entries, monkeypatch):
+    monkeypatch.setattr(
+        "app.core.slow_query._log_bucket", TokenBucket(0.001, capacity=1)
+    )
+
+    for _ in range(3):
+        run_query()
+
+    assert len(slow_query_entries) == 1
@@ -0,0 +1,78 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+
+from app import settings
+from app.core.instrumented_route import InstrumentedRoute
+from app.core.threadpool import (
+    configure_threadpool,
+    queue_wait_stats,
+    threadpool_size,
+    threadpool_status,
+)
+
+
+def get_test_client() -> TestClient:
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        configure_threadpool()
+        yield
+
+    router = APIRouter(route_class=InstrumentedRoute)
+
+    @router.get("/slow")
+    def slow():
+        time.sleep(0.1)
+        return {}
+
+    @router.get("/status")
+    async def status():
+        return threadpool_status()
+
+    app = FastAPI(lifespan=lifespan)
+    app.include_router(router)
+    return TestClient(app)
+
+
+"""
+- [ ] Test the size follows the DB pools unless set explicitly
+"""
+
+
+def test_unit_threadpool_size(monkeypatch):
+    monkeypatch.setattr(settings, "THREADPOOL_SIZE", 0)
+    monkeypatch.setattr(settings, "DB_POOL_SIZE", 5)
+    monkeypatch.setattr(settings, "DB_MAX_OVERFLOW", 10)
+    monkeypatch.setattr(settings, "THREADPOOL_EXTRA_THREADS", 4)
+    monkeypatch.setattr(settings, "REPLICA_DATABASE_URLS", ["postgresql://replica"])
+
+    assert threadpool_size() == 34
+
+    monkeypatch.setattr(settings, "THREADPOOL_SIZE", 8)
+
+    assert threadpool_size() == 8
+
+
+"""
+- [ ] Test sync routes queue for the configured threads and the wait is recorded
+"""
+
+
+def test_unit_threadpool_queue_wait(monkeypatch):
+    monkeypatch.setattr(settings, "THREADPOOL_SIZE", 1)
+    calls_before = queue_wait_stats.calls
+
+    with get_test_client() as client:
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            responses = list(executor.map(client.get, ["/slow", "/slow"]))
+        status = client.get("/status").json()
+
+    assert [response.status_code for response in responses] == [200, 200]
+    assert status["size"] == 1
+    assert status["busy"] == 0
+    assert status["queue_wait"]["calls"] == calls_before + 2
+    # One request waited for the other to give its thread back
+    assert status["queue_wait"]["max_wait_ms"] >= 50
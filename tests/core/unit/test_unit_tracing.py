@@ -0,0 +1,146 @@
+import json
+
+import pytest
+from fastapi import APIRouter, Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from app import settings
+from app.core.instrumented_route import InstrumentedRoute
+from app.core.tracing import (
+    OTLPFileExporter,
+    Span,
+    Trace,
+    TracingMiddleware,
+    _current_span,
+    ring_buffer,
+    start_span,
+    to_otlp,
+)
+
+TRACEPARENT = "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01"
+
+
+@pytest.fixture(autouse=True)
+def empty_ring_buffer():
+    ring_buffer.clear()
+    yield
+    ring_buffer.clear()
+
+
+def get_test_client() -> TestClient:
+    engine = create_engine("sqlite://")
+    router = APIRouter(route_class=InstrumentedRoute)
+
+    def get_connection():
+        with engine.connect() as connection:
+            yield connection
+
+    @router.get("/traced/{item_id}")
+    def get_item(item_id: int, connection=Depends(get_connection)):
+        value = connection.execute(text("SELECT :id"), {"id": item_id}).scalar()
+        return {"id": value}
+
+    app = FastAPI()
+    app.add_middleware(TracingMiddleware)
+    app.include_router(router)
+    return TestClient(app)
+
+
+def spans_by_name(trace: Trace) -> dict:
+    return {span.name: span for span in trace.spans}
+
+
+"""
+- [ ] Test a sampled request records the route, endpoint and SQL spans
+"""
+
+
+def test_unit_tracing_span_tree(monkeypatch):
+    monkeypatch.setattr(settings, "TRACING_SAMPLE_RATE", 1.0)
+
+    response = get_test_client().get("/traced/7")
+
+    assert response.json() == {"id": 7}
+    [trace] = ring_buffer.traces()
+    assert response.headers["X-Trace-Id"] == trace.trace_id
+
+    spans = spans_by_name(trace)
+    root = spans["GET /traced/{item_id}"]
+    assert root is trace.root
+    assert root.attributes["http.status_code"] == 200
+    assert root.attributes["db.query_count"] == 1
+    assert spans["route"].parent_id == root.span_id
+    assert spans["http.response.write"].parent_id == root.span_id
+    for name in ("dependencies", "endpoint", "serialize"):
+        assert spans[name].parent_id == spans["route"].span_id
+    assert spans["db.query"].parent_id == spans["endpoint"].span_id
+    assert spans["db.query"].attributes["db.statement"] == "SELECT ?"
+    assert spans["dependencies"].end <= spans["endpoint"].start
+    assert spans["endpoint"].end <= spans["serialize"].start
+
+
+"""
+- [ ] Test sampling, traceparent and the slow request threshold
+"""
+
+
+def test_unit_tracing_sampling(monkeypatch):
+    monkeypatch.setattr(settings, "TRACING_SAMPLE_RATE", 0.0)
+    monkeypatch.setattr(settings, "TRACING_SLOW_THRESHOLD_MS", 0.0)
+    client = get_test_client()
+
+    response = client.get("/traced/1")
+
+    assert "X-Trace-Id" not in response.headers
+    assert ring_buffer.traces() == []
+
+    client.get("/traced/2", headers={"traceparent": TRACEPARENT})
+    [trace] = ring_buffer.traces()
+
+    assert trace.trace_id == "0af7651916cd43dd8448eb211c80319c"
+    assert trace.root.parent_id == "b7ad6b7169203331"
+
+    # Unsampled requests are recorded and kept once they are slow enough
+    monkeypatch.setattr(settings, "TRACING_SLOW_THRESHOLD_MS", 60_000.0)
+    client.get("/traced/3")
+    assert len(ring_buffer.traces()) == 1
+
+    monkeypatch.setattr(settings, "TRACING_SLOW_THRESHOLD_MS", 1e-9)
+    client.get("/traced/4")
+    assert len(ring_buffer.traces()) == 2
+    assert not ring_buffer.traces()[0].sampled
+
+
+"""
+- [ ] Test the OTLP file exporter writes one JSON line per trace
+"""
+
+
+def test_unit_tracing_otlp_file(tmp_path):
+    trace = Trace()
+    root = Span(trace, "GET /items", None, 1_000)
+    trace.add(root)
+    token = _current_span.set(root)
+    try:
+        with start_span("child", rows=3):
+            pass
+    finally:
+        _current_span.reset(token)
+    root.end = 5_000
+
+    path = tmp_path / "traces.jsonl"
+    exporter = OTLPFileExporter(str(path), "factoryapi-test")
+    exporter.export(trace)
+    exporter.stop()
+
+    [line] = path.read_text().splitlines()
+    assert json.loads(line) == to_otlp(trace, "factoryapi-test")
+    [resource_spans] = json.loads(line)["resourceSpans"]
+    root_span, child_span = resource_spans["scopeSpans"][0]["spans"]
+    assert resource_spans["resource"]["attributes"] == [
+        {"key": "service.name", "value": {"stringValue": "factoryapi-test"}}
+    ]
+    assert root_span["kind"] == 2 and "parentSpanId" not in root_span
+    assert child_span["parentSpanId"] == root_span["spanId"]
+    assert child_span["attributes"] == [{"key": "rows", "value": {"intValue": "3"}}]
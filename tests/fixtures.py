@@ -1,10 +1,13 @@
 import os
+from contextlib import contextmanager
 
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
+from app.core.cache_invalidation import flush_local
+from app.core.query_stats import capture_queries
 from app.main import app
 from tests.utils.database_utils import migrate_to_db
 from tests.utils.docker_utils import start_database_container
@@ -32,3 +35,32 @@ def db_session():
 def client():
     with TestClient(app) as _client:
         yield _client
+
+
+@pytest.fixture(scope="function")
+def query_budget():
+    """Fail when the wrapped block runs more SQL statements than allowed.
+
+    with query_budget(2):
+        client.get("/api/category/")
+    """
+
+    @contextmanager
+    def assert_max_queries(max_queries: int):
+        with capture_queries() as captured:
+            yield captured
+
+        assert captured.count <= max_queries, (
+            f"Expected at most {max_queries} queries, got {captured.count}:\n"
+            + "\n".join(captured.statements)
+        )
+
+    return assert_max_queries
+
+
+@pytest.fixture(autouse=True)
+def reset_local_caches():
+    """Tests mock out commits, so nothing would evict entries between them."""
+    flush_local()
+    yield
+    flush_local()
@@ -5,7 +5,7 @@ from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
-from app.db_connection import get_db_session
+from app.db_connection import get_db_session, get_read_db_session
 from app.main import app
 from tests.utils.database_utils import migrate_to_db
 from tests.utils.docker_utils import start_database_container
@@ -40,6 +40,7 @@ def override_get_db_session(db_session_integration):
         return db_session_integration
 
     app.dependency_overrides[get_db_session] = override
+    app.dependency_overrides[get_read_db_session] = override
 
 
 @pytest.fixture(scope="function")
@@ -1,7 +1,9 @@
 import pytest
 from fastapi import HTTPException
 from pydantic import ValidationError
+from sqlalchemy.exc import OperationalError
 
+from app.core.cache_invalidation import invalidate_local
 from app.products.models import Category
 from app.products.schemas.category_schema import CategoryCreate
 from tests.products.factories.models_factory import get_random_category_dict
@@ -77,6 +79,30 @@ def test_unit_get_category_all_with_internal_server_error(client, monkeypatch):
     assert response.status_code == 500
 
 
+"""
+- [ ] Test GET categories by ids or slugs keeps request order
+"""
+
+
+def test_unit_get_categories_by_ids_and_slugs(client, monkeypatch):
+    categories = [Category(**get_random_category_dict()) for _ in range(3)]
+    for id_, category in enumerate(categories, start=1):
+        category.id = id_
+    monkeypatch.setattr("sqlalchemy.orm.Query.all", mock_output(categories))
+
+    response = client.get("api/category/", params={"ids": [3, 4, 1]})
+    assert [category["id"] for category in response.json()] == [3, 1]
+    assert response.headers["X-Missing-Ids"] == "4"
+
+    slugs = [categories[1].slug, "missing-slug"]
+    response = client.get("api/category/", params={"slugs": slugs})
+    assert [category["id"] for category in response.json()] == [2]
+    assert response.headers["X-Missing-Slugs"] == "missing-slug"
+
+    response = client.get("api/category/", params={"ids": [1], "slugs": slugs})
+    assert response.status_code == 400
+
+
 """
 - [ ] Test GET single category by slug successfully
 """
@@ -103,6 +129,29 @@ def test_unit_get_single_category_not_found(client, monkeypatch, category):
     assert response.json() == {"detail": "Category does not exist"}
 
 
+"""
+- [ ] Test repeated GET of unknown slug skips the database until a write
+"""
+
+
+def test_unit_get_single_category_not_found_is_cached(client, monkeypatch):
+    lookups = []
+
+    def mock_first(*args, **kwargs):
+        lookups.append(1)
+        return None
+
+    monkeypatch.setattr("sqlalchemy.orm.Query.first", mock_first)
+    for _ in range(3):
+        response = client.get("api/category/slug/unknown-slug")
+        assert response.status_code == 404
+    assert lookups == [1]
+
+    invalidate_local({"category": None})
+    client.get("api/category/slug/unknown-slug")
+    assert lookups == [1, 1]
+
+
 """
 - [ ] Test GET single category by slug internal server error
 """
@@ -365,3 +414,20 @@ def test_unit_delete_category_internal_error(client, monkeypatch):
     response = client.delete("api/category/1")
     assert response.status_code == 500
     assert response.json() == {"detail": "Internal server error"}
+
+
+"""
+- [ ] Test GET category by id returns 504 when the query is cancelled
+"""
+
+
+def test_unit_get_single_category_by_id_query_timeout(client, monkeypatch):
+    class QueryCanceled(Exception):
+        pgcode = "57014"
+
+    def mock_query_timeout(*args, **kwargs):
+        raise OperationalError("SELECT", {}, QueryCanceled("statement timeout"))
+
+    monkeypatch.setattr("sqlalchemy.orm.Query.first", mock_query_timeout)
+    response = client.get("api/category/1")
+    assert response.status_code == 504
@@ -0,0 +1,146 @@
+import bcrypt
+
+from app.users.models import User
+from app.users.security import hash_passwords
+from tests.users.factories.models_factory import get_random_user_dict
+
+
+def mock_output(return_value=None):
+    return lambda *args, **kwargs: return_value
+
+
+def get_random_user(id_: int) -> User:
+    user_data = get_random_user_dict(id_)
+    user_data.pop("password")
+    return User(hashed_password="hashed", **user_data)
+
+
+"""
+- [ ] Test GET users returns a page with next cursor
+"""
+
+
+def test_unit_get_users_paginated_with_next_cursor(client, monkeypatch):
+    users = [get_random_user(i) for i in range(1, 4)]
+    monkeypatch.setattr("sqlalchemy.orm.Query.all", mock_output(users))
+
+    response = client.get("/users/", params={"limit": 2})
+
+    assert response.status_code == 200
+    assert [user["id"] for user in response.json()] == [1, 2]
+    assert response.headers["X-Next-Cursor"] == "2"
+
+
+"""
+- [ ] Test GET users last page has no next cursor
+"""
+
+
+def test_unit_get_users_last_page(client, monkeypatch):
+    users = [get_random_user(i) for i in range(1, 3)]
+    monkeypatch.setattr("sqlalchemy.orm.Query.all", mock_output(users))
+
+    response = client.get(
+        "/users/",
+        params={"limit": 2, "after_id": 0, "username": "a", "is_active": True},
+    )
+
+    assert response.status_code == 200
+    assert len(response.json()) == 2
+    assert "X-Next-Cursor" not in response.headers
+
+
+"""
+- [ ] Test GET users by ids keeps request order and reports missing ids
+"""
+
+
+def test_unit_get_users_by_ids(client, monkeypatch):
+    users = [get_random_user(i) for i in (1, 2, 5)]
+    monkeypatch.setattr("sqlalchemy.orm.Query.all", mock_output(users))
+
+    response = client.get("/users/", params={"ids": [5, 3, 1, 5, 2]})
+
+    assert response.status_code == 200
+    assert [user["id"] for user in response.json()] == [5, 1, 2]
+    assert response.headers["X-Missing-Ids"] == "3"
+    assert "X-Next-Cursor" not in response.headers
+
+
+"""
+- [ ] Test GET users rejects ids combined with filters
+"""
+
+
+def test_unit_get_users_ids_with_filters(client):
+    response = client.get("/users/", params={"ids": [1, 2], "is_active": True})
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Pass either ids or filters"
+
+
+"""
+- [ ] Test GET users rejects limit above maximum
+"""
+
+
+def test_unit_get_users_limit_too_large(client):
+    response = client.get("/users/", params={"limit": 10_000})
+
+    assert response.status_code == 422
+
+
+"""
+- [ ] Test POST users bulk reports per-row outcomes
+"""
+
+
+def test_unit_create_users_bulk_per_row_results(client, monkeypatch):
+    users = [get_random_user_dict(i) for i in range(1, 5)]
+    users[2]["username"] = users[1]["username"]
+
+    monkeypatch.setattr(
+        "app.users.routers.user_routes.find_existing_usernames_and_emails",
+        mock_output(({users[0]["username"]}, set())),
+    )
+    calls = []
+    monkeypatch.setattr(
+        "sqlalchemy.orm.Session.rollback", lambda self: calls.append("rollback")
+    )
+    monkeypatch.setattr(
+        "app.users.routers.user_routes.hash_passwords",
+        lambda passwords: calls.append("hash") or ["hashed"] * len(passwords),
+    )
+    inserted = [get_random_user(2), get_random_user(4)]
+    inserted[0].username = users[1]["username"]
+    inserted[1].username = users[3]["username"]
+    monkeypatch.setattr("sqlalchemy.orm.Session.execute", mock_output(inserted))
+    monkeypatch.setattr("sqlalchemy.orm.Session.commit", mock_output())
+
+    body = {"users": [{k: v for k, v in user.items() if k != "id"} for user in users]}
+    response = client.post("/users/bulk", json=body)
+
+    assert response.status_code == 200
+    assert [result["status"] for result in response.json()] == [
+        "conflict",
+        "created",
+        "duplicate",
+        "created",
+    ]
+    assert response.json()[1]["user"]["username"] == users[1]["username"]
+    # No transaction is held open while hashing
+    assert calls == ["rollback", "hash"]
+
+
+"""
+- [ ] Test password hashing in parallel keeps input order
+"""
+
+
+def test_unit_hash_passwords_preserves_order():
+    passwords = ["first", "second", "third"]
+    hashed = hash_passwords(passwords)
+
+    assert len(hashed) == len(passwords)
+    for password, hashed_password in zip(passwords, hashed):
+        assert bcrypt.checkpw(password.encode("utf-8"), hashed_password.encode("utf-8"))